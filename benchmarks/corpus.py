@@ -0,0 +1,231 @@
+"""Generate synthetic PDF and image corpora for the benchmarks.
+
+The documents are generated from a fixed seed, so a profile always produces the same
+corpus. A `manifest.json` is written next to the files; when it matches the requested
+profile, the corpus is reused instead of being generated again.
+"""
+
+import json
+import random
+import ctypes
+from typing import Optional
+from pathlib import Path
+
+import log21
+import pypdfium2.raw as pdfium_c
+from PIL import Image
+from pypdfium2 import PdfImage, PdfBitmap, PdfMatrix, PdfDocument
+
+__all__ = ["PROFILES", "generate_pdf", "generate_images", "generate_corpus"]
+
+# Each document is `(name, pages, characters per page, embedded image size)`. Image
+# inputs are `(count, size)`; half of them are PNG and half JPEG.
+PROFILES: dict[str, dict] = {
+    "small": {
+        "documents": [
+            ("text-sparse-10", 10, 300, None),
+            ("text-dense-100", 100, 3000, None),
+            ("scanned-10", 10, 0, (1240, 1754)),
+        ],
+        "images": (8, (1240, 1754)),
+    },
+    "medium": {
+        "documents": [
+            ("text-sparse-100", 100, 300, None),
+            ("text-dense-1000", 1000, 3000, None),
+            ("mixed-500", 500, 1500, (600, 400)),
+            ("scanned-100", 100, 0, (2480, 3508)),
+        ],
+        "images": (32, (2480, 3508)),
+    },
+    "large": {
+        "documents": [
+            ("text-sparse-1000", 1000, 300, None),
+            ("text-dense-10000", 10000, 3000, None),
+            ("mixed-2000", 2000, 1500, (600, 400)),
+            ("scanned-500", 500, 0, (2480, 3508)),
+        ],
+        "images": (128, (2480, 3508)),
+    },
+}
+
+_PAGE_SIZE = (612, 792)
+_FONT_SIZE = 10
+_LINE_HEIGHT = 12
+_CHARS_PER_LINE = 95
+_WORDS = (  # noqa: SIM905
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+    "exercitation ullamco laboris nisi aliquip ex ea commodo consequat"
+).split()
+
+
+def _lines(rng: random.Random, characters: int) -> list[str]:
+    """Generate lines of random words with about `characters` characters in total."""
+    lines = []
+    line = ""
+    total = 0
+    while total < characters:
+        word = rng.choice(_WORDS)
+        if len(line) + len(word) + 1 > _CHARS_PER_LINE:
+            lines.append(line)
+            line = ""
+        line = f"{line} {word}" if line else word
+        total += len(word) + 1
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _noise_image(rng: random.Random, size: tuple[int, int]) -> Image.Image:
+    """Generate an image that compresses about as well as a scanned page."""
+    # Upscaled noise has some structure, unlike pure noise which never compresses
+    width, height = max(size[0] // 8, 1), max(size[1] // 8, 1)
+    small = Image.frombytes("RGB", (width, height), rng.randbytes(3 * width * height))
+    return small.resize((size[0], size[1]), Image.Resampling.BILINEAR)
+
+
+def _add_text(pdf: PdfDocument, page: object, lines: list[str]) -> None:
+    top = _PAGE_SIZE[1] - 72
+    for i, line in enumerate(lines):
+        y = top - i * _LINE_HEIGHT
+        if y < 72:
+            break
+        text_object = pdfium_c.FPDFPageObj_NewTextObj(
+            pdf, b"Helvetica", ctypes.c_float(_FONT_SIZE)
+        )
+        text = ctypes.create_string_buffer((line + "\x00").encode("utf-16-le"))
+        pdfium_c.FPDFText_SetText(
+            text_object, ctypes.cast(text, ctypes.POINTER(pdfium_c.FPDF_WCHAR))
+        )
+        pdfium_c.FPDFPageObj_Transform(text_object, 1, 0, 0, 1, 72, y)
+        # The page takes ownership of the object
+        pdfium_c.FPDFPage_InsertObject(page, text_object)
+
+
+def _add_image(pdf: PdfDocument, page: object, image: Image.Image) -> None:
+    width, height = image.size
+    # Shrink the image to fit the page
+    scale = min(_PAGE_SIZE[0] / width, _PAGE_SIZE[1] / height, 1)
+    pdf_image = PdfImage.new(pdf)
+    bitmap = PdfBitmap.from_pil(image)
+    try:
+        pdf_image.set_bitmap(bitmap)
+        pdf_image.set_matrix(PdfMatrix().scale(width * scale, height * scale))
+        page.insert_obj(pdf_image)
+    finally:
+        bitmap.close()
+
+
+def generate_pdf(
+    path: Path,
+    pages: int,
+    characters_per_page: int,
+    image_size: Optional[tuple[int, int]] = None,
+    seed: int = 0,
+) -> None:
+    """Generate a PDF with random text and images.
+
+    :param path: Path to write the PDF to.
+    :param pages: Number of pages.
+    :param characters_per_page: Approximate number of characters of text on each page.
+    :param image_size: Size of the image embedded in each page in pixels, or None for
+        pages without images. Every page embeds its own copy of the image.
+    :param seed: Seed of the random generator.
+    """
+    rng = random.Random(seed)
+    image = _noise_image(rng, image_size) if image_size else None
+    pdf = PdfDocument.new()
+    try:
+        for _ in range(pages):
+            page = pdf.new_page(*_PAGE_SIZE)
+            if image is not None:
+                _add_image(pdf, page, image)
+            if characters_per_page:
+                _add_text(pdf, page, _lines(rng, characters_per_page))
+            page.gen_content()
+            page.close()
+        pdf.save(path)
+    finally:
+        pdf.close()
+
+
+def generate_images(
+    directory: Path, count: int, size: tuple[int, int], seed: int = 0
+) -> list[Path]:
+    """Generate a mix of PNG and JPEG images.
+
+    :param directory: Directory to write the images to.
+    :param count: Number of images.
+    :param size: Size of each image in pixels.
+    :param seed: Seed of the random generator.
+    :return: Paths of the images.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        image = _noise_image(rng, size)
+        path = directory / f"image-{i + 1}.{'png' if i % 2 == 0 else 'jpg'}"
+        image.save(path)
+        paths.append(path)
+    return paths
+
+
+def generate_corpus(directory: str | Path, profile: str = "small") -> dict:
+    """Generate the corpus of a profile, or reuse it if it was already generated.
+
+    :param directory: Directory to write the corpus to.
+    :param profile: One of the keys of `PROFILES`.
+    :return: The manifest of the corpus: the path and page count of each document and
+        the paths of the images.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile: {profile}")
+    directory = Path(directory)
+    manifest_path = directory / "manifest.json"
+    # Round trip through JSON, so the spec compares equal to the one in the manifest
+    spec = json.loads(json.dumps(PROFILES[profile]))
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("profile") == profile and manifest.get("spec") == spec:
+            return manifest
+
+    directory.mkdir(parents=True, exist_ok=True)
+    documents = {}
+    for seed, (name, pages, characters, image_size) in enumerate(spec["documents"]):
+        path = directory / f"{name}.pdf"
+        log21.info(f"Generating {path}...")
+        generate_pdf(path, pages, characters, image_size, seed)
+        documents[name] = {"path": str(path), "pages": pages}
+
+    count, size = spec["images"]
+    log21.info(f"Generating {count} images...")
+    images = generate_images(directory, count, size)
+
+    manifest = {
+        "profile": profile,
+        "spec": spec,
+        "documents": documents,
+        "images": [str(path) for path in images],
+    }
+    manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def main(directory: Path, /, profile: str = "small", verbose: bool = False) -> None:
+    """Generate a synthetic benchmark corpus.
+
+    :param directory: Directory to write the corpus to.
+    :param profile: Corpus profile. One of small, medium and large.
+    :param verbose: Print verbose output.
+    """
+    if verbose:
+        log21.basic_config(level=log21.INFO)
+    manifest = generate_corpus(directory, profile)
+    for name, document in manifest["documents"].items():
+        print(f"{name}: {document['pages']} pages")
+    print(f"images: {len(manifest['images'])}")
+
+
+if __name__ == "__main__":
+    log21.argumentify(main)
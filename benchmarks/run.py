@@ -0,0 +1,347 @@
+"""Benchmark the PDF-Helper operations over a synthetic corpus.
+
+Every measurement runs in a fresh process, so the peak memory of one operation does
+not leak into the next and each run pays the same start-up cost. The results are
+saved as JSON and can be compared with an earlier run to catch regressions.
+
+Usage:
+
+    python -m benchmarks.run --profile small --output results.json
+    python -m benchmarks.run --compare-with baseline.json --threshold 0.1
+"""
+
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import statistics
+import multiprocessing
+from typing import TYPE_CHECKING, Callable, Optional, Sequence
+from pathlib import Path
+from datetime import datetime, timezone
+
+import log21
+
+from .corpus import PROFILES, generate_corpus
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+
+__all__ = ["OPERATIONS", "build_cases", "run_benchmarks", "compare"]
+
+
+def _bundle(inputs: Sequence[str], output: Path) -> None:
+    from pdf_helper import bundle
+
+    bundle(inputs, output / "bundle.pdf")
+
+
+def _merge_pdfs(inputs: Sequence[str], output: Path) -> None:
+    from pdf_helper import merge_pdfs
+
+    merge_pdfs(inputs, output / "merged.pdf")
+
+
+def _remove_every_tenth_page(
+    inputs: Sequence[str], output: Path, in_place: bool
+) -> None:
+    from pypdfium2 import PdfDocument
+
+    from pdf_helper import remove_pages
+
+    pdf = PdfDocument(inputs[0])
+    number_of_pages = len(pdf)
+    pdf.close()
+    remove_pages(
+        inputs[0],
+        range(1, number_of_pages + 1, 10),
+        output / "removed.pdf",
+        in_place=in_place,
+    )
+
+
+def _remove_pages(inputs: Sequence[str], output: Path) -> None:
+    _remove_every_tenth_page(inputs, output, in_place=False)
+
+
+def _remove_pages_in_place(inputs: Sequence[str], output: Path) -> None:
+    _remove_every_tenth_page(inputs, output, in_place=True)
+
+
+def _pdf_to_image(inputs: Sequence[str], output: Path) -> None:
+    from pdf_helper import pdf_to_image
+
+    pdf_to_image(inputs[0], output, scale=1)
+
+
+def _extract_text(inputs: Sequence[str], output: Path) -> None:
+    from pdf_helper import extract_text
+
+    extract_text(inputs[0])
+
+
+def _split_pdf(inputs: Sequence[str], output: Path) -> None:
+    from pdf_helper import split_pdf
+
+    split_pdf(inputs[0], output)
+
+
+# `bundle` and `merge_pdfs` run once over the whole corpus, the other operations run
+# once for each document
+OPERATIONS: dict[str, Callable[[Sequence[str], Path], None]] = {
+    "bundle": _bundle,
+    "merge_pdfs": _merge_pdfs,
+    "remove_pages": _remove_pages,
+    "remove_pages_in_place": _remove_pages_in_place,
+    "pdf_to_image": _pdf_to_image,
+    "extract_text": _extract_text,
+    "split_pdf": _split_pdf,
+}
+
+
+def build_cases(
+    manifest: dict, operations: Optional[Sequence[str]] = None
+) -> dict[str, dict]:
+    """Build the benchmark cases of a corpus.
+
+    :param manifest: Manifest of the corpus, as returned by `generate_corpus`.
+    :param operations: Operations to benchmark. Defaults to every one of `OPERATIONS`.
+    :return: The cases by name. Each case has the operation, its inputs and the number
+        of pages it processes.
+    """
+    operations = list(operations or OPERATIONS)
+    for operation in operations:
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {operation}")
+    documents = manifest["documents"]
+
+    cases = {}
+    for operation in operations:
+        if operation == "bundle":
+            # Mixed PNG and JPEG images followed by the first document
+            first = next(iter(documents.values()))
+            cases["bundle[images]"] = {
+                "operation": operation,
+                "inputs": [*manifest["images"], first["path"]],
+                "pages": len(manifest["images"]) + first["pages"],
+            }
+        elif operation == "merge_pdfs":
+            cases["merge_pdfs[all]"] = {
+                "operation": operation,
+                "inputs": [document["path"] for document in documents.values()],
+                "pages": sum(document["pages"] for document in documents.values()),
+            }
+        else:
+            for name, document in documents.items():
+                cases[f"{operation}[{name}]"] = {
+                    "operation": operation,
+                    "inputs": [document["path"]],
+                    "pages": document["pages"],
+                }
+    return cases
+
+
+def _peak_rss() -> Optional[int]:
+    """Get the peak resident set size of this process and its children in bytes."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # macOS reports bytes, the other platforms report kilobytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _measure(
+    operation: str, inputs: Sequence[str], output: str, connection: "Connection"
+) -> None:
+    """Run an operation in a worker process and send its measurements back."""
+    # Keep the progress messages of the operations out of the measurements
+    log21.basic_config(level=log21.WARNING)
+    try:
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        OPERATIONS[operation](inputs, Path(output))
+        connection.send(
+            {
+                "wall_time": time.perf_counter() - wall_start,
+                "cpu_time": time.process_time() - cpu_start,
+                "peak_rss": _peak_rss(),
+            }
+        )
+    except BaseException as ex:
+        connection.send({"error": f"{ex.__class__.__name__}: {ex}"})
+    finally:
+        connection.close()
+
+
+def _run_once(case: dict) -> dict:
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    output = tempfile.mkdtemp(prefix="pdf_helper_benchmark_")
+    try:
+        process = context.Process(
+            target=_measure, args=(case["operation"], case["inputs"], output, sender)
+        )
+        process.start()
+        sender.close()
+        try:
+            measurement = receiver.recv()
+        except EOFError:
+            measurement = {"error": "The worker process died"}
+        process.join()
+    finally:
+        shutil.rmtree(output, ignore_errors=True)
+    if "error" in measurement:
+        raise RuntimeError(measurement["error"])
+    return measurement
+
+
+def run_benchmarks(
+    manifest: dict, operations: Optional[Sequence[str]] = None, repeat: int = 3
+) -> dict:
+    """Run the benchmarks over a corpus.
+
+    :param manifest: Manifest of the corpus, as returned by `generate_corpus`.
+    :param operations: Operations to benchmark. Defaults to every one of `OPERATIONS`.
+    :param repeat: Number of times each case runs. The median is reported.
+    :return: The results, ready to be saved as JSON.
+    """
+    from importlib.metadata import version
+
+    from pdf_helper import __version__
+
+    results = {}
+    for name, case in build_cases(manifest, operations).items():
+        log21.info(f"Running {name}...")
+        runs = [_run_once(case) for _ in range(max(repeat, 1))]
+        wall_time = statistics.median(run["wall_time"] for run in runs)
+        peaks = [run["peak_rss"] for run in runs if run["peak_rss"] is not None]
+        results[name] = {
+            "operation": case["operation"],
+            "pages": case["pages"],
+            "wall_time": wall_time,
+            "wall_times": [run["wall_time"] for run in runs],
+            "cpu_time": statistics.median(run["cpu_time"] for run in runs),
+            "pages_per_second": case["pages"] / wall_time if wall_time else None,
+            "peak_rss": max(peaks) if peaks else None,
+        }
+        log21.info(f"{name}: {wall_time:.3f}s")
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "profile": manifest.get("profile"),
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pdf_helper": __version__,
+        "pypdfium2": version("pypdfium2"),
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.1) -> list[str]:
+    """Find the cases that got slower than a baseline.
+
+    :param baseline: Earlier results, as returned by `run_benchmarks`.
+    :param current: New results.
+    :param threshold: Allowed slowdown of the wall time, e.g. 0.1 for 10%.
+    :return: The names of the cases that regressed.
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if old and result["wall_time"] > old["wall_time"] * (1 + threshold):
+            regressions.append(name)
+    return regressions
+
+
+def _format_rss(peak_rss: Optional[int]) -> str:
+    return f"{peak_rss / 1024 / 1024:.1f}" if peak_rss is not None else "-"
+
+
+def _print_table(current: dict, baseline: Optional[dict] = None) -> None:
+    header = (
+        f"{'case':<40} {'pages':>7} {'wall (s)':>10} {'pages/s':>10} {'RSS (MB)':>9}"
+    )
+    if baseline:
+        header += f" {'change':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, result in current["results"].items():
+        pages_per_second = result["pages_per_second"] or 0
+        line = (
+            f"{name:<40} {result['pages']:>7} {result['wall_time']:>10.3f} "
+            f"{pages_per_second:>10.1f} {_format_rss(result['peak_rss']):>9}"
+        )
+        old = baseline["results"].get(name) if baseline else None
+        if old:
+            line += f" {result['wall_time'] / old['wall_time'] - 1:>+8.1%}"
+        print(line)
+
+
+def main(
+    profile: str = "small",
+    corpus_directory: Optional[Path] = None,
+    output: Optional[Path] = None,
+    operations: Optional[str] = None,
+    repeat: int = 3,
+    compare_with: Optional[Path] = None,
+    threshold: float = 0.1,
+    verbose: bool = False,
+) -> None:
+    """Benchmark PDF-Helper over a synthetic corpus.
+
+    :param profile: Corpus profile. One of small, medium and large.
+    :param corpus_directory: Directory of the corpus. It is generated if missing.
+        Defaults to .benchmark-corpus/<profile>.
+    :param output: Path to save the results to as JSON.
+    :param operations: Comma-separated operations to benchmark. Defaults to all.
+    :param repeat: Number of times each case runs. The median is reported.
+    :param compare_with: Results of an earlier run to compare with. Exits with status
+        1 if a case got slower than the threshold allows.
+    :param threshold: Allowed slowdown when comparing, e.g. 0.1 for 10%.
+    :param verbose: Print verbose output.
+    """
+    if profile not in PROFILES:
+        log21.critical(
+            f"Unknown profile `{profile}`. Choose from: {', '.join(PROFILES)}"
+        )
+        sys.exit(1)
+    if verbose:
+        log21.basic_config(level=log21.INFO)
+
+    manifest = generate_corpus(
+        corpus_directory or Path(".benchmark-corpus") / profile, profile
+    )
+    try:
+        results = run_benchmarks(
+            manifest, operations.split(",") if operations else None, repeat
+        )
+    except (ValueError, RuntimeError) as ex:
+        log21.critical(str(ex))
+        sys.exit(1)
+    if output:
+        output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    baseline = None
+    if compare_with:
+        baseline = json.loads(compare_with.read_text(encoding="utf-8"))
+    _print_table(results, baseline)
+    if baseline:
+        regressions = compare(baseline, results, threshold)
+        if regressions:
+            log21.error(
+                f"{len(regressions)} case(s) got more than {threshold:.0%} slower: "
+                + ", ".join(regressions)
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    log21.argumentify(main)
@@ -1,24 +1,54 @@
 # PDF-Helper
 
+# pypdfium2, Pillow and the process pool are imported by the functions that use them,
+# so importing the package (and starting the CLI) stays cheap.
+from __future__ import annotations
+
 import io
 import os
 import sys
-from typing import Optional, Sequence, Collection
+import math
+import mmap
+from typing import (
+    TYPE_CHECKING,
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    Collection,
+)
 from pathlib import Path
 
 import log21
-import pypdfium2 as pdfium
-from PIL import Image
-from pypdfium2 import PdfImage, PdfBitmap, PdfDocument
+
+from . import profiling
+from .utils import PageSet
+
+if TYPE_CHECKING:
+    import tarfile
+    import zipfile
+    from concurrent.futures import Executor
+
+    from PIL import Image
+    from pypdfium2 import PdfPage, PdfDocument
+
+    from .text_cache import TextCache
 
 __version__ = "0.3.1"
 
 __all__ = [
+    "FileInput",
+    "PageSet",
     "bundle",
     "merge_pdfs",
+    "optimize_pdf",
     "remove_pages",
     "pdf_to_image",
+    "pdf_to_thumbnails",
     "extract_text",
+    "iter_text",
     "image_to_pdf",
     "split_pdf",
     "watermark_pdf",
@@ -26,189 +56,1107 @@ __all__ = [
     "set_metadata",
 ]
 
+# An input file: a path, the contents of the file in a buffer, or a binary file object
+FileInput = (
+    str
+    | Path
+    | os.PathLike[str]
+    | bytes
+    | bytearray
+    | memoryview
+    | mmap.mmap
+    | BinaryIO
+)
+
+
+class _BufferReader(io.RawIOBase):
+    """Read-only binary file object over a buffer, reading straight out of it."""
+
+    def __init__(self, view: memoryview) -> None:
+        super().__init__()
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += len(self._view)
+        self._position = max(offset, 0)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def readinto(self, buffer: memoryview | bytearray) -> int:
+        data = self._view[self._position : self._position + len(buffer)]
+        memoryview(buffer).cast("B")[: len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+def _is_path(input_file: object) -> bool:
+    return isinstance(input_file, (str, os.PathLike))
+
+
+def _as_view(input_file: FileInput) -> Optional[memoryview]:
+    """Get a flat byte view of an input held in a buffer, or None for other inputs."""
+    if isinstance(input_file, (bytes, bytearray, memoryview, mmap.mmap)):
+        return memoryview(input_file).cast("B")
+    return None
+
+
+def _open_pdf(input_file: FileInput) -> PdfDocument:
+    """Open a PDF without copying the buffer it is in.
+
+    pdfium reads `bytes` and writable buffers (`bytearray`, `mmap` and memoryviews of
+    them) in place. Read-only buffers are read a block at a time, as files are.
+    """
+    import ctypes
+
+    from pypdfium2 import PdfDocument
+
+    view = _as_view(input_file)
+    if view is None:
+        return PdfDocument(Path(input_file) if _is_path(input_file) else input_file)
+    if not view.readonly:
+        return PdfDocument((ctypes.c_char * len(view)).from_buffer(view))
+    if isinstance(view.obj, bytes) and len(view) == len(view.obj):
+        return PdfDocument(view.obj)
+    return PdfDocument(_BufferReader(view))
+
+
+def _open_image(input_file: FileInput) -> Image.Image:
+    """Open an image, reading a buffer in place. Only the header is read."""
+    from PIL import Image
+
+    view = _as_view(input_file)
+    if view is not None:
+        return Image.open(_BufferReader(view))
+    return Image.open(os.fspath(input_file) if _is_path(input_file) else input_file)
+
+
+def _shareable(input_file: FileInput) -> str | os.PathLike[str] | bytes:
+    """Get a copy of an input that can be sent to worker processes.
+
+    Paths are sent as they are. Buffers and file objects cannot be shared between
+    processes, so their contents are copied into `bytes` once.
+    """
+    if _is_path(input_file) or isinstance(input_file, bytes):
+        return input_file
+    view = _as_view(input_file)
+    if view is not None:
+        return view.tobytes()
+    input_file.seek(0)
+    return input_file.read()
+
+
+def _describe(input_file: FileInput) -> str:
+    """Describe an input in messages without printing the contents of buffers."""
+    if _is_path(input_file):
+        return str(input_file)
+    view = _as_view(input_file)
+    if view is not None:
+        return f"<{len(view)} bytes in memory>"
+    return str(getattr(input_file, "name", input_file))
+
+
+# Signatures the supported files start with, and the types they tell apart. WebP is
+# a RIFF container, told apart by the form type at bytes 8 to 12
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+)
+# pdfium, like other readers, finds the PDF header anywhere in the first kilobyte
+_HEADER_SIZE = 1024
+
+
+def _file_type(input_file: FileInput) -> str:
+    """Tell whether an input is a PDF or an image from its first bytes, without
+    parsing it. File objects are read from their start, as pdfium reads them, and left
+    at the position they were at.
+
+    :param input_file: Input to look at.
+    :return: `pdf`, or the format of the image: `jpeg`, `png`, `tiff`, `webp`, `gif`
+        or `bmp`.
+    :raises ValueError: If the input is neither a PDF nor an image of these formats.
+    """
+    view = _as_view(input_file)
+    if view is not None:
+        header = view[:_HEADER_SIZE].tobytes()
+    elif _is_path(input_file):
+        with open(input_file, "rb") as file:
+            header = file.read(_HEADER_SIZE)
+    elif hasattr(input_file, "read"):
+        position = input_file.tell()
+        input_file.seek(0)
+        header = input_file.read(_HEADER_SIZE)
+        input_file.seek(position)
+    else:
+        raise ValueError(f"Unsupported input file type: {type(input_file)}")
+    for signature, file_type in _SIGNATURES:
+        if header.startswith(signature):
+            return file_type
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    if b"%PDF-" in header:
+        return "pdf"
+    raise ValueError(f"{_describe(input_file)} is neither a PDF nor a supported image")
+
+
+def _input_name(input_file: FileInput, name: Optional[str]) -> str:
+    """Get the name to give the outputs of an input: `name`, or the name of the file
+    of the input without its extension.
+
+    :raises ValueError: If `name` is None and the input has no file name.
+    """
+    if name is not None:
+        return name
+    path = input_file if _is_path(input_file) else getattr(input_file, "name", None)
+    # The file objects of pipes and descriptors are named by an integer
+    if not _is_path(path):
+        raise ValueError("Pass `name` to name the outputs of an input without a path")
+    return Path(path).stem
+
+
+def _add_to_archive(
+    archive: tarfile.TarFile | zipfile.ZipFile, files: Iterable[tuple[str, bytes]]
+) -> None:
+    """Add files, given by their names and contents, to a tar or zip archive."""
+    import time
+    import zipfile
+
+    for name, data in files:
+        if isinstance(archive, zipfile.ZipFile):
+            # The images and PDFs are compressed already
+            archive.writestr(name, data, zipfile.ZIP_STORED)
+        else:
+            import tarfile
+
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            archive.addfile(info, io.BytesIO(data))
+
+
+def _in_order(
+    executor: Executor, calls: Iterable[tuple[Callable, tuple]], window: int
+) -> Iterator[object]:
+    """Run calls on an executor and yield their results in order, keeping at most
+    `window` of them submitted before their results are taken."""
+    import collections
+
+    futures: collections.deque = collections.deque()
+    try:
+        for function, args in calls:
+            futures.append(profiling.submit(executor, function, *args))
+            if len(futures) >= window:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _add_image_page(writer: PdfDocument, input_file: FileInput) -> None:
+    """Add an image to a PDF as a new page of the same size.
+
+    JPEG images are embedded as they are, without decoding and re-encoding them. Other
+    formats are converted to a bitmap first.
+
+    :param writer: PDF to add the page to.
+    :param input_file: Image to add.
+    """
+    from pypdfium2 import PdfImage, PdfBitmap, PdfMatrix
+
+    # Opening the image only reads its header, the pixels are decoded on demand
+    image = _open_image(input_file)
+    width, height = image.size
+    pdf_image = PdfImage.new(writer)
+    bitmap = None
+    try:
+        with profiling.span("import", kind="image", format=image.format):
+            if image.format == "JPEG":
+                # Pillow holds the file object it read the header from
+                image.fp.seek(0)
+                pdf_image.load_jpeg(image.fp, inline=True, autoclose=False)
+            else:
+                bitmap = PdfBitmap.from_pil(image)
+                pdf_image.set_bitmap(bitmap)
+            matrix = PdfMatrix().scale(width, height)
+            pdf_image.set_matrix(matrix)
+            page = writer.new_page(width, height)
+            page.insert_obj(pdf_image)
+            page.gen_content()
+            page.close()
+            profiling.count(pages=1)
+    finally:
+        pdf_image.close()
+        if bitmap is not None:
+            bitmap.close()
+        image.close()
+
+
+def _import_pages(
+    writer: PdfDocument, reader: PdfDocument, pages: Optional[Sequence[int]] = None
+) -> None:
+    """Import pages (all of them by default) from one PDF into another."""
+    with profiling.span("import"):
+        writer.import_pages(reader, pages)
+        profiling.count(pages=len(reader) if pages is None else len(pages))
+
+
+def _write(output_stream: str | Path | BinaryIO, data: bytes) -> None:
+    """Write the contents of a file to a path or a binary file object."""
+    if _is_path(output_stream):
+        Path(output_stream).write_bytes(data)
+    else:
+        output_stream.write(data)
+
+
+def _save(
+    writer: PdfDocument,
+    output_stream: str | Path | io.BytesIO | io.BufferedWriter,
+    dedupe: bool,
+) -> None:
+    """Save a PDF, storing its identical streams once with `dedupe`."""
+    with profiling.span("save"):
+        if not dedupe:
+            writer.save(output_stream)
+            return
+        buffer = io.BytesIO()
+        writer.save(buffer)
+    from .dedupe import dedupe_streams
+
+    with profiling.span("dedupe"):
+        _write(output_stream, dedupe_streams(buffer.getvalue()))
+
 
 def bundle(
-    input_files: Sequence[str | bytes | Path | os.PathLike[str] | io.BytesIO],
+    input_files: Sequence[FileInput],
     output_stream: str | Path | io.BytesIO | io.BufferedWriter,
+    dedupe: bool = False,
 ) -> int:
     """Bundle multiple files together.
 
-    :param input_files: List of files to bundle together. Each file can be a PDF or an
-        image. Supported image formats are those supported by Pillow.
+    :param input_files: List of files to bundle together. Each file can be a PDF or a
+        JPEG, PNG, TIFF, WebP, GIF or BMP image, told apart by their contents.
     :param output_stream: Output stream to write to.
+    :param dedupe: Store identical streams, e.g. the fonts, logos and ICC profiles of
+        files made by the same generator, once. Slower to save, and the PDF is held in
+        memory while it is rewritten.
     :return: Number of pages in the bundled PDF.
     """
+    from pypdfium2 import PdfDocument
+
+    # Every input is checked before any of them is parsed
+    file_types = [_file_type(input_file) for input_file in input_files]
     writer = PdfDocument.new()
-    for input_file in input_files:
-        log21.info(f"Adding {input_file}...")
-        if isinstance(input_file, (str, bytes, Path, os.PathLike)):
-            if str(input_file).lower().endswith(".pdf"):
-                reader = PdfDocument(input_file)
-                writer.import_pages(reader)
-                reader.close()
-            else:
-                image = Image.open(input_file)
-                bitmap = PdfBitmap.from_pil(image)
-                pdf_image = PdfImage.new(writer)
-                pdf_image.set_bitmap(bitmap)
-                matrix = pdfium.PdfMatrix().scale(bitmap.width, bitmap.height)
-                pdf_image.set_matrix(matrix)
-                page = writer.new_page(bitmap.width, bitmap.height)
-                page.insert_obj(pdf_image)
-                page.gen_content()
-                page.close()
-                pdf_image.close()
-                bitmap.close()
-                image.close()
-        elif isinstance(input_file, io.BytesIO):
-            try:
-                reader = PdfDocument(input_file)
-                writer.import_pages(reader)
-            except Exception:
-                image = Image.open(input_file)
-                bitmap = PdfBitmap.from_pil(image)
-                pdf_image = PdfImage.new(writer)
-                pdf_image.set_bitmap(bitmap)
-                matrix = pdfium.PdfMatrix().scale(bitmap.width, bitmap.height)
-                pdf_image.set_matrix(matrix)
-                page = writer.new_page(bitmap.width, bitmap.height)
-                page.insert_obj(pdf_image)
-                page.gen_content()
-                page.close()
-                pdf_image.close()
-                bitmap.close()
-                image.close()
+    for input_file, file_type in zip(input_files, file_types, strict=True):
+        log21.info(f"Adding {_describe(input_file)}...")
+        if file_type == "pdf":
+            with profiling.span("open"):
+                reader = _open_pdf(input_file)
+            _import_pages(writer, reader)
+            reader.close()
         else:
-            raise ValueError(f"Unsupported input file type: {type(input_file)}")
-    writer.save(output_stream)
+            _add_image_page(writer, input_file)
+    _save(writer, output_stream, dedupe)
     return len(writer)
 
 
 def merge_pdfs(
-    input_files: Sequence[str | Path | io.TextIOWrapper],
+    input_files: Sequence[FileInput],
     output_stream: str | Path | io.BytesIO | io.BufferedWriter,
+    dedupe: bool = False,
 ) -> int:
     """Merge PDF files.
 
     :param input_files: List of PDF files to concatenate.
     :param output_stream: Output stream to write to.
+    :param dedupe: Store identical streams, e.g. the fonts, logos and ICC profiles of
+        files made by the same generator, once. Slower to save, and the PDF is held in
+        memory while it is rewritten.
     :return: Number of pages of the merged PDF.
     """
+    from pypdfium2 import PdfDocument
+
     writer = PdfDocument.new()
     for input_file in input_files:
-        log21.info(f"Adding {input_file}...")
-        reader = PdfDocument(input_file)
-        writer.import_pages(reader)
-    writer.save(output_stream)
+        log21.info(f"Adding {_describe(input_file)}...")
+        with profiling.span("open"):
+            reader = _open_pdf(input_file)
+        _import_pages(writer, reader)
+        reader.close()
+    _save(writer, output_stream, dedupe)
     return len(writer)
 
 
+def optimize_pdf(
+    input_file: FileInput,
+    output_stream: str | Path | io.BytesIO | io.BufferedWriter,
+) -> int:
+    """Store the identical streams of a PDF file once, e.g. in a PDF merged from files
+    made by the same generator.
+
+    The PDF is saved again by pdfium first, which unpacks compressed object streams
+    and may outweigh what deduplicating saves; the input is then written as it is.
+    Encrypted PDFs are not deduplicated.
+
+    :param input_file: PDF file to optimize.
+    :param output_stream: Output stream to write to.
+    :return: Number of bytes saved.
+    """
+    from .dedupe import dedupe_streams
+
+    with profiling.span("open"):
+        reader = _open_pdf(input_file)
+    buffer = io.BytesIO()
+    with profiling.span("save"):
+        reader.save(buffer, version=reader.get_version())
+    reader.close()
+    with profiling.span("dedupe"):
+        data = dedupe_streams(buffer.getvalue())
+    shared = _shareable(input_file)
+    original = Path(shared).read_bytes() if _is_path(shared) else shared
+    if len(data) >= len(original):
+        data = original
+    _write(output_stream, data)
+    return len(original) - len(data)
+
+
 def image_to_pdf(
-    input_files: Sequence[str | bytes | Path | os.PathLike[str] | io.BytesIO],
+    input_files: Sequence[FileInput],
     output_stream: str | Path | io.BytesIO | io.BufferedWriter,
 ) -> int:
     """Convert images to a PDF file.
 
-    :param input_files: List of images to convert.
+    :param input_files: List of JPEG, PNG, TIFF, WebP, GIF or BMP images to convert.
     :param output_stream: Output stream to write to.
     :return: Number of pages in the output PDF
     """
+    from pypdfium2 import PdfDocument
+
+    for input_file in input_files:
+        if _file_type(input_file) == "pdf":
+            raise ValueError(f"{_describe(input_file)} is a PDF, not an image")
     writer = PdfDocument.new()
     for input_file in input_files:
-        log21.info(f"Adding {input_file}...")
-        # Open the image file
-        image = Image.open(input_file)
-        # Create a bitmap from the image
-        bitmap = PdfBitmap.from_pil(image)
-        # Create a PdfImage object from the bitmap
-        pdf_image = PdfImage.new(writer)
-        pdf_image.set_bitmap(bitmap)
-        matrix = pdfium.PdfMatrix().scale(bitmap.width, bitmap.height)
-        pdf_image.set_matrix(matrix)
-        # Create a new page and insert the PdfImage object
-        page = writer.new_page(bitmap.width, bitmap.height)
-        page.insert_obj(pdf_image)
-        page.gen_content()
-        # Close the objects
-        page.close()
-        pdf_image.close()
-        bitmap.close()
-        image.close()
-    writer.save(output_stream)
+        log21.info(f"Adding {_describe(input_file)}...")
+        _add_image_page(writer, input_file)
+    with profiling.span("save"):
+        writer.save(output_stream)
     return len(writer)
 
 
 def remove_pages(
-    input_file: str | Path | io.BytesIO | io.TextIOWrapper,
-    pages_to_remove: Collection[int],
+    input_file: FileInput,
+    pages_to_remove: PageSet | str | Collection[int],
     output_stream: str | Path | io.BytesIO | io.BufferedWriter,
+    in_place: bool = False,
 ) -> int:
     """Remove pages from a PDF file.
 
+    By default the pages to keep are imported into a new document. With `in_place`,
+    the pages to remove are deleted from the opened source document instead, which is
+    then saved. pdfium walks the page tree for every deleted page, so importing is as
+    fast for a few pages and much faster for many (see `remove_pages[...]` and
+    `remove_pages_in_place[...]` in the benchmark suite).
+
     :param input_file: PDF file to remove pages from.
-    :param pages_to_remove: List of pages to remove. A one based collection of indices.
+    :param pages_to_remove: Pages to remove. A `PageSet`, a page range string or a one
+        based collection of indices. Pages that do not exist are ignored.
     :param output_stream: Output stream to write to.
+    :param in_place: Delete the pages from the source document instead of copying the
+        others to a new one.
     :return: Number of pages removed.
     """
-    writer = PdfDocument.new()
-    reader = PdfDocument(input_file)
-    pages_to_remove = tuple((i - 1 for i in pages_to_remove))
-    pages_to_add = [i for i in range(len(reader)) if i not in pages_to_remove]
-    writer.import_pages(reader, pages_to_add)
-    writer.save(output_stream, version=reader.get_version())
-    writer.close()
-    pages_removed = len(reader) - len(pages_to_add)
-    reader.close()
-    return pages_removed
+    from pypdfium2 import PdfDocument
+
+    with profiling.span("open"):
+        reader = _open_pdf(input_file)
+    number_of_pages = len(reader)
+    pages_to_remove = PageSet.of(pages_to_remove).resolve(number_of_pages)
+    try:
+        if in_place:
+            with profiling.span("delete"):
+                # From the end, so the indices of the pages left to delete stay valid
+                for i in reversed(pages_to_remove):
+                    reader.del_page(i - 1)
+                profiling.count(pages=len(pages_to_remove))
+            with profiling.span("save"):
+                reader.save(output_stream, version=reader.get_version())
+            return len(pages_to_remove)
+
+        writer = PdfDocument.new()
+        pages_to_add = [
+            i for i in range(number_of_pages) if i + 1 not in pages_to_remove
+        ]
+        _import_pages(writer, reader, pages_to_add)
+        with profiling.span("save"):
+            writer.save(output_stream, version=reader.get_version())
+        writer.close()
+        return number_of_pages - len(pages_to_add)
+    finally:
+        reader.close()
+
+
+# Number of pages each worker process renders at a time for an archive
+_ARCHIVE_CHUNK_SIZE = 8
+
+# Pillow format and file extension of each format `pdf_to_image` can write
+_IMAGE_FORMATS = {
+    "png": ("PNG", "png"),
+    "jpeg": ("JPEG", "jpg"),
+    "jpg": ("JPEG", "jpg"),
+    "webp": ("WEBP", "webp"),
+}
+
+
+def _render_options(
+    scale: float = 2,
+    image_format: str = "png",
+    quality: int = 85,
+    grayscale: bool = False,
+    png_compress_level: int = 6,
+    dpi: Optional[float] = None,
+    fit_width: Optional[int] = None,
+    fit_height: Optional[int] = None,
+    max_pixels: Optional[int] = None,
+    tile_size: Optional[int] = None,
+    separate_tiles: bool = False,
+) -> dict:
+    """Check the rendering options of `pdf_to_image` and gather them in a dictionary
+    that can be sent to worker processes.
+
+    :raises ValueError: If an option is invalid.
+    """
+    for option, value in (
+        ("scale", scale),
+        ("DPI", dpi),
+        ("width to fit", fit_width),
+        ("height to fit", fit_height),
+        ("maximum number of pixels", max_pixels),
+        ("tile size", tile_size),
+    ):
+        if value is not None and value <= 0:
+            raise ValueError(f"The {option} must be above 0")
+    if image_format.lower() not in _IMAGE_FORMATS:
+        raise ValueError(
+            f"Unsupported image format `{image_format}`. Choose from: "
+            + ", ".join(_IMAGE_FORMATS)
+        )
+    if not 1 <= quality <= 100:
+        raise ValueError("The quality must be between 1 and 100")
+    if not 0 <= png_compress_level <= 9:
+        raise ValueError("The PNG compression level must be between 0 and 9")
+    pillow_format, extension = _IMAGE_FORMATS[image_format.lower()]
+    if pillow_format == "PNG":
+        save = {"format": pillow_format, "compress_level": png_compress_level}
+    else:
+        save = {"format": pillow_format, "quality": quality}
+    return {
+        "scale": scale,
+        "dpi": dpi,
+        "fit_width": fit_width,
+        "fit_height": fit_height,
+        "max_pixels": max_pixels,
+        "tile_size": tile_size,
+        "separate_tiles": separate_tiles,
+        "grayscale": grayscale,
+        "extension": extension,
+        "save": save,
+    }
+
+
+def _page_scale(width: float, height: float, options: dict) -> float:
+    """Get the scale to render a page at.
+
+    :param width: Width of the page in points.
+    :param height: Height of the page in points.
+    :param options: Rendering options, see `_render_options`.
+    """
+    fits = [
+        size / length
+        for size, length in (
+            (options["fit_width"], width),
+            (options["fit_height"], height),
+        )
+        if size
+    ]
+    if fits:
+        scale = min(fits)
+    elif options["dpi"]:
+        scale = options["dpi"] / 72
+    else:
+        scale = options["scale"]
+
+    max_pixels = options["max_pixels"]
+    if max_pixels and math.ceil(width * scale) * math.ceil(height * scale) > max_pixels:
+        # pdfium rounds the size of the bitmap up, so solve
+        # (width * scale + 1) * (height * scale + 1) = max_pixels for the scale
+        area = width * height
+        scale = (
+            -(width + height)
+            + math.sqrt((width + height) ** 2 + 4 * area * (max_pixels - 1))
+        ) / (2 * area)
+    return scale
+
+
+def _render_pages(
+    input_file: str | os.PathLike[str] | bytes,
+    output_directory: Optional[Path],
+    name: str,
+    length: int,
+    pages: Sequence[int],
+    options: dict,
+) -> list[tuple[str, bytes]]:
+    """Render a range of pages to image files.
+
+    Runs in a worker process, so it opens its own copy of the document; pdfium
+    handles must never be shared between processes or threads.
+
+    :param input_file: PDF file to render, see `_shareable`.
+    :param output_directory: Directory to write images to. If None, the images are
+        returned instead.
+    :param name: Base name of the image files.
+    :param length: Number of digits of the page number in the image file names.
+    :param pages: One based page numbers to render.
+    :param options: Rendering options, see `_render_options`.
+    :return: The names and contents of the images, if they are not written.
+    """
+    files = [] if output_directory is None else None
+    with profiling.span("open"):
+        pdf = _open_pdf(input_file)
+    try:
+        for i in pages:
+            output_file = Path(f"{name}-{i:0>{length}}.{options['extension']}")
+            if output_directory is not None:
+                output_file = output_directory / output_file
+            _render_page(pdf, i, output_file, options, files)
+    finally:
+        pdf.close()
+    return files or []
+
+
+def _save_image(
+    image: Image.Image,
+    output_file: Path,
+    options: dict,
+    files: Optional[list[tuple[str, bytes]]],
+) -> None:
+    """Save an image to `output_file`, or encode it and add its name and contents to
+    `files` if that is not None."""
+    if files is None:
+        image.save(output_file, **options["save"])
+        return
+    buffer = io.BytesIO()
+    image.save(buffer, **options["save"])
+    files.append((output_file.name, buffer.getvalue()))
+
+
+def _render_page(
+    pdf: PdfDocument,
+    i: int,
+    output_file: Path,
+    options: dict,
+    files: Optional[list[tuple[str, bytes]]] = None,
+) -> None:
+    """Render a page and save it as an image.
+
+    :param pdf: Document to render the page of.
+    :param i: One based page number.
+    :param output_file: Path of the image.
+    :param options: Rendering options, see `_render_options`.
+    :param files: List to add the names and contents of the images to instead of
+        writing them, see `_save_image`.
+    """
+    page = pdf[i - 1]
+    try:
+        page_width, page_height = page.get_size()
+        scale = _page_scale(page_width, page_height, options)
+        width = math.ceil(page_width * scale)
+        height = math.ceil(page_height * scale)
+        tile_size = options["tile_size"]
+        if tile_size and (width > tile_size or height > tile_size):
+            _render_tiles(page, i, output_file, options, scale, (width, height), files)
+            return
+        with profiling.span("render", page=i):
+            # pdfium renders grayscale pages to one byte per pixel bitmaps, which
+            # are a third of the size of colour ones and need no conversion
+            bitmap = page.render(scale=scale, grayscale=options["grayscale"])
+        with profiling.span("encode", page=i, format=options["save"]["format"]):
+            _save_image(bitmap.to_pil(), output_file, options, files)
+            profiling.count(pages=1)
+    finally:
+        page.close()
+
+
+def _render_tiles(
+    page: PdfPage,
+    i: int,
+    output_file: Path,
+    options: dict,
+    scale: float,
+    size: tuple[int, int],
+    files: Optional[list[tuple[str, bytes]]] = None,
+) -> None:
+    """Render a page as a grid of tiles, one tile at a time.
+
+    With `separate_tiles`, each tile is saved as its own image (`<name>-tile-<row>-
+    <column>`), so the memory used does not depend on the size of the page. Otherwise
+    the tiles are pasted into one image, which still saves pdfium's bitmap of the whole
+    page.
+
+    :param page: Page to render.
+    :param i: One based page number.
+    :param output_file: Path of the image.
+    :param options: Rendering options, see `_render_options`.
+    :param scale: Scale to render the page at.
+    :param size: Width and height of the whole page in pixels.
+    :param files: List to add the names and contents of the images to instead of
+        writing them, see `_save_image`.
+    """
+    from PIL import Image
+
+    width, height = size
+    tile_size = options["tile_size"]
+    stitched = None
+    if not options["separate_tiles"]:
+        mode = "L" if options["grayscale"] else "RGB"
+        stitched = Image.new(mode, (width, height), "white")
+    for row, top in enumerate(range(0, height, tile_size), start=1):
+        bottom = min(top + tile_size, height)
+        for column, left in enumerate(range(0, width, tile_size), start=1):
+            right = min(left + tile_size, width)
+            # pdfium rounds each crop margin up to whole pixels, so margins half a
+            # pixel short land exactly on the edges of the tile
+            crop = tuple(
+                (margin - 0.5) / scale
+                for margin in (left, height - bottom, width - right, top)
+            )
+            with profiling.span("render", page=i, tile=f"{row},{column}"):
+                bitmap = page.render(
+                    scale=scale, crop=crop, grayscale=options["grayscale"]
+                )
+                tile = bitmap.to_pil()
+            if stitched is not None:
+                stitched.paste(tile, (left, top))
+            else:
+                tile_file = output_file.with_name(
+                    f"{output_file.stem}-tile-{row}-{column}{output_file.suffix}"
+                )
+                with profiling.span("encode", page=i, tile=f"{row},{column}"):
+                    _save_image(tile, tile_file, options, files)
+            bitmap.close()
+    if stitched is not None:
+        with profiling.span("encode", page=i, format=options["save"]["format"]):
+            _save_image(stitched, output_file, options, files)
+            stitched.close()
+    profiling.count(pages=1)
 
 
 def pdf_to_image(
-    input_file: str | Path,
-    output_directory: str | Path,
-    pages_to_convert: Optional[Collection[int]] = None,
-    scale: int = 2,
+    input_file: FileInput,
+    output_directory: str | Path | tarfile.TarFile | zipfile.ZipFile,
+    pages_to_convert: Optional[PageSet | str | Collection[int]] = None,
+    scale: float = 2,
+    workers: int = 1,
+    format: str = "png",
+    quality: int = 85,
+    grayscale: bool = False,
+    png_compress_level: int = 6,
+    dpi: Optional[float] = None,
+    fit_width: Optional[int] = None,
+    fit_height: Optional[int] = None,
+    max_pixels: Optional[int] = None,
+    tile_size: Optional[int] = None,
+    separate_tiles: bool = False,
+    name: Optional[str] = None,
 ) -> int:
     """Convert a PDF file to a series of images.
 
     :param input_file: PDF file to convert.
-    :param output_directory: Directory to write images to.
+    :param output_directory: Directory to write images to, or an open tar or zip
+        archive to add them to in page order. Tar archives may be streams (mode `w|`).
+    :param pages_to_convert: Pages to convert, all of them by default. A `PageSet`, a
+        page range string or one based page numbers. Pages that do not exist are
+        ignored.
     :param scale: Scale of each image.
+    :param workers: Number of processes to render the pages with. The pages are split
+        into contiguous ranges, one per process, or into ranges of a few pages that are
+        added to an archive as soon as they are done. Values below 1 use all the
+        available CPU cores.
+    :param format: Image format: `png`, `jpeg` (or `jpg`) or `webp`. JPEG encodes
+        several times faster than PNG, and WebP gives the smallest files.
+    :param quality: Quality of JPEG and WebP images, from 1 to 100.
+    :param grayscale: Render the pages in grayscale, to one byte per pixel instead of
+        three.
+    :param png_compress_level: zlib compression level of PNG images, from 0 (none) to
+        9 (smallest). 1 encodes much faster for somewhat larger files.
+    :param dpi: Render the pages at this resolution instead of `scale`.
+    :param fit_width: Render each page at the scale that makes it this many pixels
+        wide. Overrides `scale` and `dpi`.
+    :param fit_height: Render each page at the scale that makes it this many pixels
+        high. With `fit_width`, the page is fit into both.
+    :param max_pixels: Lower the scale of the pages that would have more pixels than
+        this.
+    :param tile_size: Render the pages that are larger than this many pixels in either
+        direction as a grid of tiles of at most this size, one tile at a time, and
+        paste them into one image.
+    :param separate_tiles: Save each tile as its own image (`<name>-tile-<row>-
+        <column>`) instead of pasting them together, so the memory used does not
+        depend on the size of the page.
+    :param name: Base name of the images (`<name>-<page>`). Defaults to the name of
+        the input file without its extension, and is required for inputs without one.
+    :raises ValueError: If an option is invalid.
     :return: Number of pages converted to image
     """
-    if isinstance(input_file, str):
-        input_file = Path(input_file)
-    if isinstance(output_directory, str):
+    options = _render_options(
+        scale,
+        format,
+        quality,
+        grayscale,
+        png_compress_level,
+        dpi,
+        fit_width,
+        fit_height,
+        max_pixels,
+        tile_size,
+        separate_tiles,
+    )
+    name = _input_name(input_file, name)
+    archive = None
+    if _is_path(output_directory):
         output_directory = Path(output_directory)
-    if not output_directory.exists():
-        output_directory.mkdir(parents=True)
+        output_directory.mkdir(parents=True, exist_ok=True)
+    else:
+        archive, output_directory = output_directory, None
+    if workers < 1:
+        workers = os.cpu_count() or 1
 
-    pdf = pdfium.PdfDocument(input_file)
-    name = input_file.name.rsplit(".", maxsplit=1)[0]
+    with profiling.span("open"):
+        pdf = _open_pdf(input_file)
+    number_of_pages = len(pdf)
     # Number of digits each number in the filename should have
-    length = len(str(len(pdf)))
+    length = len(str(number_of_pages))
+    if not pages_to_convert:
+        pages = PageSet(range(1, number_of_pages + 1))
+    else:
+        pages = PageSet.of(pages_to_convert).resolve(number_of_pages)
+    converted = len(pages)
+
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        pdf.close()
+        input_file = _shareable(input_file)
+        # Split the pages into contiguous ranges, one per worker process
+        chunk_size = max(-(-len(pages) // workers), 1)
+        if archive is not None:
+            # Small ranges, so the images held until they are archived stay few
+            chunk_size = min(chunk_size, _ARCHIVE_CHUNK_SIZE)
+        chunks = [pages[i : i + chunk_size] for i in range(0, len(pages), chunk_size)]
+        workers = max(min(workers, len(chunks)), 1)
+        log21.info(f"Converting {len(pages)} pages using {workers} processes...")
+        if archive is not None:
+            calls = (
+                (_render_pages, (input_file, None, name, length, chunk, options))
+                for chunk in chunks
+            )
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for files in _in_order(executor, calls, 2 * workers):
+                    _add_to_archive(archive, files)
+            return converted
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                profiling.submit(
+                    executor,
+                    _render_pages,
+                    input_file,
+                    output_directory,
+                    name,
+                    length,
+                    chunk,
+                    options,
+                )
+                for chunk in chunks
+            ]
+            for future in futures:
+                future.result()
+        return converted
+
     try:
-        if not pages_to_convert:
-            for i, page in enumerate(pdf, start=1):
-                log21.info(f"Converting page {i}...", end="\r")
-                image = page.render(scale=scale).to_pil()
-                image.save(output_directory / f"{name}-{i:0>{length}}.png")
-            return len(pdf)
-        for i, page in enumerate(pdf, start=1):
-            if i not in pages_to_convert:
-                continue
+        for i in pages:
             log21.info(f"Converting page {i}...", end="\r")
-            image = page.render(scale=scale).to_pil()
-            image.save(output_directory / f"{name}-{i:0>{length}}.png")
-        return len(pages_to_convert)
+            output_file = Path(f"{name}-{i:0>{length}}.{options['extension']}")
+            if archive is None:
+                _render_page(pdf, i, output_directory / output_file, options)
+                continue
+            files: list[tuple[str, bytes]] = []
+            _render_page(pdf, i, output_file, options, files)
+            _add_to_archive(archive, files)
+        return converted
     finally:
         pdf.close()
 
 
+# Space between and around the thumbnails of a contact sheet, in pixels
+_SHEET_SPACING = 8
+
+
+def pdf_to_thumbnails(
+    input_file: FileInput,
+    output: str | Path,
+    pages_to_convert: Optional[PageSet | str | Collection[int]] = None,
+    width: int = 200,
+    grayscale: bool = False,
+    contact_sheet: bool = False,
+    columns: int = 0,
+    format: Optional[str] = None,
+    quality: int = 85,
+    name: Optional[str] = None,
+) -> int:
+    """Render small previews of the pages of a PDF file.
+
+    The pages are rendered with pdfium's cheapest settings, without anti-aliasing,
+    annotations or form fields, which cost time and barely show at thumbnail sizes.
+    A contact sheet also saves encoding and writing one file per page.
+
+    :param input_file: PDF file to render.
+    :param output: Directory to write one image per page to, or with `contact_sheet`
+        the path of the contact sheet.
+    :param pages_to_convert: Pages to render, all of them by default. A `PageSet`, a
+        page range string or one based page numbers.
+    :param width: Width of each thumbnail in pixels.
+    :param grayscale: Render the thumbnails in grayscale.
+    :param contact_sheet: Pack every thumbnail into a grid in one image.
+    :param columns: Number of columns of the contact sheet. Defaults to about the
+        square root of the number of pages.
+    :param format: Image format: `png`, `jpeg` (or `jpg`) or `webp`. Defaults to the
+        extension of a contact sheet, and to `png` otherwise.
+    :param quality: Quality of JPEG and WebP images, from 1 to 100.
+    :param name: Base name of the images (`<name>-<page>`) when there is no contact
+        sheet. Defaults to the name of the input file without its extension, and is
+        required for inputs without one.
+    :raises ValueError: If an option is invalid.
+    :return: Number of pages rendered.
+    """
+    output = Path(output)
+    if format is None:
+        extension = output.suffix.lower().lstrip(".")
+        format = extension if contact_sheet and extension in _IMAGE_FORMATS else "png"
+    options = _render_options(image_format=format, quality=quality, grayscale=grayscale)
+    if width <= 0:
+        raise ValueError("The width must be above 0")
+    if not contact_sheet:
+        name = _input_name(input_file, name)
+    if contact_sheet:
+        output.parent.mkdir(parents=True, exist_ok=True)
+    else:
+        output.mkdir(parents=True, exist_ok=True)
+
+    with profiling.span("open"):
+        pdf = _open_pdf(input_file)
+    try:
+        number_of_pages = len(pdf)
+        if pages_to_convert:
+            pages = PageSet.of(pages_to_convert).resolve(number_of_pages)
+        else:
+            pages = PageSet(range(1, number_of_pages + 1))
+        if not pages:
+            return 0
+        sizes = [pdf.get_page_size(i - 1) for i in pages]
+        heights = [math.ceil(height * width / w) for w, height in sizes]
+
+        sheet = None
+        if contact_sheet:
+            from PIL import Image
+
+            columns = columns if columns > 0 else math.ceil(math.sqrt(len(pages)))
+            rows = -(-len(pages) // columns)
+            cell_height = max(heights)
+            sheet = Image.new(
+                "L" if grayscale else "RGB",
+                (
+                    columns * (width + _SHEET_SPACING) + _SHEET_SPACING,
+                    rows * (cell_height + _SHEET_SPACING) + _SHEET_SPACING,
+                ),
+                "white",
+            )
+        length = len(str(number_of_pages))
+
+        for n, i in enumerate(pages):
+            page = pdf[i - 1]
+            try:
+                with profiling.span("render", page=i):
+                    bitmap = page.render(
+                        scale=width / sizes[n][0],
+                        grayscale=grayscale,
+                        may_draw_forms=False,
+                        draw_annots=False,
+                        no_smoothtext=True,
+                        no_smoothimage=True,
+                        no_smoothpath=True,
+                    )
+                    image = bitmap.to_pil()
+            finally:
+                page.close()
+            if sheet is not None:
+                row, column = divmod(n, columns)
+                position = (
+                    _SHEET_SPACING + column * (width + _SHEET_SPACING),
+                    _SHEET_SPACING + row * (cell_height + _SHEET_SPACING),
+                )
+                sheet.paste(image, position)
+                profiling.count(pages=1)
+            else:
+                output_file = output / f"{name}-{i:0>{length}}.{options['extension']}"
+                with profiling.span("encode", page=i):
+                    image.save(output_file, **options["save"])
+                    profiling.count(pages=1)
+            bitmap.close()
+
+        if sheet is not None:
+            with profiling.span("encode", format=options["save"]["format"]):
+                sheet.save(output, **options["save"])
+            sheet.close()
+        return len(pages)
+    finally:
+        pdf.close()
+
+
+def _reverse_lines(text: str) -> str:
+    """Reverse the characters of each line, keeping the line endings in place."""
+    return "".join(
+        line.rstrip("\r\n")[::-1] + line[len(line.rstrip("\r\n")) :]
+        for line in text.splitlines(keepends=True)
+    )
+
+
+def iter_text(
+    input_file: FileInput,
+    pages_to_extract_from: Optional[PageSet | str | Collection[int]] = None,
+    max_number_of_characters: int = -1,
+    reverse_lines: bool = False,
+    cache: Optional[TextCache] = None,
+) -> Iterator[tuple[int, str]]:
+    """Extract text from a PDF file one page at a time.
+
+    Only the text of the current page is held in memory, so this can be used to stream
+    the text of large documents.
+
+    :param input_file: PDF file to extract text from.
+    :param pages_to_extract_from: Pages to extract text from, all of them by default. A
+        `PageSet`, a page range string or one based page numbers.
+    :param max_number_of_characters: Maximum number of characters to extract in total.
+        The generator stops as soon as this budget is used up.
+    :param reverse_lines: Reverse the characters in each line (Useful for Persian text)
+    :param cache: Cache to take the text of the pages from, and to store the text of
+        the pages that are not cached yet in. The PDF is not even opened when every
+        page is cached.
+    :return: A generator of one based page numbers and the text of those pages.
+    """
+    pdf = None
+    digest = cache.document_key(input_file) if cache is not None else None
+    number_of_pages = cache.page_count(digest) if digest else None
+    if number_of_pages is None:
+        with profiling.span("open"):
+            pdf = _open_pdf(input_file)
+        number_of_pages = len(pdf)
+        if digest:
+            cache.set_page_count(digest, number_of_pages)
+    fresh: dict[int, str] = {}
+    try:
+        if pages_to_extract_from:
+            pages = PageSet.of(pages_to_extract_from)
+            try:
+                pages.validate(number_of_pages)
+            except ValueError as ex:
+                log21.critical(
+                    f"{ex}: `{_describe(input_file)}` has {number_of_pages} pages"
+                )
+                sys.exit(1)
+            pages = pages.resolve(number_of_pages)
+            log21.info(
+                f"Extracting text from {len(pages)} page"
+                + ("s" if len(pages) > 1 else "")
+                + f" from `{_describe(input_file)}`..."
+            )
+        else:
+            pages = PageSet(range(1, number_of_pages + 1))
+
+        remaining = max_number_of_characters
+        cached: dict[int, str] = {}
+        for n, i in enumerate(pages):
+            if remaining == 0:
+                break
+            if digest and n % 64 == 0:
+                # Store and look the pages up a few at a time to keep the memory use
+                # bounded, and what was extracted is kept if the process is killed
+                cache.put(digest, fresh)
+                fresh.clear()
+                cached = cache.get(digest, pages[n : n + 64])
+            if i in cached:
+                text = cached.pop(i)
+            else:
+                log21.info(f"Extracting text from page {i}...", end="\r")
+                if pdf is None:
+                    with profiling.span("open"):
+                        pdf = _open_pdf(input_file)
+                # The whole page is extracted when it is going to be cached
+                text = _extract_page_text(pdf, i, -1 if digest else remaining)
+                if digest:
+                    fresh[i] = text
+            if remaining > 0:
+                text = text[:remaining]
+                remaining -= len(text)
+            if reverse_lines:
+                text = _reverse_lines(text)
+            yield i, text
+        log21.info("\rDone!")
+    finally:
+        if digest:
+            cache.put(digest, fresh)
+        if pdf is not None:
+            pdf.close()
+
+
+def _extract_page_text(pdf: PdfDocument, i: int, max_number_of_characters: int) -> str:
+    """Extract up to `max_number_of_characters` (all if negative) from a page."""
+    with profiling.span("extract", page=i):
+        page = pdf[i - 1]
+        textpage = page.get_textpage()
+        try:
+            count = textpage.count_chars()
+            if max_number_of_characters >= 0:
+                count = min(count, max_number_of_characters)
+            text = textpage.get_text_range(count=count) if count else ""
+        finally:
+            textpage.close()
+            page.close()
+        profiling.count(pages=1)
+    return text
+
+
 def extract_text(
-    input_file: str | Path | io.BytesIO | io.TextIOWrapper,
-    pages_to_extract_from: Optional[Collection[int]] = None,
+    input_file: FileInput,
+    pages_to_extract_from: Optional[PageSet | str | Collection[int]] = None,
     max_number_of_characters: int = -1,
     reverse_lines: bool = False,
+    cache: Optional[TextCache] = None,
 ) -> str:
     """Extract text from a PDF file.
 
@@ -216,117 +1164,203 @@ def extract_text(
     :param pages_to_extract_from: Pages to extract text from.
     :param max_number_of_characters: Maximum number of characters to extract in total.
     :param reverse_lines: Reverse the characters in each line (Useful for Persian text)
+    :param cache: Cache of the text of the pages, see `iter_text`.
     :return: Extracted text.
     """
-    pdf = pdfium.PdfDocument(input_file)
-    text = ""
-    if pages_to_extract_from:
-        pages_to_extract_from = sorted(pages_to_extract_from)
-        if pages_to_extract_from[0] < 1:
-            log21.critical("Pages must be >= 1")
-            sys.exit(1)
-        if pages_to_extract_from[-1] > len(pdf):
-            log21.critical(
-                f"Page {pages_to_extract_from[-1]} does not exist in `{input_file}`"
-            )
-            sys.exit(1)
-        log21.info(
-            f"Extracting text from {len(pages_to_extract_from)} page"
-            + ("s" if len(pages_to_extract_from) > 1 else "")
-            + f" from `{input_file}`..."
+    # When every page is extracted, the pages are separated by new lines
+    separator = "" if pages_to_extract_from else "\n"
+    return "".join(
+        text + separator
+        for _, text in iter_text(
+            input_file,
+            pages_to_extract_from,
+            max_number_of_characters,
+            reverse_lines,
+            cache,
         )
-        count = max_number_of_characters
-        for i, page in enumerate(pdf):
-            i = i + 1
-            if i not in pages_to_extract_from:
-                continue
-            log21.info(f"Extracting text from page {i}...", end="\r")
-            text += page.get_textpage().get_text_range(count=count)
-            if count == 0:
-                break
-            if count > 0:
-                count = max_number_of_characters - len(text)
-    else:
-        count = max_number_of_characters
-        for page in pdf:
-            text += page.get_textpage().get_text_range(count=count)
-            if count == 0:
-                break
-            if count > 0:
-                count = max_number_of_characters - len(text)
-            text += "\n"
-    log21.info("\rDone!")
-
-    if reverse_lines:
-        reversed_text = ""
-        log21.info("Reversing the lines...", end="\r")
-        for i, line in enumerate(text.split(os.linesep), start=1):
-            log21.info("Reversing line %d...", args=(i,), end="\r")
-            reversed_text += "".join(reversed(line)) + os.linesep
-        log21.info("\rReversed every line!")
-        text = reversed_text
+    )
 
-    return text
+
+def _write_part(
+    pdf: PdfDocument,
+    start: int,
+    end: int,
+    output_file: Path,
+    files: Optional[list[tuple[str, bytes]]] = None,
+) -> None:
+    """Write pages `start` (inclusive) to `end` (exclusive) to a new PDF file, or add
+    its name and contents to `files` if that is not None."""
+    from pypdfium2 import PdfDocument
+
+    log21.info(f"Splitting pages {start + 1} to {end}...")
+    writer = PdfDocument.new()
+    _import_pages(writer, pdf, range(start, end))
+    try:
+        with profiling.span("save"):
+            if files is None:
+                writer.save(output_file)
+            else:
+                buffer = io.BytesIO()
+                writer.save(buffer)
+                files.append((output_file.name, buffer.getvalue()))
+        log21.info(f"Saved split file to {output_file}")
+    except PermissionError:
+        log21.critical(
+            f"Cannot write to output file `{output_file}`.\n"
+            "Check the file permissions and close any applications that may be "
+            "using the file, then try again."
+        )
+        sys.exit(1)
+    finally:
+        writer.close()
+
+
+def _write_parts(
+    input_file: str | os.PathLike[str] | bytes,
+    parts: Sequence[tuple[int, int, Path]],
+    collect: bool = False,
+) -> list[tuple[str, bytes]]:
+    """Write a share of the parts of a split PDF.
+
+    Runs in a worker process, so it opens its own copy of the document.
+
+    :param input_file: PDF file to split, see `_shareable`.
+    :param parts: Start page (inclusive), end page (exclusive) and output file of each
+        part.
+    :param collect: Return the parts instead of writing them.
+    :return: The names and contents of the parts, if they are not written.
+    """
+    files = [] if collect else None
+    with profiling.span("open"):
+        pdf = _open_pdf(input_file)
+    try:
+        for start, end, output_file in parts:
+            _write_part(pdf, start, end, output_file, files)
+    finally:
+        pdf.close()
+    return files or []
+
+
+def _share_parts(
+    parts: Sequence[tuple[int, int, Path]], number_of_shares: int
+) -> list[list[tuple[int, int, Path]]]:
+    """Group the parts of a split PDF into contiguous shares with about the same number
+    of pages, so each worker process opens the source once for a whole share.
+
+    :param parts: Start page (inclusive), end page (exclusive) and output file of each
+        part.
+    :param number_of_shares: Maximum number of shares.
+    :return: The shares. None of them is empty.
+    """
+    share_size = sum(end - start for start, end, _ in parts) / max(number_of_shares, 1)
+    shares: list[list[tuple[int, int, Path]]] = [[]]
+    size = 0
+    for part in parts:
+        if size >= share_size and len(shares) < number_of_shares:
+            shares.append([])
+            size = 0
+        shares[-1].append(part)
+        size += part[1] - part[0]
+    return [share for share in shares if share]
 
 
 def split_pdf(
-    input_file: str | Path,
-    output_directory: str | Path,
-    split_points: Optional[Collection[int]] = None,
+    input_file: FileInput,
+    output_directory: str | Path | tarfile.TarFile | zipfile.ZipFile,
+    split_points: Optional[PageSet | str | Collection[int]] = None,
+    workers: int = 1,
+    name: Optional[str] = None,
 ) -> int:
     """Split a PDF file into multiple files.
 
     :param input_file: PDF file to split.
-    :param output_directory: Directory to write split files to.
-    :param split_points: Pages to split. If None, splits every page into a separate
-        file.
+    :param output_directory: Directory to write split files to, or an open tar or zip
+        archive to add them to in order. Tar archives may be streams (mode `w|`).
+    :param split_points: Pages to split after. A `PageSet`, a page range string or one
+        based page numbers. If None, splits every page into a separate file.
+    :param workers: Number of processes to write the parts with. The parts are split
+        into contiguous groups with about the same number of pages, one per process,
+        or a few per process for an archive. Values below 1 use all the available CPU
+        cores.
+    :param name: Base name of the parts (`<name>_part_<n>.pdf`). Defaults to the name
+        of the input file without its extension, and is required for inputs without
+        one.
+    :raises ValueError: If `name` is missing.
     :return: Number of pages split.
     """
-    if isinstance(input_file, str):
-        input_file = Path(input_file)
-    if isinstance(output_directory, str):
+    name = _input_name(input_file, name)
+    archive = None
+    if _is_path(output_directory):
         output_directory = Path(output_directory)
-    if not output_directory.exists():
-        output_directory.mkdir(parents=True)
+        output_directory.mkdir(parents=True, exist_ok=True)
+    else:
+        # The parts are named relative to the root of the archive
+        archive, output_directory = output_directory, Path()
+    if workers < 1:
+        workers = os.cpu_count() or 1
 
-    pdf = pdfium.PdfDocument(input_file)
+    with profiling.span("open"):
+        pdf = _open_pdf(input_file)
+    number_of_pages = len(pdf)
     if not split_points:
-        split_points = range(1, len(pdf) - 1)
-    split_points = [0] + sorted(set(split_points)) + [len(pdf)]
+        split_points = range(1, number_of_pages)
+    split_points = PageSet.of(split_points)
+    if not split_points.is_resolved:
+        # There is nothing to split after the last page
+        split_points = split_points.resolve(number_of_pages - 1)
+    split_points = [0, *split_points, number_of_pages]
 
+    parts = []
     for i in range(len(split_points) - 1):
         start = split_points[i]
         end = split_points[i + 1]
-        if start < 0 or end > len(pdf):
+        if start < 0 or end > number_of_pages:
             log21.warning(
                 f"Split points {start + 1} to {end} are out of bounds for "
-                f"input file `{input_file}`."
+                f"input file `{name}`."
             )
             continue
+        parts.append((start, end, output_directory / f"{name}_part_{i + 1}.pdf"))
 
-        log21.info(f"Splitting pages {start + 1} to {end}...")
-        writer = PdfDocument.new()
-        writer.import_pages(pdf, range(start, end))
-        output_file = output_directory / f"{input_file.stem}_part_{i + 1}.pdf"
-        try:
-            writer.save(output_file)
-            log21.info(f"Saved split file to {output_file}")
-        except PermissionError:
-            log21.critical(
-                f"Cannot write to output file `{output_file}`.\n"
-                "Check the file permissions and close any applications that may be "
-                "using the file, then try again."
-            )
-            sys.exit(1)
-        finally:
-            writer.close()
+    if workers > 1 and len(parts) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        pdf.close()
+        input_file = _shareable(input_file)
+        if archive is not None:
+            # More, smaller shares, so the parts held until they are archived stay few
+            shares = _share_parts(parts, 4 * workers)
+            calls = ((_write_parts, (input_file, share, True)) for share in shares)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for files in _in_order(executor, calls, 2 * workers):
+                    _add_to_archive(archive, files)
+            return len(split_points) - 1
+        shares = _share_parts(parts, workers)
+        log21.info(f"Writing {len(parts)} parts using {len(shares)} processes...")
+        with ProcessPoolExecutor(max_workers=len(shares)) as executor:
+            futures = [
+                profiling.submit(executor, _write_parts, input_file, share)
+                for share in shares
+            ]
+            for future in futures:
+                future.result()
+        return len(split_points) - 1
 
-    pdf.close()
+    try:
+        for start, end, output_file in parts:
+            if archive is None:
+                _write_part(pdf, start, end, output_file)
+                continue
+            files: list[tuple[str, bytes]] = []
+            _write_part(pdf, start, end, output_file, files)
+            _add_to_archive(archive, files)
+    finally:
+        pdf.close()
     return len(split_points) - 1
 
 
 def watermark_pdf(
-    input_file: str | Path | io.BytesIO | io.TextIOWrapper,
+    input_file: FileInput,
     output_file: str | Path,
     watermark_text: str,
     position: str = "center",
@@ -356,7 +1390,7 @@ def watermark_pdf(
 
 
 def encrypt_pdf(
-    input_file: str | Path | io.BytesIO | io.TextIOWrapper,
+    input_file: FileInput,
     output_file: str | Path,
     password: str,
     algorithm: str = "AES-256",
@@ -377,7 +1411,7 @@ def encrypt_pdf(
 
 
 def set_metadata(
-    input_file: str | Path | io.BytesIO | io.TextIOWrapper,
+    input_file: FileInput,
     output_file: str | Path,
     metadata: dict,
 ) -> int:
@@ -4,55 +4,143 @@
 
 import os
 import sys
+import socket
+import contextlib
 import importlib.util
-from typing import Optional, Sequence
+from typing import TextIO, BinaryIO, Iterable, Iterator, Optional, Sequence
 from pathlib import Path
 
 import log21
 from log21.colors import RED, GREEN, RESET
 
-from . import bundle, split_pdf, extract_text, pdf_to_image, remove_pages, watermark_pdf
-from .utils import parse_pages
-from .recipe import run_recipe
+from . import (bundle, iter_text, profiling, split_pdf, optimize_pdf, pdf_to_image,
+               remove_pages, watermark_pdf, pdf_to_thumbnails)
+from .utils import PageSet
 
 # yapf: ensable
 
+# The recipe, batch, search and server modules import more dependencies (PyYAML, the
+# process pool, sqlite3, socketserver) and are only imported by the commands that use
+# them.
+
+# Same as `server.SERVER_ENV`, without importing the server on every call
+SERVER_ENV = 'PDF_HELPER_SERVER'
+
+# Input or output path that stands for stdin or stdout
+STDIO = Path('-')
+
+
+def _binary_stream(stream: TextIO) -> BinaryIO:
+    """Get the binary buffer of stdin or stdout, with the line ending translation of
+    Windows turned off."""
+    if sys.platform == 'win32':
+        import msvcrt
+        msvcrt.setmode(stream.fileno(), os.O_BINARY)
+    return stream.buffer
+
+
+def _read_input(input_path: Path) -> Path | bytes:
+    """Check that an input file exists, or read stdin for `-`.
+
+    pdfium seeks around in PDFs, so stdin is read into memory, where pdfium reads it
+    without copying it again.
+    """
+    if input_path != STDIO:
+        if not input_path.exists():
+            log21.critical(f'Input file `{input_path}` does not exist.')
+            sys.exit(1)
+        return input_path
+    data = b'' if sys.stdin.isatty() else _binary_stream(sys.stdin).read()
+    if not data:
+        log21.critical('Pipe a file to stdin to use `-` as the input.')
+        sys.exit(1)
+    return data
+
+
+@contextlib.contextmanager
+def _open_output(output_path: Path) -> Iterator[BinaryIO]:
+    """Open an output file, or stdout for `-`. The file is removed if writing fails."""
+    if output_path != STDIO:
+        try:
+            with open(output_path, 'wb') as file:
+                yield file
+        except BaseException:
+            output_path.unlink(missing_ok=True)
+            raise
+        return
+    if sys.stdout.isatty():
+        log21.critical('Redirect or pipe stdout to use `-` as the output.')
+        sys.exit(1)
+    sys.stdout.flush()
+    stream = _binary_stream(sys.stdout)
+    yield stream
+    stream.flush()
+
+
+@contextlib.contextmanager
+def _open_archive(archive_format: str) -> Iterator[object]:
+    """Stream a tar or zip archive to stdout."""
+    import tarfile
+    import zipfile
+
+    with _open_output(STDIO) as stream:
+        if archive_format == 'zip':
+            with zipfile.ZipFile(stream, 'w') as archive:
+                yield archive
+        else:
+            with tarfile.open(fileobj=stream, mode='w|') as archive:
+                yield archive
+
 
 def bundle_entry_point(
     input_paths: Sequence[Path],
     output_path: Path,
     /,
     force: bool = False,
-    verbose: bool = False
+    profile: Optional[Path] = None,
+    verbose: bool = False,
+    dedupe: bool = False
 ) -> None:
     """Bundle multiple files into a single PDF file.
 
-    :param input_paths: List of files to bundle. Can be PDF or image files.
-    :param output_path: Path to write bundled PDF file to.
+    :param input_paths: List of files to bundle. Can be PDF files or JPEG, PNG, TIFF,
+        WebP, GIF or BMP images, whatever their extension. `-` reads one of them from
+        stdin.
+    :param output_path: Path to write bundled PDF file to. (`-` writes to stdout)
     :param force: Force overwrite of output file.
+    :param profile: Save a Chrome trace of the run to this path and print a summary
+        of where the time went.
     :param verbose: Print verbose output.
+    :param dedupe: Store identical fonts, images and other resources of the files
+        once.
     """
     if len(input_paths) < 1:
         log21.critical('Must provide at least one input file.')
         sys.exit(1)
-    if output_path.exists() and not force:
-        log21.critical('Output file already exists.')
-        sys.exit(1)
-    if output_path.absolute() in (path.absolute() for path in input_paths):
-        log21.critical('Input and output files cannot be the same.')
+    if input_paths.count(STDIO) > 1:
+        log21.critical('Only one input file can be read from stdin.')
         sys.exit(1)
+    if output_path != STDIO:
+        if output_path.exists() and not force:
+            log21.critical('Output file already exists.')
+            sys.exit(1)
+        if output_path.absolute() in (path.absolute() for path in input_paths):
+            log21.critical('Input and output files cannot be the same.')
+            sys.exit(1)
     if verbose:
         log21.basic_config(level=log21.INFO)
+    if profile:
+        profiling.start(profile, 'bundle')
 
-    for path in input_paths:
-        if not path.exists():
-            log21.critical(f'Input file `{path}` does not exist.')
-            sys.exit(1)
+    input_files = [_read_input(path) for path in input_paths]
 
     log21.info(f'Bundling {len(input_paths)} files to {output_path}...')
     try:
-        with open(output_path, 'wb') as output_file:
-            bundle(input_paths, output_file)
+        with _open_output(output_path) as output_file:
+            bundle(input_files, output_file, dedupe)
+    except ValueError as ex:
+        log21.critical(str(ex))
+        sys.exit(1)
     except PermissionError:
         log21.critical(
             f'Cannot write to output file `{output_path}`.\n'
@@ -67,46 +155,48 @@ def remove_pages_entry_point(
     output_path: Path,
     pages_to_remove: str,
     /,
+    in_place: bool = False,
     force: bool = False,
+    profile: Optional[Path] = None,
     verbose: bool = False
 ) -> None:
     """Remove pages from a PDF file.
 
-    :param input_path: Path to PDF file to remove pages from.
-    :param output_path: Path to write PDF file to.
-    :param pages_to_remove: Comma-separated list of pages to remove.
-        Example: '1-5,7,9-11'
+    :param input_path: Path to PDF file to remove pages from. (`-` reads from stdin)
+    :param output_path: Path to write PDF file to. (`-` writes to stdout)
+    :param pages_to_remove: Comma-separated list of pages to remove. `10-` is page 10
+        to the end and `-5:` the last 5 pages. Example: '1-5,7,-2:'
+    :param in_place: Delete the pages from the source document instead of copying the
+        other pages to a new one.
     :param force: Force overwrite of output file.
+    :param profile: Save a Chrome trace of the run to this path and print a summary
+        of where the time went.
     :param verbose: Print verbose output.
     """
-    if not input_path.exists():
-        log21.critical(f'Input file `{input_path}` does not exist.')
-        sys.exit(1)
-    if output_path.exists() and not force:
-        log21.critical('Output file already exists.')
-        sys.exit(1)
-    if input_path.absolute() == output_path.absolute():
-        log21.critical('Input and output files cannot be the same.')
-        sys.exit(1)
+    input_file = _read_input(input_path)
+    if output_path != STDIO:
+        if output_path.exists() and not force:
+            log21.critical('Output file already exists.')
+            sys.exit(1)
+        if input_path.absolute() == output_path.absolute():
+            log21.critical('Input and output files cannot be the same.')
+            sys.exit(1)
     if verbose:
         log21.basic_config(level=log21.INFO)
+    if profile:
+        profiling.start(profile, 'remove-pages')
 
     try:
-        pages_to_remove_ = parse_pages(pages_to_remove)
+        pages_to_remove_ = PageSet.parse(pages_to_remove)
     except ValueError:
         log21.critical(f'Invalid pages string: `{pages_to_remove}`')
         sys.exit(1)
 
-    log21.info(
-        f'Removing {len(pages_to_remove_)} page' + (
-            's: ' + ', '.join(str(page) for page in pages_to_remove_[:-1]) +
-            ' and' if len(pages_to_remove_) > 2 else ':'
-        ) + f' {pages_to_remove_[-1]} from `{input_path}`'
-    )
+    log21.info(f'Removing pages {pages_to_remove_} from `{input_path}`')
     try:
-        with open(output_path, 'wb') as output_file:
+        with _open_output(output_path) as output_file:
             number_of_removed_pages = remove_pages(
-                input_path, pages_to_remove_, output_file
+                input_file, pages_to_remove_, output_file, in_place
             )
             log21.info(
                 f'Removed {number_of_removed_pages} page' +
@@ -121,24 +211,135 @@ def remove_pages_entry_point(
         sys.exit(1)
 
 
+def optimize_entry_point(
+    input_path: Path,
+    output_path: Path,
+    /,
+    force: bool = False,
+    profile: Optional[Path] = None,
+    verbose: bool = False
+) -> None:
+    """Store identical fonts, images and other resources of a PDF file once.
+
+    :param input_path: Path to PDF file to optimize. (`-` reads from stdin)
+    :param output_path: Path to write optimized PDF file to. (`-` writes to stdout)
+    :param force: Force overwrite of output file.
+    :param profile: Save a Chrome trace of the run to this path and print a summary
+        of where the time went.
+    :param verbose: Print verbose output.
+    """
+    input_file = _read_input(input_path)
+    if output_path != STDIO:
+        if output_path.exists() and not force:
+            log21.critical('Output file already exists.')
+            sys.exit(1)
+        if input_path.absolute() == output_path.absolute():
+            log21.critical('Input and output files cannot be the same.')
+            sys.exit(1)
+    if verbose:
+        log21.basic_config(level=log21.INFO)
+    if profile:
+        profiling.start(profile, 'optimize')
+
+    log21.info(f'Optimizing `{input_path}`...')
+    try:
+        with _open_output(output_path) as output_file:
+            saved = optimize_pdf(input_file, output_file)
+    except PermissionError:
+        log21.critical(
+            f'Cannot write to output file `{output_path}`.\n'
+            'Check the file permissions and close any applications that may be using '
+            'the file, then try again.'
+        )
+        sys.exit(1)
+    log21.info(f'Saved {saved} bytes!')
+
+
+def _check_output_directory(output_directory: Path, force: bool) -> None:
+    """Check that files can be written to an output directory, unless it is `-`."""
+    if output_directory == STDIO:
+        return
+    if output_directory.exists() and not output_directory.is_dir():
+        log21.critical(f'Output path `{output_directory}` is not a directory.')
+        sys.exit(1)
+    if output_directory.exists() and os.listdir(output_directory) and not force:
+        log21.critical(f'Output directory `{output_directory}` already exists.')
+        sys.exit(1)
+
+
+@contextlib.contextmanager
+def _output_directory(output_directory: Path,
+                      archive_format: str) -> Iterator[object]:
+    """Give the output directory as it is, or an archive streamed to stdout for `-`."""
+    if output_directory != STDIO:
+        yield output_directory
+        return
+    with _open_archive(archive_format) as archive:
+        yield archive
+
+
+def _output_name(input_path: Path, name: Optional[str]) -> str:
+    """Get the base name of the output files of a command."""
+    if name:
+        return name
+    return 'stdin' if input_path == STDIO else input_path.stem
+
+
 def pdf_to_image_entry_point(
     input_path: Path,
     output_directory: Path,
     /,
     pages_to_convert: Optional[str] = None,
-    scale: int = 2,
+    scale: float = 2,
+    jobs: int = 1,
     force: bool = False,
-    verbose: bool = False
+    profile: Optional[Path] = None,
+    verbose: bool = False,
+    format: str = 'png',
+    quality: int = 85,
+    grayscale: bool = False,
+    png_compress_level: int = 6,
+    dpi: Optional[float] = None,
+    fit_width: Optional[int] = None,
+    fit_height: Optional[int] = None,
+    max_pixels: Optional[int] = None,
+    tile_size: Optional[int] = None,
+    separate_tiles: bool = False,
+    name: Optional[str] = None,
+    archive_format: str = 'tar'
 ) -> None:
     """Convert a PDF file to a series of images.
 
-    :param input_path: Path to PDF file to convert.
-    :param output_directory: Path to directory to write images to.
-    :param pages_to_convert: Comma-separated list of pages to convert.
-        Example: '1-5,7,9-11'
+    :param input_path: Path to PDF file to convert. (`-` reads from stdin)
+    :param output_directory: Path to directory to write images to. (`-` streams them to
+        stdout as a tar or zip archive)
+    :param pages_to_convert: Comma-separated list of pages to convert. `10-` is page
+        10 to the end and `-5:` the last 5 pages. Example: '1-5,7,20-'
     :param scale: Scale of each image.
+    :param jobs: Number of processes to render the pages with. (0 uses every CPU core)
     :param force: Force overwrite of output directory.
+    :param profile: Save a Chrome trace of the run to this path and print a summary
+        of where the time went.
     :param verbose: Print verbose output.
+    :param format: Image format: png, jpeg or webp. JPEG is the fastest to encode and
+        WebP gives the smallest files.
+    :param quality: Quality of JPEG and WebP images, from 1 to 100.
+    :param grayscale: Render the pages in grayscale.
+    :param png_compress_level: Compression level of PNG images, from 0 to 9. 1 is much
+        faster than the default for somewhat larger files.
+    :param dpi: Render the pages at this resolution instead of --scale.
+    :param fit_width: Render each page this many pixels wide.
+    :param fit_height: Render each page this many pixels high. With --fit-width, the
+        page is fit into both.
+    :param max_pixels: Lower the scale of the pages that would have more pixels than
+        this. Example: 50000000
+    :param tile_size: Render pages larger than this many pixels as tiles of at most
+        this size and paste them together, to bound the memory used.
+    :param separate_tiles: Save each tile as its own image instead of pasting them
+        together.
+    :param name: Base name of the images. (Defaults to the name of the input file, or
+        `stdin`)
+    :param archive_format: Format of the archive written to stdout: tar or zip.
     """
     if importlib.util.find_spec('PIL') is None:
         log21.error('PIL must be installed to use this feature.')
@@ -150,37 +351,150 @@ def pdf_to_image_entry_point(
             log21.print(f'[{GREEN}+{RESET}] Installing Pillow...')
             os.system(cmd)
         sys.exit(1)
-    if not input_path.exists():
-        log21.critical(f'Input file `{input_path}` does not exist.')
-        sys.exit(1)
-    if output_directory.exists() and not output_directory.is_dir():
-        log21.critical(f'Output path `{output_directory}` is not a directory.')
-        sys.exit(1)
-    if output_directory.exists() and os.listdir(output_directory) and not force:
-        log21.critical(f'Output directory `{output_directory}` already exists.')
+    if archive_format not in ('tar', 'zip'):
+        log21.critical(
+            f'Unsupported archive format `{archive_format}`. Choose from: tar, zip'
+        )
         sys.exit(1)
+    input_file = _read_input(input_path)
+    _check_output_directory(output_directory, force)
     if verbose:
         log21.basic_config(level=log21.INFO)
+    if profile:
+        profiling.start(profile, 'to-image')
 
     pages_to_convert_ = None
     if pages_to_convert:
         try:
-            pages_to_convert_ = parse_pages(pages_to_convert)
+            pages_to_convert_ = PageSet.parse(pages_to_convert)
         except ValueError:
             log21.critical(f'Invalid pages string: `{pages_to_convert}`')
             sys.exit(1)
         log21.info(
-            f'Converting {len(pages_to_convert_)} page' +
-            ('s' if len(pages_to_convert_) > 2 else '') +
-            f' from `{input_path}` to image...'
+            f'Converting pages {pages_to_convert_} from `{input_path}` to image...'
         )
     else:
         log21.info(f'Converting `{input_path}` to images...')
 
-    pdf_to_image(input_path, output_directory, pages_to_convert_, scale)
+    try:
+        with _output_directory(output_directory, archive_format) as output:
+            pdf_to_image(
+                input_file, output, pages_to_convert_, scale, jobs, format, quality,
+                grayscale, png_compress_level, dpi, fit_width, fit_height, max_pixels,
+                tile_size, separate_tiles, _output_name(input_path, name)
+            )
+    except ValueError as ex:
+        log21.critical(str(ex))
+        sys.exit(1)
     log21.info('\rDone!')
 
 
+def thumbnails_entry_point(
+    input_path: Path,
+    output_path: Path,
+    /,
+    pages: Optional[str] = None,
+    width: int = 200,
+    grayscale: bool = False,
+    contact_sheet: bool = False,
+    columns: int = 0,
+    force: bool = False,
+    profile: Optional[Path] = None,
+    verbose: bool = False,
+    format: Optional[str] = None,
+    quality: int = 85
+) -> None:
+    """Render small previews of the pages of a PDF file.
+
+    :param input_path: Path to PDF file to render.
+    :param output_path: Directory to write the thumbnails to, or with --contact-sheet
+        the path of the contact sheet image.
+    :param pages: Pages to render. Example: '1-5,7,20-'
+    :param width: Width of each thumbnail in pixels.
+    :param grayscale: Render the thumbnails in grayscale.
+    :param contact_sheet: Pack every thumbnail into a grid in one image.
+    :param columns: Number of columns of the contact sheet. (0 picks a square grid)
+    :param force: Force overwrite of the output.
+    :param profile: Save a Chrome trace of the run to this path and print a summary
+        of where the time went.
+    :param verbose: Print verbose output.
+    :param format: Image format: png, jpeg or webp. Defaults to the extension of the
+        contact sheet, or png.
+    :param quality: Quality of JPEG and WebP images, from 1 to 100.
+    """
+    if not input_path.exists():
+        log21.critical(f'Input file `{input_path}` does not exist.')
+        sys.exit(1)
+    if contact_sheet:
+        if output_path.exists() and not force:
+            log21.critical('Output file already exists.')
+            sys.exit(1)
+    elif output_path.exists() and not output_path.is_dir():
+        log21.critical(f'Output path `{output_path}` is not a directory.')
+        sys.exit(1)
+    elif output_path.exists() and os.listdir(output_path) and not force:
+        log21.critical(f'Output directory `{output_path}` already exists.')
+        sys.exit(1)
+    if verbose:
+        log21.basic_config(level=log21.INFO)
+    if profile:
+        profiling.start(profile, 'thumbnails')
+
+    try:
+        pages_ = PageSet.parse(pages) if pages else None
+    except ValueError:
+        log21.critical(f'Invalid pages string: `{pages}`')
+        sys.exit(1)
+
+    log21.info(f'Rendering thumbnails of `{input_path}`...')
+    try:
+        count = pdf_to_thumbnails(
+            input_path, output_path, pages_, width, grayscale, contact_sheet, columns,
+            format, quality
+        )
+    except ValueError as ex:
+        log21.critical(str(ex))
+        sys.exit(1)
+    log21.info(f'Rendered {count} thumbnails to `{output_path}`!')
+
+
+def _write_split_text(
+    chunks: Iterable[str], output_path: Path, characters_to_split: int
+) -> None:
+    """Write text to numbered files that each hold at most `characters_to_split`
+    characters.
+
+    If all the text fits in a single file, it is written to `output_path` itself.
+
+    :param chunks: Text to write, in order.
+    :param output_path: Path to derive the output file names from.
+    :param characters_to_split: Maximum number of characters in each file.
+    """
+    number = 1
+    path = output_path.with_name(f'{output_path.stem}_{number}{output_path.suffix}')
+    file = path.open('w', encoding='utf-8')
+    space = characters_to_split
+    try:
+        for chunk in chunks:
+            while chunk:
+                if not space:
+                    file.close()
+                    number += 1
+                    path = output_path.with_name(
+                        f'{output_path.stem}_{number}{output_path.suffix}'
+                    )
+                    file = path.open('w', encoding='utf-8')
+                    space = characters_to_split
+                written = min(len(chunk), space)
+                file.write(chunk[:written])
+                chunk = chunk[written:]
+                space -= written
+    finally:
+        file.close()
+    if number == 1:
+        path.replace(output_path)
+
+
 def extract_text_entry_point(
     input_path: Path,
     /,
@@ -189,67 +503,76 @@ def extract_text_entry_point(
     max_number_of_characters: int = -1,
     characters_to_split: int = 0,
     reverse_lines: bool = False,
+    cache: bool = False,
     force: bool = False,
+    profile: Optional[Path] = None,
     verbose: bool = False
 ) -> None:
     """Extract text from a PDF file.
 
-    :param input_path: Path to PDF file to extract text from.
+    :param input_path: Path to PDF file to extract text from. (`-` reads from stdin)
     :param output_path: Path to write extracted text to. (Writes to stdout if not
-        provided)
-    :param pages_to_extract_from: Pages to extract text from. Example: '1-5,7,9-11'
+        provided or `-`)
+    :param pages_to_extract_from: Pages to extract text from. `10-` is page 10 to the
+        end and `-5:` the last 5 pages. Example: '1-5,7,20-'
     :param max_number_of_characters: Maximum number of characters to extract in total.
     :param characters_to_split: Create a new file if the number of characters in the
         extracted text exceeds this value.
     :param reverse_lines: Reverse the characters in each line (Useful for Persian text)
+    :param cache: Cache the text of each page and reuse it on later runs. The cache is
+        kept in $PDF_HELPER_CACHE_DIR or the cache directory of the user.
     :param force: Force overwrite of output file.
+    :param profile: Save a Chrome trace of the run to this path and print a summary
+        of where the time went.
     :param verbose: Print verbose output.
     """
-    if not input_path.exists():
-        log21.critical(f'Input file `{input_path}` does not exist.')
-        sys.exit(1)
+    input_file = _read_input(input_path)
+    if output_path == STDIO:
+        output_path = None
     if output_path and output_path.exists() and not force:
         log21.critical(f'Output `{output_path}` already exists.')
         sys.exit(1)
     if verbose:
         log21.basic_config(level=log21.INFO)
+    if profile:
+        profiling.start(profile, 'extract-text')
 
     pages_to_extract_from_ = None
     if pages_to_extract_from:
         try:
-            pages_to_extract_from_ = parse_pages(pages_to_extract_from)
+            pages_to_extract_from_ = PageSet.parse(pages_to_extract_from)
         except ValueError:
             log21.critical(f'Invalid pages string: `{pages_to_extract_from}`')
             sys.exit(1)
         log21.info(
-            f'Extracting text from {len(pages_to_extract_from_)} page' +
-            ('s' if len(pages_to_extract_from_) > 2 else '') +
-            f' from `{input_path}`...'
+            f'Extracting text from pages {pages_to_extract_from_} of `{input_path}`...'
         )
     else:
         log21.info(f'Extracting text from `{input_path}`...')
 
-    text = extract_text(
-        input_path, pages_to_extract_from_, max_number_of_characters, reverse_lines
+    text_cache = None
+    if cache:
+        from .text_cache import TextCache
+
+        text_cache = TextCache()
+
+    # When every page is extracted, the pages are separated by new lines
+    separator = '' if pages_to_extract_from_ else '\n'
+    chunks = (
+        text + separator for _, text in iter_text(
+            input_file, pages_to_extract_from_, max_number_of_characters, reverse_lines,
+            text_cache
+        )
     )
     if output_path:
         if not characters_to_split:
             with output_path.open('w', encoding='utf-8') as file:
-                file.write(text)
+                file.writelines(chunks)
             return
-        i = 1
-        stem = output_path.stem
-        while len(text) > characters_to_split:
-            output_path_ = output_path.with_name(stem + f'_{i}{output_path.suffix}')
-            with output_path_.open('w', encoding='utf-8') as file:
-                file.write(text[:characters_to_split])
-            text = text[characters_to_split:]
-            output_path = output_path_
-            i += 1
-        with output_path.open('w', encoding='utf-8') as file:
-            file.write(text)
+        _write_split_text(chunks, output_path, characters_to_split)
     else:
-        print(text)
+        sys.stdout.writelines(chunks)
+        print()
     log21.info('\rDone!')
 
 
@@ -258,39 +581,47 @@ def split_pdf_entry_point(
     output_directory: Path,
     /,
     split_points: Optional[str] = None,
+    jobs: int = 1,
     force: bool = False,
-    verbose: bool = False
+    profile: Optional[Path] = None,
+    verbose: bool = False,
+    name: Optional[str] = None
 ) -> None:
     """Split a PDF file into multiple files.
 
-    :param input_path: Path to PDF file to split.
-    :param output_directory: Path to directory to write split files to.
-    :param split_points: Comma-separated list of pages to split. Example: '5,7,9'
+    :param input_path: Path to PDF file to split. (`-` reads from stdin)
+    :param output_directory: Path to directory to write split files to. (`-` streams
+        them to stdout as a tar archive)
+    :param split_points: Comma-separated list of pages to split after. Example: '5,7,9'
+        or '10-' to split every page from the 10th on
+    :param jobs: Number of processes to write the parts with. (0 uses every CPU core)
     :param force: Force overwrite of output directory.
+    :param profile: Save a Chrome trace of the run to this path and print a summary
+        of where the time went.
     :param verbose: Print verbose output.
+    :param name: Base name of the split files. (Defaults to the name of the input
+        file, or `stdin`)
     """
-    if not input_path.exists():
-        log21.critical(f'Input file `{input_path}` does not exist.')
-        sys.exit(1)
-    if output_directory.exists() and not output_directory.is_dir():
-        log21.critical(f'Output path `{output_directory}` is not a directory.')
-        sys.exit(1)
-    if output_directory.exists() and os.listdir(output_directory) and not force:
-        log21.critical(f'Output directory `{output_directory}` already exists.')
-        sys.exit(1)
+    input_file = _read_input(input_path)
+    _check_output_directory(output_directory, force)
     if verbose:
         log21.basic_config(level=log21.INFO)
+    if profile:
+        profiling.start(profile, 'split')
 
     split_points_ = None
     if split_points:
         try:
-            split_points_ = parse_pages(split_points)
+            split_points_ = PageSet.parse(split_points)
         except ValueError:
             log21.critical(f'Invalid pages string: `{split_points}`')
             sys.exit(1)
 
     log21.info(f'Splitting `{input_path}`...')
-    number_of_pdfs = split_pdf(input_path, output_directory, split_points_)
+    with _output_directory(output_directory, 'tar') as output:
+        number_of_pdfs = split_pdf(
+            input_file, output, split_points_, jobs, _output_name(input_path, name)
+        )
     if number_of_pdfs > 1:
         log21.info(f'Split {input_path} to {number_of_pdfs} PDF files!')
 
@@ -363,12 +694,17 @@ def run_recipe_entry_point(
     recipe_path: Path,
     /,
     force: bool = False,
+    rebuild: bool = False,
+    profile: Optional[Path] = None,
     verbose: bool = False
 ) -> None:
     """Run a PDF recipe file.
 
     :param recipe_path: Path to a YAML recipe file.
     :param force: Force overwrite of output files.
+    :param rebuild: Run every step, even the ones the build cache marks as up to date.
+    :param profile: Save a Chrome trace of the run to this path and print a summary
+        of where the time went.
     :param verbose: Print verbose output.
     """
     if not recipe_path.exists():
@@ -376,33 +712,248 @@ def run_recipe_entry_point(
         sys.exit(1)
     if verbose:
         log21.basic_config(level=log21.INFO)
+    if profile:
+        profiling.start(profile, 'run-recipe')
 
     if force:
         os.environ['PDF_HELPER_RECIPE_FORCE'] = '1'
 
-    run_recipe(recipe_path)
+    from .recipe import run_recipe
+
+    run_recipe(recipe_path, rebuild)
+
+
+def batch_entry_point(
+    command: str,
+    inputs: Sequence[str],
+    /,
+    output_template: Optional[str] = None,
+    pages: Optional[str] = None,
+    scale: float = 2,
+    jobs: int = 0,
+    force: bool = False,
+    profile: Optional[Path] = None,
+    verbose: bool = False
+) -> None:
+    """Run a command over many PDF files using one shared pool of processes.
+
+    :param command: Command to run. One of to-image, extract-text, remove-pages and
+        split.
+    :param inputs: PDF files, glob patterns, directories or file lists prefixed with @.
+    :param output_template: Output path of each file. {stem}, {name} and {parent} are
+        replaced with the stem, name and directory of the input file.
+    :param pages: Pages to convert or extract text from, pages to remove or split
+        points, depending on the command. Example: '1-5,7,20-,-2:'
+    :param scale: Scale of each image. (Used by to-image)
+    :param jobs: Number of processes to use. (0 uses every CPU core)
+    :param force: Force overwrite of the outputs.
+    :param profile: Save a Chrome trace of the run to this path and print a summary
+        of where the time went.
+    :param verbose: Print verbose output.
+    """
+    from .batch import COMMANDS, run_batch, expand_inputs
+
+    if command not in COMMANDS:
+        log21.critical(
+            f'Unsupported batch command `{command}`. Choose from: ' +
+            ', '.join(COMMANDS)
+        )
+        sys.exit(1)
+    if verbose:
+        log21.basic_config(level=log21.INFO)
+    if profile:
+        profiling.start(profile, 'batch')
+
+    pages_ = None
+    if pages:
+        try:
+            pages_ = PageSet.parse(pages)
+        except ValueError:
+            log21.critical(f'Invalid pages string: `{pages}`')
+            sys.exit(1)
+    if command == 'remove-pages' and not pages_:
+        log21.critical('Must provide the pages to remove.')
+        sys.exit(1)
+
+    try:
+        input_files = expand_inputs(inputs)
+    except OSError as ex:
+        log21.critical(f'Cannot read the input file list: {ex}')
+        sys.exit(1)
+    if not input_files:
+        log21.critical('No input files matched.')
+        sys.exit(1)
+
+    log21.info(f'Running {command} on {len(input_files)} files...')
+    results = run_batch(
+        command, input_files, output_template, pages_, scale, jobs, force=force
+    )
+    failed = {path: error for path, error in results.items() if error}
+    for path, error in results.items():
+        if error:
+            log21.print(f'[{RED}-{RESET}] {path}: {error}')
+        else:
+            log21.print(f'[{GREEN}+{RESET}] {path}')
+    log21.print(
+        f'{len(results) - len(failed)} succeeded, {len(failed)} failed '
+        f'out of {len(results)} files.'
+    )
+    if failed:
+        sys.exit(1)
+
+
+def index_entry_point(
+    inputs: Sequence[str],
+    /,
+    database: Optional[Path] = None,
+    jobs: int = 0,
+    keep_missing: bool = False,
+    profile: Optional[Path] = None,
+    verbose: bool = False
+) -> None:
+    """Add PDF files to the full-text index. Only new and changed files are read.
+
+    :param inputs: PDF files, glob patterns, directories or file lists prefixed with @.
+    :param database: Path of the index. (Defaults to index.sqlite3 in the cache
+        directory)
+    :param jobs: Number of processes to extract the text with. (0 uses every CPU core)
+    :param keep_missing: Keep the files that no longer exist in the index.
+    :param profile: Save a Chrome trace of the run to this path and print a summary
+        of where the time went.
+    :param verbose: Print verbose output.
+    """
+    from .batch import expand_inputs
+    from .search import index
+
+    if verbose:
+        log21.basic_config(level=log21.INFO)
+    if profile:
+        profiling.start(profile, 'index')
+
+    try:
+        input_files = expand_inputs(inputs)
+    except OSError as ex:
+        log21.critical(f'Cannot read the input file list: {ex}')
+        sys.exit(1)
+    if not input_files:
+        log21.critical('No input files matched.')
+        sys.exit(1)
+
+    try:
+        counts = index(input_files, database, jobs, prune=not keep_missing)
+    except RuntimeError as ex:
+        log21.critical(str(ex))
+        sys.exit(1)
+    log21.print(
+        f'{counts["indexed"]} indexed, {counts["unchanged"]} unchanged, '
+        f'{counts["failed"]} failed, {counts["removed"]} removed.'
+    )
+    if counts['failed']:
+        sys.exit(1)
+
+
+def search_entry_point(
+    query: str,
+    /,
+    database: Optional[Path] = None,
+    limit: int = 20,
+    verbose: bool = False
+) -> None:
+    """Search the full-text index built by the index command.
+
+    :param query: Words to search for. Supports "exact phrases", AND, OR, NOT and
+        prefix* queries.
+    :param database: Path of the index. (Defaults to index.sqlite3 in the cache
+        directory)
+    :param limit: Maximum number of hits to show.
+    :param verbose: Print verbose output.
+    """
+    from .search import search
+
+    if verbose:
+        log21.basic_config(level=log21.INFO)
+
+    try:
+        hits = search(query, database, limit, (GREEN, RESET))
+    except (ValueError, RuntimeError) as ex:
+        log21.critical(str(ex))
+        sys.exit(1)
+    for path, page, snippet in hits:
+        log21.print(f'{path}:{page}: {snippet}')
+    if not hits:
+        log21.info('No matches.')
+        sys.exit(1)
+
+
+def serve_entry_point(
+    socket_path: Optional[Path] = None,
+    workers: int = 0,
+    verbose: bool = False
+) -> None:
+    """Serve PDF-Helper commands on a Unix socket to skip the start-up cost of each
+    call.
+
+    Set the PDF_HELPER_SERVER environment variable to the socket path to make
+    pdf-helper forward its commands to the server.
+
+    :param socket_path: Path of the Unix socket to listen on.
+    :param workers: Maximum number of commands handled at the same time. (0 uses the
+        number of CPU cores)
+    :param verbose: Print verbose output.
+    """
+    if not hasattr(socket, 'AF_UNIX') or not hasattr(os, 'fork'):
+        log21.critical('The server is not supported on this platform.')
+        sys.exit(1)
+    if verbose:
+        log21.basic_config(level=log21.INFO)
+
+    from .server import ServerError, serve
+
+    try:
+        serve(str(socket_path) if socket_path else None, workers)
+    except (ServerError, OSError) as ex:
+        log21.critical(str(ex))
+        sys.exit(1)
 
 
 def main() -> None:
     try:
-        if sys.platform == 'win32':
-            import msvcrt
-            msvcrt.setmode(sys.stdout.fileno(), os.O_BINARY)
+        address = os.environ.get(SERVER_ENV)
+        if address and sys.argv[1:2] != ['serve']:
+            from .server import ServerError, forward
+
+            try:
+                sys.exit(forward(sys.argv[1:], address))
+            except (OSError, ServerError) as ex:
+                log21.warning(f'Cannot reach the server at `{address}`: {ex}')
         log21.basic_config(level=log21.ERROR)
         log21.argumentify(
             {
                 'bundle': bundle_entry_point,
                 'remove-pages': remove_pages_entry_point,
+                'optimize': optimize_entry_point,
                 'to-image': pdf_to_image_entry_point,
+                'thumbnails': thumbnails_entry_point,
                 'add-watermark': watermark_pdf_entry_point,
                 'extract-text': extract_text_entry_point,
                 'split': split_pdf_entry_point,
-                'run-recipe': run_recipe_entry_point
+                'run-recipe': run_recipe_entry_point,
+                'batch': batch_entry_point,
+                'index': index_entry_point,
+                'search': search_entry_point,
+                'serve': serve_entry_point
             }
         )
     except KeyboardInterrupt:
         log21.critical('\nKeyboardInterrupt: Exiting...')
         sys.exit(1)
+    except BrokenPipeError:
+        # The reader of stdout went away (e.g. `| head`); there is nothing left to
+        # write to, so stop Python from failing to flush stdout on exit too
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    finally:
+        profiling.finish()
 
 
 if __name__ == '__main__':
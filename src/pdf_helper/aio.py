@@ -0,0 +1,278 @@
+"""Run PDF-Helper operations from asyncio code on a managed pool of processes.
+
+pdfium is not thread-safe, so the operations run in worker processes, and a limit on
+the number of concurrent calls keeps one event loop from oversubscribing them. Each
+call returns an `Operation`: await it for the result, iterate over it for the number
+of pages done so far, or cancel it.
+
+    async with Pool(max_concurrency=4) as pool:
+        operation = pool.pdf_to_image("report.pdf", "images", timeout=60)
+        async for pages in operation:
+            print(f"{pages} pages converted")
+        await operation
+
+Cancelled and timed out calls stop at the next page (or file) they process, so the
+worker is free for the next call without restarting the pool.
+"""
+
+import os
+import asyncio
+import itertools
+import threading
+import contextlib
+import multiprocessing
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Optional,
+    Generator,
+    AsyncIterator,
+    MutableSequence,
+)
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import log21
+
+from . import (
+    bundle,
+    profiling,
+    split_pdf,
+    merge_pdfs,
+    extract_text,
+    pdf_to_image,
+)
+
+if TYPE_CHECKING:
+    from multiprocessing.queues import Queue
+
+__all__ = ["Operation", "Pool"]
+
+# Set up in each worker process by `_init_worker`: the flag of each slot of the pool
+# that asks the call running in it to stop, and the queue progress is sent through
+_stop_flags: Optional[MutableSequence[int]] = None
+_progress: Optional["Queue"] = None
+
+
+class _CancelledError(Exception):
+    """Raised in a worker process to abort a cancelled call."""
+
+
+def _init_worker(stop_flags: MutableSequence[int], progress: "Queue") -> None:
+    global _stop_flags, _progress
+    # The calls report their progress to the event loop instead of logging it
+    log21.basic_config(level=log21.WARNING)
+    _stop_flags = stop_flags
+    _progress = progress
+
+
+def _call(
+    slot: int, call_id: int, function: Callable, args: tuple, kwargs: dict
+) -> object:
+    """Run an operation in a worker process and report the pages it processes."""
+
+    def listener(counters: dict[str, int]) -> None:
+        if _stop_flags[slot]:
+            raise _CancelledError
+        if counters.get("pages"):
+            _progress.put((call_id, counters["pages"]))
+
+    profiling.set_listener(listener)
+    try:
+        return function(*args, **kwargs)
+    finally:
+        profiling.set_listener(None)
+
+
+class Operation:
+    """A call running on a `Pool`.
+
+    Await it to get the result of the call. Iterating over it yields the number of
+    pages processed so far each time it changes, until the call is done; intermediate
+    counts are skipped when the consumer is slower than the call.
+    """
+
+    def __init__(self) -> None:
+        self.pages = 0
+        self._task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _add_pages(self, pages: int) -> None:
+        self.pages += pages
+        self._notify()
+
+    def _notify(self, *_: object) -> None:
+        # Every waiting iterator holds the old event, so none of them misses it
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def __await__(self) -> Generator[object, None, object]:
+        return self._task.__await__()
+
+    def __aiter__(self) -> AsyncIterator[int]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[int]:
+        reported = None
+        while True:
+            changed = self._changed
+            if self.pages != reported:
+                reported = self.pages
+                yield reported
+            if self._task.done():
+                return
+            await changed.wait()
+
+    def cancel(self) -> bool:
+        """Cancel the call. A running call stops at the next page it processes."""
+        return self._task.cancel()
+
+    def done(self) -> bool:
+        return self._task.done()
+
+
+class Pool:
+    """Pool of worker processes for asyncio code.
+
+    Use it as an async context manager, or call `close` when done with it. A pool
+    belongs to the event loop it is first used from.
+
+    :param max_workers: Number of worker processes. Values below 1 use all the
+        available CPU cores.
+    :param max_concurrency: Maximum number of calls that run at once. The others wait
+        in the event loop, where cancelling them costs nothing. Values below 1 use
+        `max_workers`.
+    """
+
+    def __init__(self, max_workers: int = 0, max_concurrency: int = 0) -> None:
+        if max_workers < 1:
+            max_workers = os.cpu_count() or 1
+        if max_concurrency < 1:
+            max_concurrency = max_workers
+        self._stop_flags = multiprocessing.Array("b", max_concurrency, lock=False)
+        self._progress = multiprocessing.Queue()
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(self._stop_flags, self._progress),
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._free_slots = list(range(max_concurrency))
+        # Running operations by the IDs of their calls, with the loops they belong to.
+        # Slots are reused, so progress that arrives late must not be matched by slot
+        self._operations: dict[int, tuple[asyncio.AbstractEventLoop, Operation]] = {}
+        self._call_ids = itertools.count()
+        self._pump = threading.Thread(target=self._pump_progress, daemon=True)
+        self._pump.start()
+
+    def _pump_progress(self) -> None:
+        """Hand the progress of the worker processes to the operations."""
+        while (item := self._progress.get()) is not None:
+            call_id, pages = item
+            operation = self._operations.get(call_id)
+            if operation is not None:
+                loop, operation = operation
+                loop.call_soon_threadsafe(operation._add_pages, pages)
+
+    def submit(
+        self,
+        function: Callable,
+        *args: object,
+        timeout: Optional[float] = None,
+        **kwargs: object,
+    ) -> Operation:
+        """Run a function in a worker process.
+
+        :param function: Function to run. It has to be importable by the workers, and
+            its arguments and result must be picklable.
+        :param timeout: Seconds to give the call once it is handed to a worker, not
+            counting the time it waits for `max_concurrency`. It raises
+            `TimeoutError` when they run out.
+        :return: The running call.
+        """
+        operation = Operation()
+        operation._task = asyncio.get_running_loop().create_task(
+            self._run(operation, function, args, kwargs, timeout)
+        )
+        operation._task.add_done_callback(operation._notify)
+        return operation
+
+    async def _run(
+        self,
+        operation: Operation,
+        function: Callable,
+        args: tuple,
+        kwargs: dict,
+        timeout: Optional[float],
+    ) -> object:
+        async with self._semaphore:
+            slot = self._free_slots.pop()
+            call_id = next(self._call_ids)
+            self._stop_flags[slot] = 0
+            self._operations[call_id] = (asyncio.get_running_loop(), operation)
+            future = self._executor.submit(_call, slot, call_id, function, args, kwargs)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                await self._stop(slot, future)
+                raise
+            finally:
+                del self._operations[call_id]
+                self._free_slots.append(slot)
+
+    async def _stop(self, slot: int, future: Future) -> None:
+        """Ask a running call to stop and wait until its worker is free again."""
+        if future.cancel():
+            return
+        self._stop_flags[slot] = 1
+        waiter = asyncio.wrap_future(future)
+        while not waiter.done():
+            # Cancelling the caller again must not free the slot early
+            with contextlib.suppress(asyncio.CancelledError):
+                await asyncio.wait([waiter])
+        if not waiter.cancelled():
+            waiter.exception()
+
+    def bundle(
+        self, *args: object, timeout: Optional[float] = None, **kwargs: object
+    ) -> Operation:
+        """Bundle files together, see `pdf_helper.bundle`."""
+        return self.submit(bundle, *args, timeout=timeout, **kwargs)
+
+    def merge_pdfs(
+        self, *args: object, timeout: Optional[float] = None, **kwargs: object
+    ) -> Operation:
+        """Merge PDF files, see `pdf_helper.merge_pdfs`."""
+        return self.submit(merge_pdfs, *args, timeout=timeout, **kwargs)
+
+    def pdf_to_image(
+        self, *args: object, timeout: Optional[float] = None, **kwargs: object
+    ) -> Operation:
+        """Convert a PDF file to images, see `pdf_helper.pdf_to_image`. The pages are
+        rendered by one worker; the pool runs many files at once instead."""
+        return self.submit(pdf_to_image, *args, timeout=timeout, **kwargs)
+
+    def extract_text(
+        self, *args: object, timeout: Optional[float] = None, **kwargs: object
+    ) -> Operation:
+        """Extract text from a PDF file, see `pdf_helper.extract_text`."""
+        return self.submit(extract_text, *args, timeout=timeout, **kwargs)
+
+    def split_pdf(
+        self, *args: object, timeout: Optional[float] = None, **kwargs: object
+    ) -> Operation:
+        """Split a PDF file, see `pdf_helper.split_pdf`."""
+        return self.submit(split_pdf, *args, timeout=timeout, **kwargs)
+
+    async def close(self) -> None:
+        """Wait for the running calls and shut the worker processes down."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+        self._progress.put(None)
+        await loop.run_in_executor(None, self._pump.join)
+        self._progress.close()
+
+    async def __aenter__(self) -> "Pool":
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        await self.close()
@@ -0,0 +1,236 @@
+"""Run a command over many PDF files with one shared pool of worker processes.
+
+`to-image` and `extract-text` are split into tasks of a few pages each, and `split`
+into shares of the parts of each file, so the workers stay busy even when one of the
+files is much larger than the others. `remove-pages` writes one output per file and
+runs as one task per file.
+"""
+
+import os
+import glob
+import itertools
+from typing import Callable, Optional, Sequence, Collection
+from pathlib import Path
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import log21
+from pypdfium2 import PdfDocument
+
+from . import (
+    iter_text,
+    PageSet,
+    profiling,
+    remove_pages,
+    _write_parts,
+    _share_parts,
+    _render_pages,
+    _render_options,
+)
+
+__all__ = ["COMMANDS", "expand_inputs", "format_output", "run_batch"]
+
+# Default output templates of the commands that can run in batch mode
+COMMANDS = {
+    "to-image": "{parent}/{stem}",
+    "extract-text": "{parent}/{stem}.txt",
+    "remove-pages": "{parent}/{stem}-removed.pdf",
+    "split": "{parent}/{stem}",
+}
+
+
+def expand_inputs(inputs: Sequence[str | Path]) -> list[Path]:
+    """Expand globs, directories and file lists into a list of PDF files.
+
+    :param inputs: Paths, glob patterns, directories (every PDF in them is used) and
+        file lists prefixed with `@` (one path per line).
+    :return: The PDF files, without duplicates, in the order they were given.
+    """
+    files: dict[Path, None] = {}
+    for item in inputs:
+        item = str(item)
+        if item.startswith("@"):
+            with open(item[1:], "r", encoding="utf-8") as file_list:
+                lines = [line.strip() for line in file_list]
+            files.update(dict.fromkeys(expand_inputs([x for x in lines if x])))
+        elif os.path.isdir(item):
+            files.update(dict.fromkeys(sorted(Path(item).glob("*.[pP][dD][fF]"))))
+        elif glob.has_magic(item):
+            files.update(dict.fromkeys(Path(x) for x in sorted(glob.glob(item))))
+        else:
+            files[Path(item)] = None
+    return list(files)
+
+
+def format_output(template: str, input_file: Path) -> Path:
+    """Build the output path of an input file from a template.
+
+    :param template: Output template. `{stem}`, `{name}` and `{parent}` are replaced
+        with the stem, the name and the directory of the input file.
+    :param input_file: Input file.
+    :return: The output path.
+    """
+    return Path(
+        template.format(
+            stem=input_file.stem, name=input_file.name, parent=input_file.parent
+        )
+    )
+
+
+def _text_task(input_file: Path, pages: Sequence[int], separator: str) -> str:
+    return "".join(text + separator for _, text in iter_text(input_file, pages))
+
+
+def _chunks(pages: Sequence[int], size: int) -> list[Sequence[int]]:
+    return [pages[i : i + size] for i in range(0, len(pages), size)]
+
+
+def run_batch(
+    command: str,
+    input_files: Sequence[Path],
+    output_template: Optional[str] = None,
+    pages: Optional[PageSet | Collection[int]] = None,
+    scale: float = 2,
+    workers: int = 0,
+    pages_per_task: int = 8,
+    force: bool = False,
+) -> dict[Path, Optional[str]]:
+    """Run a command over many PDF files.
+
+    :param command: One of the keys of `COMMANDS`.
+    :param input_files: PDF files to process.
+    :param output_template: Output path template, see `format_output`. Each command
+        has its own default.
+    :param pages: Pages to convert or extract text from, pages to remove or split
+        points, depending on the command. Open-ended ranges and ranges from the end
+        are resolved against each file.
+    :param scale: Scale of each image. (Used by `to-image`)
+    :param workers: Number of worker processes. Values below 1 use all the available
+        CPU cores.
+    :param pages_per_task: Number of pages each task of `to-image` and
+        `extract-text` handles.
+    :param force: Overwrite existing outputs.
+    :return: The error message of each input file, or None for the ones that
+        succeeded.
+    """
+    if command not in COMMANDS:
+        raise ValueError(f"Unsupported batch command: {command}")
+    if command == "remove-pages" and not pages:
+        raise ValueError("remove-pages needs the pages to remove")
+    if pages is not None:
+        pages = PageSet.of(pages)
+    template = output_template or COMMANDS[command]
+    if workers < 1:
+        workers = os.cpu_count() or 1
+
+    results: dict[Path, Optional[str]] = {}
+    tasks: dict[Path, list[Future]] = {}
+    # Called with the results of the tasks of a file once all of them succeed
+    finishers: dict[Path, Callable[[list], None]] = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for input_file in input_files:
+            output = format_output(template, input_file)
+            if not input_file.exists():
+                results[input_file] = "Input file does not exist"
+                continue
+            if (
+                output.exists()
+                and not force
+                and (output.is_file() or os.listdir(output))
+            ):
+                results[input_file] = f"Output `{output}` already exists"
+                continue
+            try:
+                pdf = PdfDocument(input_file)
+                number_of_pages = len(pdf)
+                pdf.close()
+            except Exception as ex:
+                results[input_file] = f"{ex.__class__.__name__}: {ex}"
+                continue
+
+            if command == "to-image":
+                output.mkdir(parents=True, exist_ok=True)
+                if pages:
+                    selection = pages.resolve(number_of_pages)
+                else:
+                    selection = PageSet(range(1, number_of_pages + 1))
+                name = input_file.name.rsplit(".", maxsplit=1)[0]
+                length = len(str(number_of_pages))
+                tasks[input_file] = [
+                    profiling.submit(
+                        executor,
+                        _render_pages,
+                        input_file,
+                        output,
+                        name,
+                        length,
+                        chunk,
+                        _render_options(scale),
+                    )
+                    for chunk in _chunks(selection, pages_per_task)
+                ]
+            elif command == "extract-text":
+                if pages:
+                    try:
+                        pages.validate(number_of_pages)
+                    except ValueError as ex:
+                        results[input_file] = (
+                            f"{ex} (the file has {number_of_pages} pages)"
+                        )
+                        continue
+                    selection = pages.resolve(number_of_pages)
+                else:
+                    selection = PageSet(range(1, number_of_pages + 1))
+                # When every page is extracted, the pages are separated by new lines
+                separator = "" if pages else "\n"
+                tasks[input_file] = [
+                    profiling.submit(executor, _text_task, input_file, chunk, separator)
+                    for chunk in _chunks(selection, pages_per_task)
+                ]
+
+                def finish(texts: list[str], output: Path = output) -> None:
+                    output.parent.mkdir(parents=True, exist_ok=True)
+                    with output.open("w", encoding="utf-8") as file:
+                        file.writelines(texts)
+
+                finishers[input_file] = finish
+            elif command == "remove-pages":
+                output.parent.mkdir(parents=True, exist_ok=True)
+                tasks[input_file] = [
+                    profiling.submit(executor, remove_pages, input_file, pages, output)
+                ]
+            else:
+                output.mkdir(parents=True, exist_ok=True)
+                if pages:
+                    # There is nothing to split after the last page
+                    split_points = [0, *pages.resolve(number_of_pages - 1)]
+                else:
+                    split_points = list(range(number_of_pages))
+                split_points.append(number_of_pages)
+                parts = [
+                    (start, end, output / f"{input_file.stem}_part_{i + 1}.pdf")
+                    for i, (start, end) in enumerate(itertools.pairwise(split_points))
+                    if 0 <= start < end <= number_of_pages
+                ]
+                # Each task opens the source once for a share of the parts
+                tasks[input_file] = [
+                    profiling.submit(executor, _write_parts, input_file, share)
+                    for share in _share_parts(parts, workers)
+                ]
+
+        for input_file, futures in tasks.items():
+            try:
+                values = [future.result() for future in futures]
+                if input_file in finishers:
+                    finishers[input_file](values)
+                results[input_file] = None
+                log21.info(f"Done: {input_file}")
+            except BaseException as ex:
+                for future in futures:
+                    future.cancel()
+                if isinstance(ex, KeyboardInterrupt):
+                    raise
+                results[input_file] = f"{ex.__class__.__name__}: {ex}"
+                log21.error(f"Failed: {input_file}: {results[input_file]}")
+
+    return {input_file: results[input_file] for input_file in input_files}
@@ -0,0 +1,217 @@
+"""Store identical streams of a PDF once.
+
+A PDF merged or bundled from files made by the same generator carries a copy of the
+same fonts, images and ICC profiles for every file. `dedupe_streams` rewrites a PDF
+saved by pdfium so that the references to identical streams all point to one of them,
+and drops the others.
+
+pdfium saves every object on its own, indexed by a single cross-reference table, so
+the objects are found through the table and only the syntax around the stream data
+is parsed. Streams are compared by a hash of their data and their dictionary. The
+references in the dictionaries are pointed at the streams that are kept first, so
+that, e.g., two images with identical soft masks are found identical once the masks
+are; this repeats until no more streams are merged.
+"""
+
+import re
+import hashlib
+from typing import Callable, Iterator, Optional
+
+import log21
+
+__all__ = ["dedupe_streams"]
+
+# Whitespace and delimiters, the bytes that end a regular token
+_DELIMITERS = rb"\s()<>\[\]{}/%"
+_TOKEN = re.compile(
+    rb"(?P<ref>(?P<number>\d+)\s+(?P<generation>\d+)\s+R(?![^" + _DELIMITERS + rb"]))"
+    rb"|(?P<string>\()"
+    rb"|(?P<hex><[^<>]*>)"
+    rb"|(?P<comment>%[^\r\n]*)"
+    rb"|(?P<open><<)"
+    rb"|(?P<close>>>)"
+    rb"|(?P<regular>/?[^" + _DELIMITERS + rb"]+)"
+    rb"|(?P<other>.)",
+    re.DOTALL,
+)
+_TRAILER_END = re.compile(rb"startxref\s+(\d+)\s+%%EOF\s*$")
+_OBJECT_HEADER = re.compile(rb"(\d+)\s+(\d+)\s+obj")
+# Keys of the trailer this pass cannot keep valid: encrypted objects are encrypted
+# with their numbers, and the others point to more cross-reference data
+_UNSUPPORTED_KEYS = re.compile(rb"/(Encrypt|Prev|XRefStm)(?![^" + _DELIMITERS + rb"])")
+
+# How objects are referred to: a reference, by its number and generation, gives the
+# new number of the object, or None for references to objects that do not exist
+_Renumber = Callable[[int, int], Optional[int]]
+
+
+def _scan(data: bytes) -> Iterator[tuple[str, re.Match, int]]:
+    """Split PDF syntax into tokens, yielding the kind, match and end of each."""
+    position = 0
+    while position < len(data):
+        match = _TOKEN.match(data, position)
+        end = match.end()
+        if match.lastgroup == "string":
+            # Literal strings nest balanced parentheses and escape the others
+            depth = 1
+            while depth and end < len(data):
+                if data[end] == ord("\\"):
+                    end += 1
+                elif data[end] == ord("("):
+                    depth += 1
+                elif data[end] == ord(")"):
+                    depth -= 1
+                end += 1
+        yield match.lastgroup, match, end
+        position = end
+
+
+def _rewrite(data: bytes, renumber: _Renumber) -> bytes:
+    """Point the references in PDF syntax, but not in its strings, at new numbers."""
+    parts = []
+    last = 0
+    for kind, match, _ in _scan(data):
+        if kind == "ref":
+            number = renumber(int(match["number"]), int(match["generation"]))
+            parts.append(data[last : match.start()])
+            parts.append(b"null" if number is None else b"%d 0 R" % number)
+            last = match.end()
+    parts.append(data[last:])
+    return b"".join(parts)
+
+
+def _split_stream(content: bytes) -> tuple[bytes, bytes]:
+    """Split the content of an object into its syntax and the data of its stream,
+    with what follows it. Objects that are not streams have no data."""
+    depth = 0
+    for kind, match, end in _scan(content):
+        if kind == "open":
+            depth += 1
+        elif kind == "close":
+            depth -= 1
+        elif kind == "regular" and depth == 0 and match[0] == b"stream":
+            # The data starts after the end of line that follows the keyword
+            start = end + (2 if content[end : end + 2] == b"\r\n" else 1)
+            return content[:start], content[start:]
+    return content, b""
+
+
+def _parse(
+    data: bytes,
+) -> Optional[tuple[bytes, dict[int, tuple[int, bytes, bytes]], bytes]]:
+    """Find the objects of a PDF through its cross-reference table.
+
+    :return: The header of the file, the generation, syntax and stream data of each
+        object by its number, and the trailer dictionary, or None if the PDF is not
+        laid out as pdfium saves it.
+    """
+    match = _TRAILER_END.search(data, max(len(data) - 1024, 0))
+    if match is None:
+        return None
+    xref = int(match[1])
+    trailer_start = data.find(b"trailer", xref)
+    trailer_end = data.find(b"startxref", trailer_start)
+    if not data.startswith(b"xref", xref) or min(trailer_start, trailer_end) < 0:
+        return None
+    trailer = data[trailer_start + len(b"trailer") : trailer_end]
+    if _UNSUPPORTED_KEYS.search(trailer):
+        return None
+
+    fields = data[xref + len(b"xref") : trailer_start].split()
+    entries = {}
+    try:
+        i = 0
+        while i < len(fields):
+            first, count = int(fields[i]), int(fields[i + 1])
+            i += 2
+            for number in range(first, first + count):
+                offset, generation, kind = fields[i : i + 3]
+                i += 3
+                if kind == b"n":
+                    entries[number] = (int(offset), int(generation))
+    except (ValueError, IndexError):
+        return None
+    if not entries:
+        return None
+
+    # Each object ends where the next one, or the cross-reference table, starts
+    starts = sorted(offset for offset, _ in entries.values())
+    ends = dict(zip(starts, starts[1:] + [xref], strict=True))
+    objects = {}
+    for number, (offset, generation) in entries.items():
+        header = _OBJECT_HEADER.match(data, offset, ends[offset])
+        end = data.rfind(b"endobj", offset, ends[offset])
+        if header is None or int(header[1]) != number or end < 0:
+            return None
+        objects[number] = (generation, *_split_stream(data[header.end() : end]))
+    return data[: starts[0]], objects, trailer
+
+
+def dedupe_streams(data: bytes) -> bytes:
+    """Store the identical streams of a PDF saved by pdfium once.
+
+    :param data: Contents of the PDF.
+    :return: Contents of the PDF with one copy of each stream, or `data` itself if it
+        has no identical streams or is not laid out as pdfium saves it, e.g. when it
+        is encrypted.
+    """
+    parsed = _parse(data)
+    if parsed is None:
+        log21.warning("Cannot deduplicate the streams of this PDF, keeping it as is")
+        return data
+    header, objects, trailer = parsed
+
+    # Every object is kept as itself until it is found identical to an earlier one
+    kept = {number: number for number in objects}
+
+    def find(number: int, generation: int) -> Optional[int]:
+        if number not in objects or objects[number][0] != generation:
+            return None
+        while kept[number] != number:
+            number = kept[number]
+        return number
+
+    digests = {
+        number: hashlib.sha256(stream).digest()
+        for number, (_, _, stream) in objects.items()
+        if stream
+    }
+    merged = True
+    while merged:
+        merged = False
+        seen: dict[tuple[bytes, bytes], int] = {}
+        for number, digest in digests.items():
+            if kept[number] != number:
+                continue
+            key = (_rewrite(objects[number][1], find), digest)
+            kept[number] = seen.setdefault(key, number)
+            merged |= kept[number] != number
+    numbers = [number for number in sorted(objects) if kept[number] == number]
+    if len(numbers) == len(objects):
+        return data
+
+    new_numbers = {number: i for i, number in enumerate(numbers, 1)}
+
+    def renumber(number: int, generation: int) -> Optional[int]:
+        number = find(number, generation)
+        return None if number is None else new_numbers[number]
+
+    output = bytearray(header)
+    offsets = []
+    for number in numbers:
+        offsets.append(len(output))
+        _, syntax, stream = objects[number]
+        output += b"%d 0 obj" % new_numbers[number]
+        output += _rewrite(syntax, renumber) + stream + b"endobj\r\n"
+    xref = len(output)
+    output += b"xref\r\n0 %d\r\n0000000000 65535 f\r\n" % (len(numbers) + 1)
+    output += b"".join(b"%010d 00000 n\r\n" % offset for offset in offsets)
+    trailer = re.sub(
+        rb"/Size\s+\d+", b"/Size %d" % (len(numbers) + 1), _rewrite(trailer, renumber)
+    )
+    output += b"trailer" + trailer + b"startxref\r\n%d\r\n%%%%EOF\r\n" % xref
+    log21.info(
+        f"Stored {len(objects) - len(numbers)} duplicate streams once, saving "
+        f"{len(data) - len(output)} bytes"
+    )
+    return bytes(output)
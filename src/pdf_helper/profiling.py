@@ -0,0 +1,336 @@
+"""Record where the time goes in PDF-Helper operations.
+
+The operations wrap their phases (open, import, render, encode, save, ...) and the
+recipe runner wraps its steps in `span()`. While profiling is off, `span()` returns a
+shared no-op context manager, so the instrumentation costs next to nothing.
+
+While it is on, each span records its wall time, CPU time, the pages it processed
+and, where the platform reports them, the bytes read and written and the peak memory
+of the process. The spans are saved as a Chrome trace (open it in Perfetto or
+chrome://tracing) and summarized as a table.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+from typing import Callable, Iterator, Optional
+from pathlib import Path
+from concurrent.futures import Future, Executor
+
+__all__ = [
+    "Profiler",
+    "is_active",
+    "start",
+    "finish",
+    "profile",
+    "span",
+    "count",
+    "set_listener",
+    "submit",
+]
+
+_NULL_SPAN = contextlib.nullcontext()
+_profiler: Optional["Profiler"] = None
+_listener: Optional[Callable[[dict[str, int]], None]] = None
+_has_io_counters = sys.platform.startswith("linux")
+
+
+def _io_counters() -> Optional[tuple[int, int]]:
+    """Get the number of bytes this process read and wrote so far."""
+    global _has_io_counters
+    if not _has_io_counters:
+        return None
+    try:
+        with open("/proc/self/io", "rb") as file:
+            fields = dict(line.split(b":") for line in file.read().splitlines())
+        return int(fields[b"rchar"]), int(fields[b"wchar"])
+    except (OSError, KeyError, ValueError):
+        _has_io_counters = False
+        return None
+
+
+def _peak_rss() -> Optional[int]:
+    """Get the peak resident set size of this process in bytes."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, the other platforms report kilobytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _Span:
+    def __init__(
+        self, profiler: "Profiler", name: str, category: str, args: dict
+    ) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+        self.counters: dict[str, int] = {}
+
+    def __enter__(self) -> "_Span":
+        self.profiler.stack.append(self)
+        self.io = _io_counters()
+        self.cpu = time.process_time()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        end = time.perf_counter_ns()
+        cpu = time.process_time() - self.cpu
+        self.profiler.stack.pop()
+        args = {**self.args, **self.counters, "cpu_time": cpu}
+        io = _io_counters()
+        if io is not None and self.io is not None:
+            args["bytes_read"] = io[0] - self.io[0]
+            args["bytes_written"] = io[1] - self.io[1]
+        peak_rss = _peak_rss()
+        if peak_rss is not None:
+            args["peak_rss"] = peak_rss
+        self.profiler.add_events(
+            [
+                {
+                    "name": self.name,
+                    "cat": self.category,
+                    "ph": "X",
+                    "ts": self.start / 1000,
+                    "dur": (end - self.start) / 1000,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": args,
+                }
+            ]
+        )
+
+
+class Profiler:
+    """Collects the spans of this process and the worker processes it started."""
+
+    def __init__(self) -> None:
+        self.events: list[dict] = []
+        self.stack: list[_Span] = []
+        self._lock = threading.Lock()
+
+    def add_events(self, events: list[dict]) -> None:
+        # Events of worker processes are added from the threads of the executors
+        with self._lock:
+            self.events.extend(events)
+
+    def save_trace(self, path: str | Path) -> None:
+        """Save the spans in the Chrome trace event format."""
+        names = {os.getpid(): "pdf-helper"}
+        for event in self.events:
+            names.setdefault(event["pid"], f"worker {event['pid']}")
+        metadata = [
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}}
+            for pid, name in names.items()
+        ]
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}, file
+            )
+
+    def summary(self) -> list[dict]:
+        """Sum up the spans by category and name, slowest first."""
+        rows: dict[tuple[str, str], dict] = {}
+        for event in self.events:
+            args = event["args"]
+            row = rows.setdefault(
+                (event["cat"], event["name"]),
+                {
+                    "category": event["cat"],
+                    "name": event["name"],
+                    "count": 0,
+                    "wall_time": 0.0,
+                    "cpu_time": 0.0,
+                    "pages": 0,
+                    "bytes_read": 0,
+                    "bytes_written": 0,
+                    "peak_rss": 0,
+                },
+            )
+            row["count"] += 1
+            row["wall_time"] += event["dur"] / 1e6
+            row["cpu_time"] += args["cpu_time"]
+            row["pages"] += args.get("pages", 0)
+            row["bytes_read"] += args.get("bytes_read", 0)
+            row["bytes_written"] += args.get("bytes_written", 0)
+            row["peak_rss"] = max(row["peak_rss"], args.get("peak_rss", 0))
+        return sorted(rows.values(), key=lambda row: -row["wall_time"])
+
+    def format_summary(self) -> str:
+        """Format the summary as a table."""
+        megabyte = 1024 * 1024
+        lines = [
+            f"{'span':<32} {'count':>6} {'wall (s)':>9} {'cpu (s)':>9} {'pages':>7} "
+            f"{'read (MB)':>10} {'written (MB)':>12} {'peak (MB)':>10}"
+        ]
+        lines.append("-" * len(lines[0]))
+        for row in self.summary():
+            name = f"{row['category']}:{row['name']}"
+            lines.append(
+                f"{name:<32} {row['count']:>6} {row['wall_time']:>9.3f} "
+                f"{row['cpu_time']:>9.3f} {row['pages']:>7} "
+                f"{row['bytes_read'] / megabyte:>10.1f} "
+                f"{row['bytes_written'] / megabyte:>12.1f} "
+                f"{row['peak_rss'] / megabyte:>10.1f}"
+            )
+        return "\n".join(lines)
+
+
+# Where `finish` saves the trace of the profiler started by `start`, and the span
+# that covers everything between the two
+_trace_path: Optional[Path] = None
+_root_span: Optional[_Span] = None
+
+
+def is_active() -> bool:
+    return _profiler is not None
+
+
+def start(
+    trace_path: Optional[str | Path] = None, name: Optional[str] = None
+) -> Profiler:
+    """Start profiling this process.
+
+    :param trace_path: Path `finish` saves the Chrome trace to.
+    :param name: Name of a `command` span that covers everything until `finish`.
+    :return: The profiler.
+    """
+    global _profiler, _trace_path, _root_span
+    _profiler = Profiler()
+    _trace_path = Path(trace_path) if trace_path else None
+    _root_span = _Span(_profiler, name, "command", {}) if name else None
+    if _root_span is not None:
+        _root_span.__enter__()
+    return _profiler
+
+
+def finish() -> Optional[Profiler]:
+    """Stop profiling, save the trace and print the summary to stderr.
+
+    Does nothing if profiling was not started.
+
+    :return: The profiler that was stopped, if any.
+    """
+    global _profiler, _trace_path, _root_span
+    if _root_span is not None:
+        _root_span.__exit__(None, None, None)
+    profiler, trace_path = _profiler, _trace_path
+    _profiler = _trace_path = _root_span = None
+    if profiler is None:
+        return None
+    if trace_path is not None:
+        profiler.save_trace(trace_path)
+        print(f"Saved the trace to {trace_path}", file=sys.stderr)
+    print(profiler.format_summary(), file=sys.stderr)
+    return profiler
+
+
+@contextlib.contextmanager
+def profile(trace_path: Optional[str | Path] = None) -> Iterator[Optional[Profiler]]:
+    """Profile a block of code.
+
+    :param trace_path: Path to save the Chrome trace to. If None, nothing is
+        profiled.
+    """
+    if trace_path is None:
+        yield None
+        return
+    profiler = start(trace_path)
+    try:
+        yield profiler
+    finally:
+        finish()
+
+
+def span(
+    name: str, category: str = "phase", **args: object
+) -> contextlib.AbstractContextManager:
+    """Measure a block of code while profiling is active.
+
+    :param name: Name of the span, e.g. the phase or the step ID.
+    :param category: Category of the span, e.g. `phase`, `step` or `command`.
+    :param args: Extra values to record with the span.
+    """
+    if _profiler is None:
+        return _NULL_SPAN
+    return _Span(_profiler, name, category, args)
+
+
+def count(**counters: int) -> None:
+    """Add to the counters (e.g. `pages`) of the innermost span."""
+    if _listener is not None:
+        _listener(counters)
+    if _profiler is None or not _profiler.stack:
+        return
+    span_counters = _profiler.stack[-1].counters
+    for key, value in counters.items():
+        span_counters[key] = span_counters.get(key, 0) + value
+
+
+def set_listener(listener: Optional[Callable[[dict[str, int]], None]]) -> None:
+    """Call a function with the counters of every `count()` in this process, whether
+    profiling is on or not. `pdf_helper.aio` uses it to report the progress of its
+    worker processes.
+
+    :param listener: Function to call, or None to stop calling the current one. It
+        may raise to abort the operation that is counting.
+    """
+    global _listener
+    _listener = listener
+
+
+def _traced_call(
+    function: Callable, args: tuple, kwargs: dict
+) -> tuple[object, list[dict]]:
+    """Profile a call in a worker process and return its result with its spans."""
+    global _profiler
+    _profiler = Profiler()
+    try:
+        return function(*args, **kwargs), _profiler.events
+    finally:
+        _profiler = None
+
+
+class _TracedFuture(Future):
+    """Unwraps the result of `_traced_call` and hands its spans to the profiler."""
+
+    def __init__(self, inner: Future, profiler: Profiler) -> None:
+        super().__init__()
+        self._inner = inner
+        self._profiler = profiler
+        inner.add_done_callback(self._copy)
+
+    def cancel(self) -> bool:
+        return self._inner.cancel()
+
+    def _copy(self, inner: Future) -> None:
+        if inner.cancelled():
+            super().cancel()
+            self.set_running_or_notify_cancel()
+        elif inner.exception() is not None:
+            self.set_exception(inner.exception())
+        else:
+            result, events = inner.result()
+            self._profiler.add_events(events)
+            self.set_result(result)
+
+
+def submit(
+    executor: Executor, function: Callable, *args: object, **kwargs: object
+) -> Future:
+    """Submit a call to an executor, collecting its spans while profiling is active.
+
+    :return: A future of the result of the call.
+    """
+    if _profiler is None:
+        return executor.submit(function, *args, **kwargs)
+    return _TracedFuture(
+        executor.submit(_traced_call, function, args, kwargs), _profiler
+    )
@@ -1,20 +1,30 @@
 # yapf: disable
 
+import io
 import os
 import sys
+import copy
+import json
 import shutil
+import hashlib
+from typing import Iterable, Iterator, Optional
 from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 
 import yaml
 import log21
-import pypdfium2 as pdfium
-from pypdfium2 import PdfImage, PdfBitmap, PdfDocument
+from pypdfium2 import PdfDocument
 
-from . import (bundle as _bundle, split_pdf as _split_pdf, encrypt_pdf as _encrypt_pdf,
+from . import (__version__, _save, _open_pdf, _file_type, _add_image_page,
+               bundle as _bundle, split_pdf as _split_pdf,
+               encrypt_pdf as _encrypt_pdf,
                extract_text as _extract_text, pdf_to_image as _pdf_to_image,
                remove_pages as _remove_pages, set_metadata as _set_metadata,
-               watermark_pdf as _watermark_pdf)
-from .utils import parse_pages
+               watermark_pdf as _watermark_pdf,
+               pdf_to_thumbnails as _pdf_to_thumbnails)
+from . import profiling
+from .utils import PageSet
+from .text_cache import TextCache
 
 # yapf: enable
 
@@ -23,6 +33,16 @@ class RecipeError(Exception):
     pass
 
 
+def _page_set(value: Optional[str | list[int]]) -> Optional[PageSet]:
+    """Get the pages of a `pages`, `pages_to_remove` or `split_points` field."""
+    if value is None:
+        return None
+    try:
+        return PageSet.of(value)
+    except ValueError as ex:
+        raise RecipeError(str(ex)) from ex
+
+
 def _load(path: str | Path) -> dict:
     with open(path, "r", encoding="utf-8") as f:
         recipe = yaml.safe_load(f)
@@ -37,6 +57,18 @@ class Context:
         self.settings = recipe.get("settings", {})
         self.outputs: dict[str, str] = {}
         self.resolved_inputs: dict[str, object] = {}
+        # Intermediate PDFs kept in memory instead of being written to the temp dir,
+        # keyed by their normalized output path
+        self.artifacts: dict[str, bytes] = {}
+        self.memory_budget = int(self.settings.get("memory_budget", 0) * 1024 * 1024)
+        # `text_cache` is either true (use the default directory) or a directory
+        self.text_cache: Optional[TextCache] = None
+        if self.settings.get("text_cache"):
+            directory = self.settings["text_cache"]
+            self.text_cache = TextCache(
+                directory if isinstance(directory, str) else None,
+                self.settings.get("text_cache_size"),
+            )
         self._resolve_inputs()
 
     def _resolve_inputs(self) -> None:
@@ -79,6 +111,80 @@ class Context:
     def ensure_parent(self, path: str) -> None:
         Path(path).parent.mkdir(parents=True, exist_ok=True)
 
+    def is_intermediate(self, path: str) -> bool:
+        """Check whether a path points into the temp dir of the recipe."""
+        td = Path(self.settings.get("temp_dir", "./.recipe-tmp")).absolute()
+        return Path(os.path.normpath(Path(path).absolute())).is_relative_to(
+            os.path.normpath(td)
+        )
+
+    def output_target(self, path: str) -> str | io.BytesIO:
+        """Get where a step should write the PDF it produces at `path`.
+
+        Intermediate PDFs are written to a buffer when a memory budget is set. Every
+        other output is written to disk.
+
+        :param path: Resolved output path of the step.
+        :return: The path itself or a buffer to be passed to `store` after writing.
+        """
+        if self.memory_budget > 0 and self.is_intermediate(path):
+            return io.BytesIO()
+        self.ensure_parent(path)
+        return path
+
+    def store(self, path: str, target: str | io.BytesIO) -> None:
+        """Keep a PDF written to a buffer by `output_target` in memory.
+
+        The PDF is written to disk instead if keeping it would exceed the memory
+        budget.
+
+        :param path: Resolved output path of the step.
+        :param target: The target returned by `output_target`.
+        """
+        if not isinstance(target, io.BytesIO):
+            return
+        data = target.getvalue()
+        key = os.path.normpath(path)
+        used = sum(len(v) for k, v in self.artifacts.items() if k != key)
+        if used + len(data) <= self.memory_budget:
+            self.artifacts[key] = data
+            return
+        log21.info(f"Memory budget exceeded; writing '{path}' to disk...")
+        self.artifacts.pop(key, None)
+        self.ensure_parent(path)
+        with open(path, "wb") as file:
+            file.write(data)
+
+    def open_input(self, value: object, need_path: bool = False) -> object:
+        """Resolve an input of a step, serving PDFs kept in memory from their buffer.
+
+        :param value: Input value to resolve.
+        :param need_path: Whether the caller needs a real file. PDFs kept in memory are
+            written to disk first in that case.
+        :return: The resolved value, or a buffer holding a PDF kept in memory.
+        """
+        value = self.resolve(value)
+        if not isinstance(value, str):
+            return value
+        key = os.path.normpath(value)
+        if key not in self.artifacts:
+            return value
+        if need_path:
+            self.ensure_parent(value)
+            with open(value, "wb") as file:
+                file.write(self.artifacts.pop(key))
+            return value
+        return io.BytesIO(self.artifacts[key])
+
+    def for_worker(self, keys: Iterable[str]) -> "Context":
+        """Copy the context for a worker process, with only the PDFs kept in memory
+        that the step it runs reads."""
+        worker_ctx = copy.copy(self)
+        worker_ctx.artifacts = {
+            key: self.artifacts[key] for key in keys if key in self.artifacts
+        }
+        return worker_ctx
+
     def cleanup(self) -> None:
         if self.settings.get("cleanup_temp"):
             log21.info("Cleaning up temporary files...")
@@ -96,94 +202,92 @@ class Context:
 def _handle_bundle(ctx: Context, step: dict) -> str:
     inputs = step.get("inputs", [])
     output = ctx.resolve(step["output"])
-    ctx.ensure_parent(output)
+    target = ctx.output_target(output)
 
     has_page_selection = any(isinstance(s, dict) and "pages" in s for s in inputs)
 
     if not has_page_selection:
-        resolved = [ctx.resolve(s) for s in inputs]
+        resolved = [ctx.open_input(s) for s in inputs]
         log21.info(f"Bundling {len(resolved)} files...")
-        _bundle(resolved, output)
+        try:
+            _bundle(resolved, target, step.get("dedupe", False))
+        except ValueError as ex:
+            raise RecipeError(str(ex)) from ex
+        ctx.store(output, target)
         return output
 
     writer = PdfDocument.new()
     for spec in inputs:
         if isinstance(spec, str):
-            path = ctx.resolve(spec)
-            log21.info(f"Adding '{path}' (all pages)...")
+            path = ctx.open_input(spec)
+            log21.info(f"Adding '{spec}' (all pages)...")
             _import_into_writer(writer, path)
         elif isinstance(spec, dict):
-            path = ctx.resolve(spec["path"])
+            path = ctx.open_input(spec["path"])
             pages_spec = spec.get("pages")
-            if pages_spec and str(path).lower().endswith(".pdf"):
-                if isinstance(pages_spec, str):
-                    pages = parse_pages(pages_spec)
-                else:
-                    pages = list(pages_spec)
-                pages_zero = [p - 1 for p in pages]
-                log21.info(f"Adding '{path}' pages {pages}...")
-                reader = PdfDocument(path)
-                writer.import_pages(reader, pages_zero)
+            if pages_spec and _sniff(path) == "pdf":
+                pages = _page_set(pages_spec)
+                log21.info(f"Adding '{spec['path']}' pages {pages}...")
+                reader = _open_pdf(path)
+                pages = pages.resolve(len(reader))
+                writer.import_pages(reader, [p - 1 for p in pages])
                 reader.close()
             else:
-                log21.info(f"Adding '{path}'...")
+                log21.info(f"Adding '{spec['path']}'...")
                 _import_into_writer(writer, path)
         else:
             raise RecipeError(f"Invalid bundle input: {spec}")
 
-    writer.save(output)
+    _save(writer, target, step.get("dedupe", False))
     count = len(writer)
     writer.close()
+    ctx.store(output, target)
     log21.info(f"Bundled {count} pages to {output}")
     return output
 
 
-def _import_into_writer(writer: PdfDocument, path: str) -> None:
-    if str(path).lower().endswith(".pdf"):
-        reader = PdfDocument(path)
+def _sniff(path: str | io.BytesIO) -> str:
+    """Tell whether an input of a bundle step is a PDF or an image from its contents."""
+    try:
+        return _file_type(path)
+    except ValueError as ex:
+        raise RecipeError(str(ex)) from ex
+
+
+def _import_into_writer(writer: PdfDocument, path: str | io.BytesIO) -> None:
+    if _sniff(path) == "pdf":
+        reader = _open_pdf(path)
         writer.import_pages(reader)
         reader.close()
     else:
-        from PIL import Image
-
-        image = Image.open(path)
-        bitmap = PdfBitmap.from_pil(image)
-        pdf_image = PdfImage.new(writer)
-        pdf_image.set_bitmap(bitmap)
-        matrix = pdfium.PdfMatrix().scale(bitmap.width, bitmap.height)
-        pdf_image.set_matrix(matrix)
-        page = writer.new_page(bitmap.width, bitmap.height)
-        page.insert_obj(pdf_image)
-        page.gen_content()
-        page.close()
-        pdf_image.close()
-        bitmap.close()
-        image.close()
+        _add_image_page(writer, path)
 
 
 def _handle_remove_pages(ctx: Context, step: dict) -> str:
-    input_file = ctx.resolve(step["input"])
-    pages = step.get("pages_to_remove", [])
+    input_file = ctx.open_input(step["input"])
+    pages = _page_set(step.get("pages_to_remove", []))
     output = ctx.resolve(step["output"])
-    ctx.ensure_parent(output)
-    log21.info(f"Removing pages {pages} from '{input_file}'...")
-    _remove_pages(input_file, pages, output)
+    target = ctx.output_target(output)
+    log21.info(f"Removing pages {pages} from '{ctx.resolve(step['input'])}'...")
+    _remove_pages(input_file, pages, target)
+    ctx.store(output, target)
     return output
 
 
 def _handle_split(ctx: Context, step: dict) -> str:
-    input_file = ctx.resolve(step["input"])
+    input_file = ctx.open_input(step["input"])
+    # PDFs kept in memory are named after the path they would have been written to
+    stem = Path(ctx.resolve(step["input"])).stem
     output_dir = ctx.resolve(step.get("output_dir", "."))
     prefix = step.get("output_prefix", "")
-    split_points = step.get("split_points")
+    split_points = _page_set(step.get("split_points"))
 
     Path(output_dir).mkdir(parents=True, exist_ok=True)
-    log21.info(f"Splitting '{input_file}'...")
-    _split_pdf(input_file, output_dir, split_points)
+    log21.info(f"Splitting '{ctx.resolve(step['input'])}'...")
+    _split_pdf(input_file, output_dir, split_points, name=stem)
 
     if prefix:
         out = Path(output_dir)
-        stem = Path(input_file).stem
         for f in sorted(out.glob(f"{stem}_part_*.pdf")):
             new = out / f.name.replace(f"{stem}_part_", prefix)
             f.rename(new)
@@ -192,38 +296,95 @@ def _handle_split(ctx: Context, step: dict) -> str:
 
 
 def _handle_to_image(ctx: Context, step: dict) -> str:
-    input_file = ctx.resolve(step["input"])
+    input_file = ctx.open_input(step["input"])
     output = ctx.resolve(step["output"])
     pages = step.get("pages")
     scale = step.get("scale", 2)
+    options = {
+        key: step[key]
+        for key in (
+            "format",
+            "quality",
+            "grayscale",
+            "png_compress_level",
+            "dpi",
+            "fit_width",
+            "fit_height",
+            "max_pixels",
+            "tile_size",
+            "separate_tiles",
+        )
+        if key in step
+    }
 
-    pages_parsed = parse_pages(pages) if isinstance(pages, str) else pages
+    pages_parsed = _page_set(pages)
 
     Path(output).mkdir(parents=True, exist_ok=True)
-    log21.info(f"Converting '{input_file}' to images...")
-    _pdf_to_image(input_file, output, pages_parsed, scale)
+    log21.info(f"Converting '{ctx.resolve(step['input'])}' to images...")
+    try:
+        _pdf_to_image(
+            input_file,
+            output,
+            pages_parsed,
+            scale,
+            name=Path(ctx.resolve(step["input"])).stem,
+            **options,
+        )
+    except ValueError as ex:
+        raise RecipeError(str(ex)) from ex
+    return str(output)
+
+
+def _handle_thumbnails(ctx: Context, step: dict) -> str:
+    input_file = ctx.open_input(step["input"])
+    output = ctx.resolve(step["output"])
+    pages = _page_set(step.get("pages"))
+    options = {
+        key: step[key]
+        for key in (
+            "width",
+            "grayscale",
+            "contact_sheet",
+            "columns",
+            "format",
+            "quality",
+        )
+        if key in step
+    }
+
+    log21.info(f"Rendering thumbnails of '{ctx.resolve(step['input'])}'...")
+    try:
+        _pdf_to_thumbnails(
+            input_file,
+            output,
+            pages,
+            name=Path(ctx.resolve(step["input"])).stem,
+            **options,
+        )
+    except ValueError as ex:
+        raise RecipeError(str(ex)) from ex
     return str(output)
 
 
 def _handle_extract_text(ctx: Context, step: dict) -> str:
-    input_file = ctx.resolve(step["input"])
+    input_file = ctx.open_input(step["input"])
     output = ctx.resolve(step["output"])
     pages = step.get("pages")
     max_chars = step.get("max_characters", -1)
     reverse = step.get("reverse_lines", False)
 
-    pages_parsed = parse_pages(pages) if isinstance(pages, str) else pages
+    pages_parsed = _page_set(pages)
 
     ctx.ensure_parent(output)
-    log21.info(f"Extracting text from '{input_file}'...")
-    text = _extract_text(input_file, pages_parsed, max_chars, reverse)
+    log21.info(f"Extracting text from '{ctx.resolve(step['input'])}'...")
+    text = _extract_text(input_file, pages_parsed, max_chars, reverse, ctx.text_cache)
     with open(output, "w", encoding="utf-8") as f:
         f.write(text)
     return str(output)
 
 
 def _handle_watermark(ctx: Context, step: dict) -> str:
-    input_file = ctx.resolve(step["input"])
+    input_file = ctx.open_input(step["input"], need_path=True)
     output = ctx.resolve(step["output"])
     text = step.get("text", "")
     position = step.get("position", "center")
@@ -242,7 +403,7 @@ def _handle_watermark(ctx: Context, step: dict) -> str:
 
 
 def _handle_encrypt(ctx: Context, step: dict) -> str:
-    input_file = ctx.resolve(step["input"])
+    input_file = ctx.open_input(step["input"], need_path=True)
     output = ctx.resolve(step["output"])
     password = ctx.resolve(step.get("password", ""))
     algorithm = step.get("algorithm", "AES-256")
@@ -258,7 +419,7 @@ def _handle_encrypt(ctx: Context, step: dict) -> str:
 
 
 def _handle_metadata(ctx: Context, step: dict) -> str:
-    input_file = ctx.resolve(step["input"])
+    input_file = ctx.open_input(step["input"], need_path=True)
     output = ctx.resolve(step["output"])
     meta = {
         k: step[k]
@@ -285,6 +446,7 @@ OPERATIONS = {
     "remove_pages": _handle_remove_pages,
     "split_pdf": _handle_split,
     "pdf_to_image": _handle_to_image,
+    "thumbnails": _handle_thumbnails,
     "extract_text": _handle_extract_text,
     "watermark": _handle_watermark,
     "encrypt": _handle_encrypt,
@@ -292,9 +454,447 @@ OPERATIONS = {
 }
 
 
-def run_recipe(recipe_path: str | Path) -> None:
+def _step_references(value: object) -> Iterator[str]:
+    """Find the ids of the steps referenced by `{step: ...}` in a step definition."""
+    if isinstance(value, dict):
+        if isinstance(value.get("step"), str):
+            yield value["step"]
+        for item in value.values():
+            yield from _step_references(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _step_references(item)
+
+
+def _step_paths(ctx: Context, step: dict) -> set[str]:
+    """Collect the plain file paths a step reads from."""
+    paths = set()
+    for spec in [step.get("input"), *step.get("inputs", [])]:
+        if isinstance(spec, dict):
+            spec = spec.get("path")
+        if isinstance(spec, str):
+            paths.add(os.path.normpath(ctx.resolve(spec)))
+    return paths
+
+
+def _build_dependencies(ctx: Context, steps: list[dict]) -> list[set[int]]:
+    """Build the dependency graph of the recipe steps.
+
+    A step depends on the steps it references with `{step: ...}`, the steps listed in
+    its `depends_on` field and any earlier step whose output it reads by path,
+    including files inside the `output_dir` of an earlier step.
+
+    :param ctx: Recipe context.
+    :param steps: Steps of the recipe.
+    :return: Indices of the steps each step depends on.
+    """
+    indices = {step["id"]: i for i, step in enumerate(steps) if step.get("id")}
+    produced: dict[str, int] = {}
+    dependencies = []
+    for i, step in enumerate(steps):
+        step_id = step.get("id", "")
+        depends_on = step.get("depends_on", [])
+        if isinstance(depends_on, str):
+            depends_on = [depends_on]
+        step_dependencies = set()
+        for ref in {*_step_references(step), *depends_on}:
+            if ref not in indices:
+                raise RecipeError(f"Step '{step_id}' depends on unknown step '{ref}'")
+            step_dependencies.add(indices[ref])
+        for path in _step_paths(ctx, step):
+            # The path itself or one of the directories it is in
+            while True:
+                if path in produced:
+                    step_dependencies.add(produced[path])
+                parent = os.path.dirname(path)
+                if parent == path or not parent:
+                    break
+                path = parent
+        for key in ("output", "output_dir"):
+            if isinstance(step.get(key), str):
+                produced[os.path.normpath(ctx.resolve(step[key]))] = i
+        dependencies.append(step_dependencies)
+    return dependencies
+
+
+def _hash_file(path: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def _snapshot(path: str) -> dict[str, list[int]]:
+    """Get the size and modification time of a file or of the files in a directory."""
+    if os.path.isfile(path):
+        files = [path]
+    elif os.path.isdir(path):
+        files = [entry.path for entry in os.scandir(path) if entry.is_file()]
+    else:
+        return {}
+    snapshot = {}
+    for file in files:
+        stat = os.stat(file)
+        snapshot[os.path.normpath(file)] = [stat.st_size, stat.st_mtime_ns]
+    return snapshot
+
+
+class BuildCache:
+    """Manifest of recipe steps whose outputs are up to date, in the style of make.
+
+    A step is fingerprinted by its definition, the content of the files it reads, the
+    fingerprints of the steps it depends on and the version of PDF-Helper. It is
+    skipped when its fingerprint matches the recorded one and the files it produced
+    are unchanged on disk.
+
+    Outputs kept in memory (see `memory_budget`) are recorded by their content hash.
+    As they are gone after the run, such a step is only skipped when every step that
+    depends on it is skipped too.
+    """
+
+    def __init__(self, path: Optional[str], rebuild: bool = False) -> None:
+        self.path = path
+        self.rebuild = rebuild
+        self.entries: dict[str, dict] = {}
+        self.fingerprints: dict[int, Optional[str]] = {}
+        # Steps that are up to date, found by `plan`
+        self.fresh: set[int] = set()
+        if path and os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    self.entries = json.load(file)["steps"]
+            except (OSError, ValueError, KeyError) as ex:
+                log21.warning(f"Ignoring unreadable build cache '{path}': {ex}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    @staticmethod
+    def key(i: int, step: dict) -> str:
+        return step.get("id") or f"#{i}"
+
+    def fingerprint(
+        self, ctx: Context, steps: list[dict], i: int, dependencies: list[set[int]]
+    ) -> Optional[str]:
+        """Fingerprint a step whose dependencies have already been fingerprinted.
+
+        :return: The fingerprint, or None if the step cannot be cached because one of
+            its inputs is missing.
+        """
+        step = steps[i]
+        digest = hashlib.sha256(__version__.encode())
+        digest.update(json.dumps(step, sort_keys=True, default=str).encode())
+        digest.update(
+            json.dumps(ctx.resolved_inputs, sort_keys=True, default=str).encode()
+        )
+        fingerprint: Optional[str] = None
+        for dependency in sorted(dependencies[i]):
+            dependency_fingerprint = self.fingerprints.get(dependency)
+            if dependency_fingerprint is None:
+                break
+            digest.update(dependency_fingerprint.encode())
+        else:
+            produced = [
+                os.path.normpath(output)
+                for dependency in dependencies[i]
+                if (output := _declared_output(ctx, steps[dependency]))
+            ]
+            for path in sorted(_step_paths(ctx, step)):
+                if any(
+                    path == output or path.startswith(output + os.sep)
+                    for output in produced
+                ):
+                    # Covered by the fingerprint of the step that produces it
+                    continue
+                if not os.path.isfile(path):
+                    break
+                digest.update(_hash_file(path))
+            else:
+                fingerprint = digest.hexdigest()
+        self.fingerprints[i] = fingerprint
+        return fingerprint
+
+    def plan(
+        self, ctx: Context, steps: list[dict], dependencies: list[set[int]]
+    ) -> None:
+        """Fingerprint every step before the recipe runs and find the up to date ones.
+
+        :param ctx: Recipe context.
+        :param steps: Steps of the recipe.
+        :param dependencies: Dependency graph, see `_build_dependencies`.
+        """
+        remaining = list(range(len(steps)))
+        progress = True
+        while remaining and progress:
+            progress = False
+            for i in list(remaining):
+                if dependencies[i] <= self.fingerprints.keys():
+                    self.fingerprint(ctx, steps, i, dependencies)
+                    remaining.remove(i)
+                    progress = True
+
+        self.fresh = {
+            i for i in self.fingerprints if self.lookup(i, steps[i]) is not None
+        }
+        dependents = _dependents(dependencies)
+        changed = True
+        while changed:
+            changed = False
+            for i in list(self.fresh):
+                entry = self.entries[self.key(i, steps[i])]
+                if "memory" in entry and not dependents[i] <= self.fresh:
+                    self.fresh.discard(i)
+                    changed = True
+
+    def lookup(self, i: int, step: dict) -> Optional[str]:
+        """Get the recorded result of a step if its output is still valid."""
+        entry = self.entries.get(self.key(i, step))
+        fingerprint = self.fingerprints.get(i)
+        if self.rebuild or not entry or fingerprint is None:
+            return None
+        if entry["fingerprint"] != fingerprint:
+            return None
+        for path, stat in entry["files"].items():
+            if _snapshot(path).get(path) != stat:
+                return None
+        return entry["result"]
+
+    def owns(self, i: int, step: dict, path: str) -> bool:
+        """Check whether an existing output was produced by this step before."""
+        entry = self.entries.get(self.key(i, step))
+        return bool(entry) and entry["result"] == path
+
+    def record(
+        self,
+        i: int,
+        step: dict,
+        result: str,
+        before: dict[str, list[int]],
+        data: Optional[bytes] = None,
+    ) -> None:
+        """Record the result of a step that has just run.
+
+        :param before: Snapshot of the step output taken before the step ran. Only the
+            files that changed since are recorded for directory outputs.
+        :param data: The output of the step, if it is kept in memory.
+        """
+        key = self.key(i, step)
+        fingerprint = self.fingerprints.get(i)
+        if fingerprint is not None and data is not None:
+            self.entries[key] = {
+                "fingerprint": fingerprint,
+                "result": result,
+                "files": {},
+                "memory": hashlib.sha256(data).hexdigest(),
+            }
+            return
+        after = _snapshot(result)
+        if os.path.isdir(result):
+            after = {k: v for k, v in after.items() if before.get(k) != v}
+        if fingerprint is None or not after:
+            self.entries.pop(key, None)
+            return
+        self.entries[key] = {
+            "fingerprint": fingerprint,
+            "result": result,
+            "files": after,
+        }
+
+    def save(self) -> None:
+        if not self.enabled:
+            return
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump({"version": __version__, "steps": self.entries}, file, indent=2)
+
+
+def _declared_output(ctx: Context, step: dict) -> Optional[str]:
+    output = step.get("output", step.get("output_dir"))
+    return ctx.resolve(output) if isinstance(output, str) else None
+
+
+def _use_cache(ctx: Context, cache: BuildCache, steps: list[dict], i: int) -> bool:
+    """Take the result of a step from the build cache if it is up to date.
+
+    :return: Whether the step is up to date and does not need to run.
+    """
+    if i not in cache.fresh:
+        return False
+    step = steps[i]
+    result = cache.entries[cache.key(i, step)]["result"]
+    step_id = step.get("id", "")
+    ctx.outputs[step_id] = result
+    log21.info(f"[{step_id}] Up to date -> {result}")
+    return True
+
+
+def _prepare_step(
+    ctx: Context, cache: BuildCache, i: int, step: dict, overwrite: bool
+) -> dict[str, list[int]]:
+    """Check that a step can run and snapshot its output for the build cache."""
+    step_id = step.get("id", "")
+    op = step.get("operation", "")
+    if op not in OPERATIONS:
+        raise RecipeError(f"Step '{step_id}': unknown operation '{op}'")
+
+    output_path = step.get("output")
+    if output_path:
+        resolved = ctx.resolve(output_path)
+        if (
+            os.path.exists(resolved)
+            and not overwrite
+            and not cache.owns(i, step, resolved)
+        ):
+            raise RecipeError(
+                f"Output '{resolved}' already exists "
+                f"(set overwrite: true or remove the file)"
+            )
+
+    output = _declared_output(ctx, step) if cache.enabled else None
+    return _snapshot(output) if output else {}
+
+
+def _run_step(ctx: Context, step: dict) -> str:
+    with profiling.span(step.get("id", ""), "step", operation=step["operation"]):
+        return OPERATIONS[step["operation"]](ctx, step)
+
+
+def _run_step_in_worker(ctx: Context, step: dict) -> tuple[str, dict[str, bytes]]:
+    """Run a step in a worker process and hand the PDFs it kept in memory back."""
+    before = set(ctx.artifacts)
+    result = _run_step(ctx, step)
+    return result, {k: v for k, v in ctx.artifacts.items() if k not in before}
+
+
+def _dependents(dependencies: list[set[int]]) -> list[set[int]]:
+    """Invert the dependency graph: the indices of the steps that depend on each."""
+    dependents: list[set[int]] = [set() for _ in dependencies]
+    for i, step_dependencies in enumerate(dependencies):
+        for dependency in step_dependencies:
+            dependents[dependency].add(i)
+    return dependents
+
+
+def _release_artifacts(
+    ctx: Context,
+    owned: dict[int, list[str]],
+    dependents: list[set[int]],
+    done: set[int],
+) -> None:
+    """Drop the PDFs kept in memory once every step that may read them is done.
+
+    :param owned: Keys of the PDFs kept in memory for each step that produced them.
+    :param dependents: Steps that depend on each step, see `_dependents`.
+    :param done: Steps that are done.
+    """
+    for i in [i for i in owned if dependents[i] <= done]:
+        for key in owned.pop(i):
+            ctx.artifacts.pop(key, None)
+
+
+def _run_parallel(
+    ctx: Context,
+    cache: BuildCache,
+    steps: list[dict],
+    overwrite: bool,
+    max_parallel: int,
+) -> None:
+    """Run the recipe steps on a process pool as soon as their dependencies are done.
+
+    When a step fails no new steps are started, the running ones are waited for and
+    the first error is raised.
+
+    :param ctx: Recipe context.
+    :param cache: Build cache to skip up to date steps with.
+    :param steps: Steps of the recipe.
+    :param overwrite: Whether existing outputs may be overwritten.
+    :param max_parallel: Maximum number of steps to run at the same time.
+    """
+    dependencies = _build_dependencies(ctx, steps)
+    dependents = _dependents(dependencies)
+    if cache.enabled:
+        cache.plan(ctx, steps, dependencies)
+    pending = list(range(len(steps)))
+    done: set[int] = set()
+    # PDFs kept in memory by each step, handed only to the steps that depend on it
+    owned: dict[int, list[str]] = {}
+    running: dict[Future, int] = {}
+    snapshots: dict[int, dict[str, list[int]]] = {}
+    failure: Optional[BaseException] = None
+
+    with ProcessPoolExecutor(max_workers=max_parallel) as executor:
+        while running or (pending and failure is None):
+            up_to_date = False
+            for i in list(pending):
+                if failure is not None or len(running) >= max_parallel:
+                    break
+                if not dependencies[i] <= done:
+                    continue
+                step = steps[i]
+                if _use_cache(ctx, cache, steps, i):
+                    pending.remove(i)
+                    done.add(i)
+                    up_to_date = True
+                    continue
+                try:
+                    snapshots[i] = _prepare_step(ctx, cache, i, step, overwrite)
+                except RecipeError as ex:
+                    failure = ex
+                    break
+                log21.info(f"[{step.get('id', '')}] {step['operation']}...")
+                worker_ctx = ctx.for_worker(
+                    key for j in dependencies[i] for key in owned.get(j, ())
+                )
+                future = profiling.submit(
+                    executor, _run_step_in_worker, worker_ctx, step
+                )
+                running[future] = i
+                pending.remove(i)
+
+            if up_to_date and not running and failure is None:
+                continue
+            if not running:
+                if failure is None:
+                    raise RecipeError(
+                        "Circular step dependencies between: "
+                        + ", ".join(f"'{steps[i].get('id', '')}'" for i in pending)
+                    )
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                i = running.pop(future)
+                step_id = steps[i].get("id", "")
+                try:
+                    result, artifacts = future.result()
+                except BaseException as ex:
+                    failure = failure or ex
+                    continue
+                for path, data in artifacts.items():
+                    ctx.store(path, io.BytesIO(data))
+                owned[i] = [key for key in artifacts if key in ctx.artifacts]
+                ctx.outputs[step_id] = result
+                cache.record(
+                    i,
+                    steps[i],
+                    result,
+                    snapshots.pop(i),
+                    ctx.artifacts.get(os.path.normpath(result)),
+                )
+                done.add(i)
+                _release_artifacts(ctx, owned, dependents, done)
+                log21.info(f"[{step_id}] Done -> {result}")
+
+    if failure is not None:
+        raise failure
+
+
+def run_recipe(recipe_path: str | Path, rebuild: bool = False) -> None:
     recipe = _load(recipe_path)
     ctx = Context(recipe)
+    cache = BuildCache(ctx.settings.get("build_cache"), rebuild)
 
     name = recipe.get("name", Path(recipe_path).stem)
     log21.info(f"Running recipe: {name}")
@@ -302,28 +902,39 @@ def run_recipe(recipe_path: str | Path) -> None:
     overwrite = ctx.settings.get("overwrite", False)
     if os.environ.pop("PDF_HELPER_RECIPE_FORCE", None) == "1":
         overwrite = True
+    max_parallel = ctx.settings.get("max_parallel", 1)
 
+    steps = recipe["steps"]
     try:
-        for step in recipe["steps"]:
-            step_id = step.get("id", "")
-            op = step.get("operation", "")
-            handler = OPERATIONS.get(op)
-            if handler is None:
-                raise RecipeError(f"Step '{step_id}': unknown operation '{op}'")
-
-            output_path = step.get("output")
-            if output_path:
-                resolved = ctx.resolve(output_path)
-                if os.path.exists(resolved) and not overwrite:
-                    raise RecipeError(
-                        f"Output '{resolved}' already exists "
-                        f"(set overwrite: true or remove the file)"
-                    )
-
-            log21.info(f"[{step_id}] {op}...")
-            result = handler(ctx, step)
-            ctx.outputs[step_id] = result
-            log21.info(f"[{step_id}] Done -> {result}")
+        if max_parallel > 1:
+            _run_parallel(ctx, cache, steps, overwrite, max_parallel)
+        else:
+            dependencies = dependents = None
+            if cache.enabled or ctx.memory_budget > 0:
+                dependencies = _build_dependencies(ctx, steps)
+                dependents = _dependents(dependencies)
+            if cache.enabled:
+                cache.plan(ctx, steps, dependencies)
+            done: set[int] = set()
+            owned: dict[int, list[str]] = {}
+            for i, step in enumerate(steps):
+                if _use_cache(ctx, cache, steps, i):
+                    done.add(i)
+                    continue
+                step_id = step.get("id", "")
+                snapshot = _prepare_step(ctx, cache, i, step, overwrite)
+
+                log21.info(f"[{step_id}] {step['operation']}...")
+                before = set(ctx.artifacts)
+                result = _run_step(ctx, step)
+                ctx.outputs[step_id] = result
+                data = ctx.artifacts.get(os.path.normpath(result))
+                cache.record(i, step, result, snapshot, data)
+                done.add(i)
+                if dependents is not None:
+                    owned[i] = [key for key in ctx.artifacts if key not in before]
+                    _release_artifacts(ctx, owned, dependents, done)
+                log21.info(f"[{step_id}] Done -> {result}")
 
         log21.info(f"Recipe '{name}' completed successfully!")
     except RecipeError as ex:
@@ -333,4 +944,5 @@ def run_recipe(recipe_path: str | Path) -> None:
         log21.critical(f"Unexpected error in recipe: {ex.__class__.__name__}: {ex}")
         sys.exit(1)
     finally:
+        cache.save()
         ctx.cleanup()
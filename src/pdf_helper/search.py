@@ -0,0 +1,244 @@
+"""Full-text index of the pages of a collection of PDF files.
+
+The text of each page is stored in an SQLite FTS5 table, so searching tens of
+thousands of documents takes milliseconds instead of extracting and scanning all of
+their text again. Indexing is incremental: files whose size and modification time are
+unchanged are skipped, and files whose content hash is unchanged only have their
+metadata updated.
+"""
+
+import os
+import sqlite3
+import hashlib
+from typing import Optional, Sequence
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import log21
+
+from . import iter_text, profiling
+from .text_cache import default_directory
+
+__all__ = ["default_database", "index", "search"]
+
+# Page numbers are packed into the row IDs of the full-text table along with the ID of
+# their document, so all the pages of a document can be deleted with one range query
+_PAGE_BITS = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    pages INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS page_text USING fts5(
+    text, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def default_database() -> Path:
+    """Get the path of the default index, in the cache directory of PDF-Helper."""
+    return default_directory() / "index.sqlite3"
+
+
+def _connect(database: str | Path) -> sqlite3.Connection:
+    Path(database).parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(database, timeout=30)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA)
+    except sqlite3.OperationalError as ex:
+        connection.close()
+        raise RuntimeError(f"SQLite with FTS5 support is required: {ex}") from ex
+    return connection
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as file:
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _extract_pages(path: str) -> list[str]:
+    """Extract the text of every page of a PDF. Runs in a worker process."""
+    log21.basic_config(level=log21.WARNING)
+    return [text for _, text in iter_text(path)]
+
+
+def _row_ids(document_id: int) -> tuple[int, int]:
+    """Get the range of row IDs of the pages of a document."""
+    return document_id << _PAGE_BITS, ((document_id + 1) << _PAGE_BITS) - 1
+
+
+def index(
+    input_files: Sequence[str | Path],
+    database: Optional[str | Path] = None,
+    workers: int = 0,
+    prune: bool = True,
+) -> dict[str, int]:
+    """Add PDF files to a full-text index, or update them if they changed.
+
+    :param input_files: PDF files to index.
+    :param database: Path of the index. Defaults to `default_database()`.
+    :param workers: Number of processes to extract the text with. Values below 1 use
+        all the available CPU cores.
+    :param prune: Remove the files that no longer exist from the index.
+    :return: The number of files that were `indexed`, `unchanged`, `failed` and
+        `removed`.
+    """
+    connection = _connect(database or default_database())
+    if workers < 1:
+        workers = os.cpu_count() or 1
+    counts = {"indexed": 0, "unchanged": 0, "failed": 0, "removed": 0}
+
+    try:
+        known = {
+            path: (document_id, size, mtime_ns, digest)
+            for document_id, path, size, mtime_ns, digest in connection.execute(
+                "SELECT id, path, size, mtime_ns, digest FROM documents"
+            )
+        }
+
+        # Find out which files need their text extracted
+        changed: dict[str, tuple[os.stat_result, str]] = {}
+        for input_file in dict.fromkeys(os.path.abspath(x) for x in input_files):
+            try:
+                stat = os.stat(input_file)
+            except OSError as ex:
+                log21.error(f"Cannot index `{input_file}`: {ex}")
+                counts["failed"] += 1
+                continue
+            row = known.get(input_file)
+            if row and (row[1], row[2]) == (stat.st_size, stat.st_mtime_ns):
+                counts["unchanged"] += 1
+                continue
+            digest = _hash_file(input_file)
+            if row and row[3] == digest:
+                # Touched or copied over, but the content is the same
+                with connection:
+                    connection.execute(
+                        "UPDATE documents SET size = ?, mtime_ns = ? WHERE id = ?",
+                        (stat.st_size, stat.st_mtime_ns, row[0]),
+                    )
+                counts["unchanged"] += 1
+                continue
+            changed[input_file] = (stat, digest)
+
+        if changed:
+            log21.info(f"Extracting text from {len(changed)} files...")
+            with ProcessPoolExecutor(max_workers=min(workers, len(changed))) as pool:
+                futures = {
+                    profiling.submit(pool, _extract_pages, path): path
+                    for path in changed
+                }
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        texts = future.result()
+                    except Exception as ex:
+                        log21.error(f"Cannot index `{path}`: {ex}")
+                        counts["failed"] += 1
+                        continue
+                    if len(texts) >= 1 << _PAGE_BITS:
+                        log21.error(f"`{path}` has too many pages to be indexed")
+                        counts["failed"] += 1
+                        continue
+                    stat, digest = changed[path]
+                    _store(connection, path, stat, digest, texts)
+                    counts["indexed"] += 1
+                    log21.info(f"Indexed `{path}` ({len(texts)} pages)")
+
+        if prune:
+            for path, (document_id, *_) in known.items():
+                if not os.path.exists(path):
+                    _remove(connection, document_id)
+                    counts["removed"] += 1
+    finally:
+        connection.close()
+    return counts
+
+
+def _store(
+    connection: sqlite3.Connection,
+    path: str,
+    stat: os.stat_result,
+    digest: str,
+    texts: list[str],
+) -> None:
+    with connection:
+        row = connection.execute(
+            "SELECT id FROM documents WHERE path = ?", (path,)
+        ).fetchone()
+        if row:
+            document_id = row[0]
+            connection.execute(
+                "DELETE FROM page_text WHERE rowid BETWEEN ? AND ?",
+                _row_ids(document_id),
+            )
+            connection.execute(
+                "UPDATE documents SET size = ?, mtime_ns = ?, digest = ?, pages = ? "
+                "WHERE id = ?",
+                (stat.st_size, stat.st_mtime_ns, digest, len(texts), document_id),
+            )
+        else:
+            document_id = connection.execute(
+                "INSERT INTO documents (path, size, mtime_ns, digest, pages) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, digest, len(texts)),
+            ).lastrowid
+        first = _row_ids(document_id)[0]
+        connection.executemany(
+            "INSERT INTO page_text (rowid, text) VALUES (?, ?)",
+            ((first + i, text) for i, text in enumerate(texts, start=1) if text),
+        )
+
+
+def _remove(connection: sqlite3.Connection, document_id: int) -> None:
+    with connection:
+        connection.execute(
+            "DELETE FROM page_text WHERE rowid BETWEEN ? AND ?", _row_ids(document_id)
+        )
+        connection.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+
+
+def search(
+    query: str,
+    database: Optional[str | Path] = None,
+    limit: int = 20,
+    highlight: tuple[str, str] = ("[", "]"),
+) -> list[tuple[Path, int, str]]:
+    """Search the full-text index.
+
+    :param query: FTS5 query, e.g. `invoice`, `"exact phrase"`, `tax AND 2024` or
+        `recon*`.
+    :param database: Path of the index. Defaults to `default_database()`.
+    :param limit: Maximum number of hits.
+    :param highlight: Text to put before and after the matches in the snippets.
+    :raises ValueError: If the query is invalid.
+    :return: The path, one based page number and a snippet of each hit, best first.
+    """
+    connection = _connect(database or default_database())
+    try:
+        rows = connection.execute(
+            "SELECT documents.path, page_text.rowid, "
+            "snippet(page_text, 0, ?, ?, '...', 16) "
+            "FROM page_text JOIN documents "
+            f"ON documents.id = page_text.rowid >> {_PAGE_BITS} "
+            "WHERE page_text MATCH ? ORDER BY rank LIMIT ?",
+            (*highlight, query, limit),
+        ).fetchall()
+    except sqlite3.OperationalError as ex:
+        raise ValueError(f"Invalid search query `{query}`: {ex}") from ex
+    finally:
+        connection.close()
+    page_mask = (1 << _PAGE_BITS) - 1
+    return [
+        (Path(path), rowid & page_mask, " ".join(snippet.split()))
+        for path, rowid, snippet in rows
+    ]
@@ -0,0 +1,264 @@
+"""Long running server that saves the start-up cost of each PDF-Helper call.
+
+The server imports everything and initializes pdfium once. Every request is then
+handled in a process forked from the warm server, so it starts without paying the
+start-up cost again. Requests are JSON lines sent over a Unix socket:
+
+- `{"argv": [...], "cwd": "...", "env": {...}}` runs a CLI command in the working
+  directory and with the environment variables of the client. The client passes its
+  stdin, stdout and stderr along with the request, so the command reads and writes
+  the client's streams directly. The response is `{"exit": <status>}`.
+- `{"operation": "...", "args": [...], "kwargs": {...}}` calls one of `OPERATIONS`.
+  The response is `{"ok": true, "result": ...}` or
+  `{"ok": false, "error": "..."}`.
+
+This module only imports the standard library at the top, so the client side stays
+cheap to import.
+"""
+
+import os
+import sys
+import json
+import signal
+import socket
+import tempfile
+import socketserver
+from typing import Optional, Sequence
+
+__all__ = [
+    "OPERATIONS",
+    "SERVER_ENV",
+    "ServerError",
+    "default_address",
+    "serve",
+    "call",
+    "forward",
+]
+
+OPERATIONS = (
+    "bundle",
+    "remove_pages",
+    "pdf_to_image",
+    "extract_text",
+    "split_pdf",
+    "run_recipe",
+)
+
+# Environment variable that makes the CLI forward its commands to a running server
+SERVER_ENV = "PDF_HELPER_SERVER"
+
+_MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+
+class ServerError(Exception):
+    pass
+
+
+def default_address() -> str:
+    """Get the default path of the server socket."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    user = os.getuid() if hasattr(os, "getuid") else os.getlogin()
+    return os.path.join(runtime_dir, f"pdf-helper-{user}.sock")
+
+
+def _receive(connection: socket.socket) -> tuple[dict, list[int]]:
+    """Receive one JSON line and the file descriptors sent along with it."""
+    data = b""
+    fds: list[int] = []
+    while not data.endswith(b"\n"):
+        chunk, new_fds, _, _ = socket.recv_fds(connection, 65536, 3)
+        if not chunk:
+            raise ServerError("Connection closed before the message was complete")
+        data += chunk
+        fds += new_fds
+        if len(data) > _MAX_MESSAGE_SIZE:
+            raise ServerError("Message is too large")
+    return json.loads(data), fds
+
+
+def _send(connection: socket.socket, message: dict) -> None:
+    connection.sendall(json.dumps(message).encode() + b"\n")
+
+
+def _run_command(
+    argv: Sequence[str], cwd: str, env: Optional[dict[str, str]], fds: list[int]
+) -> int:
+    """Run a CLI command in the current (forked) process on the client's streams."""
+    from .__main__ import main
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    os.chdir(cwd)
+    if env is not None:
+        os.environ.clear()
+        os.environ.update(env)
+    os.environ.pop(SERVER_ENV, None)
+    sys.argv = ["pdf-helper", *argv]
+    try:
+        main()
+    except SystemExit as ex:
+        if ex.code is None or isinstance(ex.code, int):
+            return ex.code or 0
+        print(ex.code, file=sys.stderr)
+        return 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    return 0
+
+
+def _call_operation(operation: str, args: list, kwargs: dict) -> object:
+    if operation not in OPERATIONS:
+        raise ServerError(f"Unknown operation: {operation}")
+    if operation == "run_recipe":
+        from .recipe import run_recipe as function
+    else:
+        function = getattr(sys.modules[__package__], operation)
+    return function(*args, **kwargs)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    request: socket.socket
+
+    def handle(self) -> None:
+        try:
+            message, fds = _receive(self.request)
+        except (ServerError, ValueError, OSError) as ex:
+            _send(self.request, {"ok": False, "error": str(ex)})
+            return
+
+        if "argv" in message:
+            status = _run_command(
+                message["argv"], message.get("cwd", "."), message.get("env"), fds
+            )
+            _send(self.request, {"exit": status})
+            return
+
+        for fd in fds:
+            os.close(fd)
+        try:
+            result = _call_operation(
+                message.get("operation", ""),
+                message.get("args", []),
+                message.get("kwargs", {}),
+            )
+            _send(self.request, {"ok": True, "result": result})
+        except SystemExit as ex:
+            _send(self.request, {"ok": False, "error": f"Exited with status {ex.code}"})
+        except Exception as ex:
+            _send(
+                self.request,
+                {"ok": False, "error": f"{ex.__class__.__name__}: {ex}"},
+            )
+
+
+class _Server(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    pass
+
+
+def serve(address: Optional[str] = None, workers: int = 0) -> None:
+    """Serve requests on a Unix socket until interrupted.
+
+    :param address: Path of the Unix socket. Defaults to `default_address()`.
+    :param workers: Maximum number of requests handled at the same time. Values below
+        1 use the number of CPU cores.
+    """
+    import log21
+
+    # Import the heavy dependencies once, so the forked workers start warm
+    from . import recipe  # noqa: F401
+    from . import __main__  # noqa: F401
+
+    address = address or default_address()
+    if os.path.exists(address):
+        try:
+            _connect(address).close()
+        except ConnectionRefusedError:
+            # Left behind by a server that did not shut down cleanly
+            os.remove(address)
+        else:
+            raise ServerError(f"A server is already listening on `{address}`")
+
+    # The socket file appears on `bind()`, before the server listens on it, so it is
+    # bound under another name and moved in place once connections are accepted
+    temporary_address = f"{address}.{os.getpid()}"
+    old_umask = os.umask(0o177)
+    try:
+        server = _Server(temporary_address, _Handler)
+    finally:
+        os.umask(old_umask)
+    os.rename(temporary_address, address)
+    server.max_children = workers if workers > 0 else os.cpu_count() or 1
+    log21.info(f"Listening on {address} with up to {server.max_children} workers...")
+    # Shut down cleanly (and remove the socket) when terminated
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(address)
+
+
+def _connect(address: Optional[str]) -> socket.socket:
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(address or default_address())
+    except OSError:
+        connection.close()
+        raise
+    return connection
+
+
+def _response(connection: socket.socket) -> dict:
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = connection.recv(65536)
+        if not chunk:
+            raise ServerError("The server closed the connection without a response")
+        data += chunk
+    return json.loads(data)
+
+
+def call(
+    operation: str, *args: object, address: Optional[str] = None, **kwargs: object
+) -> object:
+    """Call one of `OPERATIONS` on a running server.
+
+    Paths are resolved by the server, so pass absolute paths.
+
+    :param operation: Name of the operation.
+    :param args: Positional arguments of the operation. Must be JSON serializable.
+    :param address: Path of the server socket. Defaults to `default_address()`.
+    :param kwargs: Keyword arguments of the operation. Must be JSON serializable.
+    :raises ServerError: If the operation fails.
+    :return: What the operation returned.
+    """
+    with _connect(address) as connection:
+        _send(
+            connection,
+            {"operation": operation, "args": list(args), "kwargs": kwargs},
+        )
+        response = _response(connection)
+    if not response.get("ok"):
+        raise ServerError(response.get("error", "Unknown error"))
+    return response["result"]
+
+
+def forward(argv: Sequence[str], address: Optional[str] = None) -> int:
+    """Run a CLI command on a running server, using the streams of this process.
+
+    :param argv: Command line arguments, without the program name.
+    :param address: Path of the server socket. Defaults to `default_address()`.
+    :raises OSError: If the server cannot be reached.
+    :raises ServerError: If the server closes the connection without a response.
+    :return: Exit status of the command.
+    """
+    with _connect(address) as connection:
+        message = json.dumps(
+            {"argv": list(argv), "cwd": os.getcwd(), "env": dict(os.environ)}
+        ).encode()
+        socket.send_fds(connection, [message + b"\n"], [0, 1, 2])
+        return _response(connection).get("exit", 1)
@@ -0,0 +1,238 @@
+"""Persistent cache of the text of PDF pages.
+
+The text of each page is stored in a SQLite database, keyed by a hash of the content
+of the document, the page number and the extraction options. Moving, renaming or
+copying a PDF does not invalidate its entries, while changing its content does.
+
+The hash of each file is remembered along with its size and modification time, so
+unchanged files are not read again just to be hashed. When the cache grows past its
+size limit, the least recently used pages are evicted.
+"""
+
+import io
+import os
+import mmap
+import time
+import sqlite3
+import hashlib
+from typing import Optional, Iterable
+from pathlib import Path
+
+__all__ = ["CACHE_DIR_ENV", "CACHE_SIZE_ENV", "TextCache", "default_directory"]
+
+# Environment variables that set the default directory and size limit (in megabytes)
+CACHE_DIR_ENV = "PDF_HELPER_CACHE_DIR"
+CACHE_SIZE_ENV = "PDF_HELPER_TEXT_CACHE_SIZE"
+
+_DEFAULT_MAX_SIZE = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    digest TEXT PRIMARY KEY,
+    pages INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    digest TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    options TEXT NOT NULL,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (digest, page, options)
+);
+CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed);
+"""
+
+
+def default_directory() -> Path:
+    """Get the default cache directory.
+
+    That is `$PDF_HELPER_CACHE_DIR` if set, and otherwise `pdf-helper` in the user
+    cache directory of the platform.
+    """
+    if os.environ.get(CACHE_DIR_ENV):
+        return Path(os.environ[CACHE_DIR_ENV])
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "pdf-helper"
+
+
+def _hash_stream(stream: io.BufferedIOBase) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    while chunk := stream.read(1024 * 1024):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TextCache:
+    """On-disk cache of the text of PDF pages.
+
+    Instances can be passed to other processes; each process opens its own connection
+    to the database.
+
+    :param directory: Directory of the cache database. Defaults to
+        `default_directory()`.
+    :param max_size: Size limit of the cached text in megabytes. Defaults to
+        `$PDF_HELPER_TEXT_CACHE_SIZE` or 256.
+    """
+
+    def __init__(
+        self, directory: Optional[str | Path] = None, max_size: Optional[float] = None
+    ) -> None:
+        self.directory = Path(directory) if directory else default_directory()
+        if max_size is None:
+            max_size = float(os.environ.get(CACHE_SIZE_ENV) or _DEFAULT_MAX_SIZE)
+        self.max_size = int(max_size * 1024 * 1024)
+        self.options = self._extraction_options()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @staticmethod
+    def _extraction_options() -> str:
+        # A different pdfium may extract the text differently
+        from importlib.metadata import version
+
+        return f"pypdfium2={version('pypdfium2')}"
+
+    def __getstate__(self) -> dict:
+        return {**self.__dict__, "_connection": None}
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(
+                self.directory / "text-cache.sqlite3", timeout=30
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(_SCHEMA)
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def document_key(self, input_file: object) -> Optional[str]:
+        """Get the content hash of a PDF.
+
+        :param input_file: Path or in-memory buffer of the PDF.
+        :return: The hash, or None for inputs that cannot be hashed without consuming
+            them (e.g. pipes).
+        """
+        if isinstance(input_file, (bytes, bytearray, memoryview, mmap.mmap)):
+            return hashlib.blake2b(input_file, digest_size=20).hexdigest()
+        if isinstance(input_file, io.BytesIO):
+            return hashlib.blake2b(input_file.getbuffer(), digest_size=20).hexdigest()
+        if not isinstance(input_file, (str, os.PathLike)):
+            return None
+
+        path = os.path.abspath(input_file)
+        stat = os.stat(path)
+        row = self.connection.execute(
+            "SELECT digest FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, stat.st_size, stat.st_mtime_ns),
+        ).fetchone()
+        if row:
+            return row[0]
+        with open(path, "rb") as file:
+            digest = _hash_stream(file)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, digest),
+            )
+        return digest
+
+    def page_count(self, digest: str) -> Optional[int]:
+        row = self.connection.execute(
+            "SELECT pages FROM documents WHERE digest = ?", (digest,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_page_count(self, digest: str, pages: int) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?)", (digest, pages)
+            )
+
+    def get(self, digest: str, pages: Iterable[int]) -> dict[int, str]:
+        """Get the cached text of pages of a document.
+
+        :param digest: Content hash of the document.
+        :param pages: One based page numbers.
+        :return: The text of the pages that are cached.
+        """
+        pages = list(pages)
+        found: dict[int, str] = {}
+        # Stay under the limit of SQLite on the number of parameters
+        for i in range(0, len(pages), 500):
+            chunk = pages[i : i + 500]
+            rows = self.connection.execute(
+                "SELECT page, text FROM pages WHERE digest = ? AND options = ? "
+                f"AND page IN ({', '.join('?' * len(chunk))})",
+                (digest, self.options, *chunk),
+            )
+            found.update(rows)
+        if found:
+            with self.connection:
+                self.connection.executemany(
+                    "UPDATE pages SET accessed = ? "
+                    "WHERE digest = ? AND page = ? AND options = ?",
+                    ((time.time(), digest, page, self.options) for page in found),
+                )
+        return found
+
+    def put(self, digest: str, texts: dict[int, str]) -> None:
+        """Store the text of pages of a document and evict old pages if needed.
+
+        :param digest: Content hash of the document.
+        :param texts: Text of each one based page number.
+        """
+        if not texts:
+            return
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (digest, page, self.options, text, len(text.encode()), now)
+                    for page, text in texts.items()
+                ),
+            )
+        self.evict()
+
+    def size(self) -> int:
+        """Get the size of the cached text in bytes."""
+        return self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM pages"
+        ).fetchone()[0]
+
+    def evict(self) -> None:
+        """Evict the least recently used pages until the cache fits its size limit,
+        and forget the documents and files none of the remaining pages belong to."""
+        excess = self.size() - self.max_size
+        if excess <= 0:
+            return
+        evicted = []
+        for rowid, size in self.connection.execute(
+            "SELECT rowid, size FROM pages ORDER BY accessed, rowid"
+        ):
+            evicted.append((rowid,))
+            excess -= size
+            if excess <= 0:
+                break
+        with self.connection:
+            self.connection.executemany("DELETE FROM pages WHERE rowid = ?", evicted)
+            for table in ("documents", "files"):
+                self.connection.execute(
+                    f"DELETE FROM {table} "
+                    "WHERE digest NOT IN (SELECT DISTINCT digest FROM pages)"
+                )
@@ -1,24 +1,262 @@
 import re
+from bisect import bisect_right
+from typing import Iterable, Iterator, Optional
+from collections.abc import Sequence
 
 POSITION_PATTERN = re.compile(
     r"^(top|bottom|center|left|right|\d{1,3}%?)\s+(top|bottom|center|left|right|\d{1,3}%?)?$"
 )
 
+PAGE_RANGE_PATTERN = re.compile(r"^(?:(\d+)(?:-(\d*))?|-(\d+):)$")
 
-def parse_pages(pages: str) -> list[int]:
-    """Parses the pages string into a list of pages.
+
+class PageSet(Sequence):
+    """Set of one based page numbers, stored as sorted and merged intervals.
+
+    `1-100000` is stored as one interval instead of 100,000 integers. Checking whether
+    a page is in the set takes O(log n) in the number of intervals, and the pages are
+    iterated in order.
+
+    Open-ended ranges (`10-`: page 10 to the last page) and ranges from the end (`-5:`:
+    the last 5 pages) depend on the number of pages of the document, so a set that has
+    them must be resolved with `resolve()` before it can be measured, searched or
+    iterated.
+
+    :param pages: Page numbers, in any order and with duplicates. Pages below 1 are
+        kept, so they can be reported by `validate()`.
+    """
+
+    __slots__ = ("_starts", "_ends", "_offsets", "_length", "_open_from", "_last")
+
+    def __init__(self, pages: Iterable[int] = ()) -> None:
+        if isinstance(pages, range) and pages.step == 1:
+            intervals = [(pages.start, pages.stop - 1)] if pages else []
+        else:
+            intervals = [(page, page) for page in pages]
+        self._set(intervals)
+
+    def _set(
+        self,
+        intervals: Iterable[tuple[int, int]],
+        open_from: Optional[int] = None,
+        last: int = 0,
+    ) -> None:
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        for start, end in sorted(intervals):
+            if self._ends and start <= self._ends[-1] + 1:
+                self._ends[-1] = max(self._ends[-1], end)
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+        # Number of pages before each interval, to find pages by position
+        self._offsets: list[int] = []
+        self._length = 0
+        for start, end in zip(self._starts, self._ends, strict=True):
+            self._offsets.append(self._length)
+            self._length += end - start + 1
+        self._open_from = open_from
+        self._last = last
+
+    @classmethod
+    def from_intervals(
+        cls,
+        intervals: Iterable[tuple[int, int]],
+        open_from: Optional[int] = None,
+        last: int = 0,
+    ) -> "PageSet":
+        """Build a set from intervals.
+
+        :param intervals: First and last page (both inclusive) of each interval.
+        :param open_from: Include every page from this one to the last page.
+        :param last: Include this many pages from the end of the document.
+        """
+        page_set = cls.__new__(cls)
+        page_set._set(intervals, open_from, last)
+        return page_set
+
+    @classmethod
+    def parse(cls, pages: str) -> "PageSet":
+        """Parse a page range string.
+
+        :param pages: Comma-separated pages and ranges.
+            Example: '1-5,7,10-,-2:' (pages 1 to 5, 7, 10 to the end and the last two
+            pages)
+        :raises ValueError: If the string is invalid.
+        :return: The set of pages.
+        """
+        intervals = []
+        open_from: Optional[int] = None
+        last = 0
+        for part in pages.replace(" ", "").split(","):
+            match = PAGE_RANGE_PATTERN.match(part)
+            if not match:
+                raise ValueError(f"Invalid page range: `{part}`")
+            start, end, from_end = match.groups()
+            if from_end is not None:
+                last = max(last, int(from_end))
+            elif end == "":
+                open_from = min(int(start), open_from or int(start))
+            else:
+                start = int(start)
+                end = int(end) if end is not None else start
+                if start < 1 or end < start:
+                    raise ValueError(f"Invalid page range: `{part}`")
+                intervals.append((start, end))
+        return cls.from_intervals(intervals, open_from, last)
+
+    @classmethod
+    def of(cls, pages: "PageSet | str | Iterable[int]") -> "PageSet":
+        """Get the set of a page range string or a collection of pages.
+
+        :param pages: A `PageSet` (returned as is), a string for `parse()` or page
+            numbers.
+        """
+        if isinstance(pages, PageSet):
+            return pages
+        if isinstance(pages, str):
+            return cls.parse(pages)
+        return cls(pages)
+
+    @property
+    def is_resolved(self) -> bool:
+        """Whether the set has no ranges that depend on the number of pages."""
+        return self._open_from is None and not self._last
+
+    @property
+    def intervals(self) -> list[tuple[int, int]]:
+        """First and last page of each interval of the resolved part of the set."""
+        return list(zip(self._starts, self._ends, strict=True))
+
+    def resolve(self, number_of_pages: int) -> "PageSet":
+        """Get the pages of this set that exist in a document.
+
+        :param number_of_pages: Number of pages of the document.
+        :return: The set without open-ended ranges, ranges from the end and pages
+            outside of 1 to `number_of_pages`.
+        """
+        intervals = self.intervals
+        if self._open_from is not None:
+            intervals.append((self._open_from, number_of_pages))
+        if self._last:
+            intervals.append((number_of_pages - self._last + 1, number_of_pages))
+        return PageSet.from_intervals(
+            (max(start, 1), min(end, number_of_pages))
+            for start, end in intervals
+            if start <= number_of_pages and end >= 1 and start <= end
+        )
+
+    def validate(self, number_of_pages: int) -> None:
+        """Check that every page of this set exists in a document.
+
+        :param number_of_pages: Number of pages of the document.
+        :raises ValueError: If a page does not exist.
+        """
+        if self._starts and self._starts[0] < 1:
+            raise ValueError("Pages must be >= 1")
+        if self._ends and self._ends[-1] > number_of_pages:
+            raise ValueError(f"Page {self._ends[-1]} does not exist")
+        if self._open_from is not None and self._open_from > number_of_pages:
+            raise ValueError(f"Page {self._open_from} does not exist")
+        if self._last > number_of_pages:
+            raise ValueError(
+                f"Cannot take the last {self._last} pages of {number_of_pages}"
+            )
+
+    def _check_resolved(self) -> None:
+        if not self.is_resolved:
+            raise ValueError(
+                f"Pages `{self}` depend on the number of pages; resolve them first"
+            )
+
+    def __len__(self) -> int:
+        self._check_resolved()
+        return self._length
+
+    def __bool__(self) -> bool:
+        return bool(self._starts) or not self.is_resolved
+
+    def __contains__(self, page: object) -> bool:
+        self._check_resolved()
+        if not isinstance(page, int):
+            return False
+        i = bisect_right(self._starts, page) - 1
+        return i >= 0 and page <= self._ends[i]
+
+    def __iter__(self) -> Iterator[int]:
+        self._check_resolved()
+        for start, end in zip(self._starts, self._ends, strict=True):
+            yield from range(start, end + 1)
+
+    def __reversed__(self) -> Iterator[int]:
+        self._check_resolved()
+        for start, end in reversed(self.intervals):
+            yield from range(end, start - 1, -1)
+
+    def __getitem__(self, index: int | slice) -> "int | PageSet":
+        self._check_resolved()
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return PageSet(self[i] for i in range(start, stop, step))
+            if start >= stop:
+                return PageSet()
+            first = bisect_right(self._offsets, start) - 1
+            last = bisect_right(self._offsets, stop - 1) - 1
+            intervals = self.intervals[first : last + 1]
+            intervals[0] = (
+                intervals[0][0] + start - self._offsets[first],
+                intervals[0][1],
+            )
+            intervals[-1] = (
+                intervals[-1][0],
+                self._starts[last] + stop - 1 - self._offsets[last],
+            )
+            return PageSet.from_intervals(intervals)
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("PageSet index out of range")
+        i = bisect_right(self._offsets, index) - 1
+        return self._starts[i] + index - self._offsets[i]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PageSet):
+            return NotImplemented
+        return (self._starts, self._ends, self._open_from, self._last) == (
+            other._starts,
+            other._ends,
+            other._open_from,
+            other._last,
+        )
+
+    def __hash__(self) -> int:
+        return hash((tuple(self.intervals), self._open_from, self._last))
+
+    def __str__(self) -> str:
+        parts = [
+            str(start) if start == end else f"{start}-{end}"
+            for start, end in self.intervals
+        ]
+        if self._open_from is not None:
+            parts.append(f"{self._open_from}-")
+        if self._last:
+            parts.append(f"-{self._last}:")
+        return ",".join(parts)
+
+    def __repr__(self) -> str:
+        return f"PageSet({str(self)!r})"
+
+
+def parse_pages(pages: str) -> PageSet:
+    """Parses the pages string into a set of pages.
 
     :param pages: The pages string
         Example: '1-5,7,9-11'
-    :return: A list of pages
-        Example: [1, 2, 3, 4, 5, 7, 9, 10, 11]
+    :return: The pages, see `PageSet.parse`
+        Example: PageSet('1-5,7,9-11')
     """
-    pages_ = pages.replace(" ", "")
-    pages_ = pages_.split(",")
-    pages_ = [x.split("-") for x in pages_]
-    pages_ = [x if len(x) == 1 else range(int(x[0]), int(x[1]) + 1) for x in pages_]
-    pages_ = [int(x) for y in pages_ for x in y]
-    return pages_
+    return PageSet.parse(pages)
 
 
 def parse_position(
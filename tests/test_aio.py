@@ -0,0 +1,80 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from pypdfium2 import PdfDocument
+
+from pdf_helper import extract_text
+from pdf_helper.aio import Pool
+from benchmarks.corpus import generate_pdf
+
+
+@pytest.fixture
+def long_pdf(tmp_path: Path) -> Path:
+    path = tmp_path / "long.pdf"
+    generate_pdf(path, 20, 300)
+    # Copies of the same pages, which is much faster than generating all of them
+    source = PdfDocument(str(path))
+    writer = PdfDocument.new()
+    for _ in range(10):
+        writer.import_pages(source)
+    writer.save(str(path))
+    writer.close()
+    source.close()
+    return path
+
+
+def test_pool_reports_progress(long_pdf: Path) -> None:
+    async def run() -> tuple[list[int], str]:
+        async with Pool(max_workers=1) as pool:
+            operation = pool.extract_text(long_pdf)
+            progress = [pages async for pages in operation]
+            return progress, await operation
+
+    progress, text = asyncio.run(run())
+    assert text == extract_text(long_pdf)
+    assert progress == sorted(set(progress))
+    assert progress[-1] == 200
+
+
+def test_pool_stops_timed_out_and_cancelled_calls(
+    long_pdf: Path, tmp_path: Path
+) -> None:
+    async def run() -> tuple[int, int, int]:
+        async with Pool(max_workers=1) as pool:
+            timed_out = pool.pdf_to_image(long_pdf, tmp_path / "a", timeout=0.2)
+            with pytest.raises(asyncio.TimeoutError):
+                await timed_out
+
+            cancelled = pool.pdf_to_image(long_pdf, tmp_path / "b")
+            async for pages in cancelled:
+                if pages:
+                    cancelled.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await cancelled
+
+            # The worker is free again as soon as the calls stop
+            pages = await pool.split_pdf(long_pdf, tmp_path / "parts", [100])
+            return timed_out.pages, cancelled.pages, pages
+
+    timed_out, cancelled, pages = asyncio.run(run())
+    assert timed_out < 200 and 0 < cancelled < 200
+    assert pages == 2
+    assert len(list((tmp_path / "b").iterdir())) < 200
+
+
+def test_pool_limits_concurrency(tmp_path: Path) -> None:
+    async def run() -> list[str]:
+        pdf = tmp_path / "input.pdf"
+        generate_pdf(pdf, 2, 100)
+        async with Pool(max_workers=2, max_concurrency=1) as pool:
+            first = pool.extract_text(pdf)
+            second = pool.extract_text(pdf)
+            # The second call waits in the event loop, so cancelling it is free
+            await asyncio.sleep(0)
+            second.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await second
+            return [await first]
+
+    assert asyncio.run(run()) == [extract_text(tmp_path / "input.pdf")]
@@ -0,0 +1,76 @@
+from pathlib import Path
+from unittest.mock import patch
+
+from pdf_helper import profiling
+from pdf_helper.batch import run_batch, format_output, expand_inputs
+
+# expand_inputs / format_output
+
+
+def test_expand_inputs(test_pdf: Path, tmp_root: Path) -> None:
+    other = tmp_root / "sub" / "other.pdf"
+    other.parent.mkdir()
+    other.write_bytes(test_pdf.read_bytes())
+    file_list = tmp_root / "files.txt"
+    file_list.write_text(f"{other}\n\n{test_pdf}\n")
+    assert expand_inputs([str(tmp_root / "*.pdf"), str(other.parent)]) == [
+        test_pdf,
+        other,
+    ]
+    assert expand_inputs([f"@{file_list}", str(test_pdf)]) == [other, test_pdf]
+
+
+def test_format_output() -> None:
+    assert format_output("{parent}/out/{stem}.txt", Path("a/b.pdf")) == Path(
+        "a/out/b.txt"
+    )
+
+
+# run_batch
+
+
+def test_run_batch_to_image(test_pdf: Path, tmp_path: Path) -> None:
+    results = run_batch(
+        "to-image",
+        [test_pdf, tmp_path / "missing.pdf"],
+        str(tmp_path / "imgs" / "{stem}"),
+        scale=1,
+        workers=2,
+        pages_per_task=2,
+    )
+    assert results[test_pdf] is None
+    assert results[tmp_path / "missing.pdf"]
+    assert len(list((tmp_path / "imgs" / "input").iterdir())) == 5
+
+
+def test_run_batch_split(test_pdf: Path, tmp_path: Path) -> None:
+    results = run_batch("split", [test_pdf], str(tmp_path / "parts"), [2], workers=2)
+    assert results == {test_pdf: None}
+    assert sorted(p.name for p in (tmp_path / "parts").iterdir()) == [
+        "input_part_1.pdf",
+        "input_part_2.pdf",
+    ]
+
+
+def test_run_batch_split_single_pages_in_shares(test_pdf: Path, tmp_path: Path) -> None:
+    submitted = []
+    original = profiling.submit
+
+    def submit(executor, function, *args):
+        submitted.append(function)
+        return original(executor, function, *args)
+
+    with patch("pdf_helper.profiling.submit", submit):
+        results = run_batch("split", [test_pdf], str(tmp_path / "parts"), workers=2)
+    assert results == {test_pdf: None}
+    # The source is opened once per share, not once per part
+    assert len(submitted) == 2
+    assert len(list((tmp_path / "parts").iterdir())) == 5
+
+
+def test_run_batch_extract_text(test_pdf: Path, tmp_path: Path) -> None:
+    out = tmp_path / "input.txt"
+    assert run_batch("extract-text", [test_pdf], str(out), workers=2) == {
+        test_pdf: None
+    }
+    assert out.read_text() == "\n" * 5
@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import pytest
+from pypdfium2 import PdfDocument
+
+from pdf_helper import extract_text
+from benchmarks.run import compare, build_cases, run_benchmarks
+from benchmarks.corpus import generate_pdf, generate_images
+
+
+@pytest.fixture
+def manifest(tmp_path: Path) -> dict:
+    generate_pdf(tmp_path / "text.pdf", 3, 200)
+    generate_pdf(tmp_path / "scanned.pdf", 2, 0, (60, 80))
+    images = generate_images(tmp_path, 2, (60, 80))
+    return {
+        "profile": "test",
+        "documents": {
+            "text": {"path": str(tmp_path / "text.pdf"), "pages": 3},
+            "scanned": {"path": str(tmp_path / "scanned.pdf"), "pages": 2},
+        },
+        "images": [str(path) for path in images],
+    }
+
+
+def test_generate_pdf(manifest: dict) -> None:
+    pdf = PdfDocument(manifest["documents"]["text"]["path"])
+    assert len(pdf) == 3
+    pdf.close()
+    assert len(extract_text(manifest["documents"]["text"]["path"])) > 3 * 150
+    assert [Path(path).suffix for path in manifest["images"]] == [".png", ".jpg"]
+
+
+def test_build_cases(manifest: dict) -> None:
+    cases = build_cases(manifest, ["bundle", "extract_text"])
+    assert list(cases) == [
+        "bundle[images]",
+        "extract_text[text]",
+        "extract_text[scanned]",
+    ]
+    assert cases["bundle[images]"]["pages"] == 5
+    with pytest.raises(ValueError):
+        build_cases(manifest, ["unknown"])
+
+
+def test_run_benchmarks(manifest: dict) -> None:
+    results = run_benchmarks(manifest, ["remove_pages"], repeat=1)
+    result = results["results"]["remove_pages[text]"]
+    assert result["pages"] == 3
+    assert result["wall_time"] > 0
+    assert result["pages_per_second"] == pytest.approx(3 / result["wall_time"])
+
+
+def test_compare() -> None:
+    baseline = {"results": {"a": {"wall_time": 1.0}, "b": {"wall_time": 1.0}}}
+    current = {
+        "results": {
+            "a": {"wall_time": 1.05},
+            "b": {"wall_time": 1.5},
+            "c": {"wall_time": 9.0},
+        }
+    }
+    assert compare(baseline, current, 0.1) == ["b"]
@@ -0,0 +1,331 @@
+import io
+import mmap
+from pathlib import Path
+
+import pytest
+from PIL import Image, ImageStat, ImageChops
+from pypdfium2 import PdfDocument
+
+from pdf_helper import (
+    PageSet,
+    _file_type,
+    iter_text,
+    split_pdf,
+    extract_text,
+    bundle,
+    image_to_pdf,
+    pdf_to_image,
+    remove_pages,
+    pdf_to_thumbnails,
+)
+from benchmarks.corpus import generate_pdf
+
+# pdf_to_image
+
+
+def test_pdf_to_image_workers_match_serial(test_pdf: Path, tmp_path: Path) -> None:
+    serial = tmp_path / "serial"
+    parallel = tmp_path / "parallel"
+    assert pdf_to_image(test_pdf, serial, scale=1) == 5
+    assert pdf_to_image(test_pdf, parallel, scale=1, workers=2) == 5
+    assert sorted(p.name for p in parallel.iterdir()) == sorted(
+        p.name for p in serial.iterdir()
+    )
+
+
+def test_pdf_to_image_workers_with_pages(test_pdf: Path, tmp_path: Path) -> None:
+    out = tmp_path / "imgs"
+    assert pdf_to_image(test_pdf, out, [2, 4], scale=1, workers=3) == 2
+    assert sorted(p.name for p in out.iterdir()) == ["input-2.png", "input-4.png"]
+
+
+def test_pdf_to_image_loads_only_selected_pages(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Each page is as wide as its number, so the images show which page they are of
+    path = tmp_path / "doc.pdf"
+    writer = PdfDocument.new()
+    for i in range(1, 13):
+        writer.new_page(100 + i, 100)
+    writer.save(str(path))
+    writer.close()
+
+    loaded = []
+    get_page = PdfDocument.__getitem__
+
+    def spy(pdf: PdfDocument, i: int) -> object:
+        loaded.append(i)
+        return get_page(pdf, i)
+
+    monkeypatch.setattr(PdfDocument, "__getitem__", spy)
+    out = tmp_path / "imgs"
+    assert pdf_to_image(path, out, [11, 3], scale=1) == 2
+    assert sorted(loaded) == [2, 10]
+    assert sorted(p.name for p in out.iterdir()) == ["doc-03.png", "doc-11.png"]
+    for page in (3, 11):
+        with Image.open(out / f"doc-{page:02}.png") as image:
+            assert image.width == 100 + page
+
+
+def test_pdf_to_image_open_range(test_pdf: Path, tmp_path: Path) -> None:
+    out = tmp_path / "imgs"
+    assert pdf_to_image(test_pdf, out, "4-", scale=1, workers=2) == 2
+    assert sorted(p.name for p in out.iterdir()) == ["input-4.png", "input-5.png"]
+
+
+def test_pdf_to_image_formats(test_pdf: Path, tmp_path: Path) -> None:
+    jpeg = tmp_path / "jpeg"
+    assert pdf_to_image(test_pdf, jpeg, [1], scale=1, format="jpeg", quality=50) == 1
+    with Image.open(jpeg / "input-1.jpg") as image:
+        assert (image.format, image.mode) == ("JPEG", "RGB")
+
+    gray = tmp_path / "gray"
+    pdf_to_image(test_pdf, gray, [1], scale=1, grayscale=True, png_compress_level=1)
+    with Image.open(gray / "input-1.png") as image:
+        assert image.mode == "L"
+
+    with pytest.raises(ValueError):
+        pdf_to_image(test_pdf, tmp_path / "bmp", format="bmp")
+
+
+def test_pdf_to_image_sizes(test_pdf: Path, tmp_path: Path) -> None:
+    # The test pages are 612 by 792 points
+    for options, size in [
+        ({"dpi": 36}, (306, 396)),
+        ({"fit_width": 100}, (100, 130)),
+        ({"fit_width": 100, "fit_height": 100}, (78, 100)),
+        ({"max_pixels": 10000}, (88, 113)),
+    ]:
+        out = tmp_path / str(len(options)) / str(size)
+        pdf_to_image(test_pdf, out, [1], **options)
+        with Image.open(out / "input-1.png") as image:
+            assert image.size == size
+            assert image.width * image.height <= options.get("max_pixels", 10**6)
+
+
+def test_pdf_to_image_tiles(test_pdf: Path, tmp_path: Path) -> None:
+    text_pdf = tmp_path / "text.pdf"
+    generate_pdf(text_pdf, 1, 300)
+    pdf_to_image(text_pdf, tmp_path / "whole", scale=1.3)
+    pdf_to_image(text_pdf, tmp_path / "stitched", scale=1.3, tile_size=256)
+    with (
+        Image.open(tmp_path / "whole" / "text-1.png") as whole,
+        Image.open(tmp_path / "stitched" / "text-1.png") as stitched,
+    ):
+        assert whole.size == stitched.size
+        # Only the anti-aliasing of glyphs that cross the edges of tiles differs
+        difference = ImageChops.difference(whole, stitched).convert("L")
+        assert ImageStat.Stat(difference).mean[0] < 0.1
+
+    out = tmp_path / "tiles"
+    pdf_to_image(test_pdf, out, [1], scale=1, tile_size=256, separate_tiles=True)
+    assert len(list(out.iterdir())) == 3 * 4
+    with Image.open(out / "input-1-tile-4-3.png") as tile:
+        assert tile.size == (612 - 512, 792 - 768)
+
+
+def test_pdf_to_thumbnails(test_pdf: Path, tmp_path: Path) -> None:
+    out = tmp_path / "thumbnails"
+    assert pdf_to_thumbnails(test_pdf, out, [1, 3], width=100, grayscale=True) == 2
+    assert sorted(p.name for p in out.iterdir()) == ["input-1.png", "input-3.png"]
+    with Image.open(out / "input-3.png") as image:
+        assert (image.mode, image.size) == ("L", (100, 130))
+
+    sheet = tmp_path / "sheet.png"
+    assert pdf_to_thumbnails(test_pdf, sheet, width=100, contact_sheet=True) == 5
+    with Image.open(sheet) as image:
+        # 3 columns and 2 rows, 8 pixels apart
+        assert image.size == (3 * 108 + 8, 2 * 138 + 8)
+
+
+# remove_pages
+
+
+def test_remove_pages_in_place_matches_import(test_pdf: Path, tmp_path: Path) -> None:
+    pdf = PdfDocument(str(test_pdf))
+    for i in range(len(pdf)):
+        pdf[i].set_rotation(90 * (i % 4))
+    pdf.save(str(test_pdf))
+    pdf.close()
+
+    rotations = []
+    for in_place in (False, True):
+        out = tmp_path / f"{in_place}.pdf"
+        assert remove_pages(test_pdf, [4, 2, 2, 9], out, in_place=in_place) == 2
+        pdf = PdfDocument(str(out))
+        rotations.append([pdf[i].get_rotation() for i in range(len(pdf))])
+        pdf.close()
+    assert rotations == [[0, 180, 0]] * 2
+
+
+# iter_text / extract_text
+
+
+def test_iter_text_yields_requested_pages(test_pdf: Path) -> None:
+    assert [i for i, _ in iter_text(test_pdf, [4, 2])] == [2, 4]
+
+
+def test_iter_text_accepts_open_ranges(test_pdf: Path) -> None:
+    assert [i for i, _ in iter_text(test_pdf, "1,4-")] == [1, 4, 5]
+    assert [i for i, _ in iter_text(test_pdf, PageSet.parse("-2:"))] == [4, 5]
+
+
+def test_extract_text_separates_pages(test_pdf: Path) -> None:
+    assert extract_text(test_pdf) == "\n" * 5
+
+
+def test_extract_text_honors_the_character_budget(tmp_path: Path) -> None:
+    path = tmp_path / "text.pdf"
+    generate_pdf(path, 3, 300)
+    everything = extract_text(path, [1, 2, 3])
+    # 500 characters end on the second page
+    for budget in (250, 500):
+        text = extract_text(path, [1, 2, 3], max_number_of_characters=budget)
+        assert text == everything[:budget]
+
+
+def test_reverse_lines_keeps_line_endings(tmp_path: Path) -> None:
+    path = tmp_path / "text.pdf"
+    generate_pdf(path, 1, 300)
+    text = extract_text(path, [1])
+    reversed_text = extract_text(path, [1], reverse_lines=True)
+    assert text.count("\r\n") > 1
+    assert [line[::-1] for line in reversed_text.split("\r\n")] == text.split("\r\n")
+
+
+# image_to_pdf
+
+
+def test_image_to_pdf_embeds_jpeg_as_is(tmp_path: Path) -> None:
+    jpeg = tmp_path / "scan.jpg"
+    Image.new("RGB", (40, 30), "red").save(jpeg)
+    out = tmp_path / "out.pdf"
+    assert image_to_pdf([jpeg], out) == 1
+    pdf = PdfDocument(str(out))
+    page = pdf[0]
+    assert page.get_size() == (40, 30)
+    (image,) = page.get_objects()
+    assert image.get_filters() == ["DCTDecode"]
+    page.close()
+    pdf.close()
+
+
+# split_pdf
+
+
+def test_split_pdf_defaults_to_single_pages(test_pdf: Path, tmp_path: Path) -> None:
+    assert split_pdf(test_pdf, tmp_path) == 5
+    for i in range(1, 6):
+        pdf = PdfDocument(str(tmp_path / f"input_part_{i}.pdf"))
+        assert len(pdf) == 1
+        pdf.close()
+
+
+def test_split_pdf_workers_match_serial(test_pdf: Path, tmp_path: Path) -> None:
+    serial = tmp_path / "serial"
+    parallel = tmp_path / "parallel"
+    assert split_pdf(test_pdf, serial, [1, 4]) == 3
+    assert split_pdf(test_pdf, parallel, [1, 4], workers=2) == 3
+    for directory in (serial, parallel):
+        sizes = []
+        for i in range(1, 4):
+            pdf = PdfDocument(str(directory / f"input_part_{i}.pdf"))
+            sizes.append(len(pdf))
+            pdf.close()
+        assert sizes == [1, 3, 1]
+
+
+# In-memory inputs
+
+
+@pytest.mark.parametrize(
+    "kind", ["bytes", "bytearray", "memoryview", "slice", "mmap", "read-only mmap"]
+)
+def test_buffer_inputs(test_pdf: Path, tmp_path: Path, kind: str) -> None:
+    data = test_pdf.read_bytes()
+    with open(test_pdf, "r+b") as file:
+        if kind == "bytes":
+            buffer = data
+        elif kind == "bytearray":
+            buffer = bytearray(data)
+        elif kind == "memoryview":
+            buffer = memoryview(data)
+        elif kind == "slice":
+            buffer = memoryview(b"junk" + data)[4:]
+        elif kind == "mmap":
+            buffer = mmap.mmap(file.fileno(), 0)
+        else:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        output = io.BytesIO()
+        assert remove_pages(buffer, [1, 2], output) == 2
+        assert len(PdfDocument(output.getvalue())) == 3
+        assert extract_text(buffer) == "\n" * 5
+        if isinstance(buffer, mmap.mmap):
+            # No view of the map outlives the calls
+            buffer.close()
+
+
+def test_buffer_inputs_need_a_name(test_pdf: Path, tmp_path: Path) -> None:
+    data = memoryview(bytearray(test_pdf.read_bytes()))
+    with pytest.raises(ValueError, match="name"):
+        pdf_to_image(data, tmp_path, scale=1)
+    assert pdf_to_image(data, tmp_path, "1-2", scale=1, workers=2, name="doc") == 2
+    assert split_pdf(data, tmp_path, [2], name="doc") == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "doc-1.png",
+        "doc-2.png",
+        "doc_part_1.pdf",
+        "doc_part_2.pdf",
+    ]
+
+
+def test_file_object_inputs_are_named_after_their_file(
+    test_pdf: Path, tmp_path: Path
+) -> None:
+    with open(test_pdf, "rb") as file:
+        assert split_pdf(file, tmp_path, [3], workers=2) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "input_part_1.pdf",
+        "input_part_2.pdf",
+    ]
+
+
+def test_bundle_buffers(test_pdf: Path, tmp_path: Path) -> None:
+    image = io.BytesIO()
+    Image.new("RGB", (40, 30), "red").save(image, format="PNG")
+    output = io.BytesIO()
+    assert bundle([bytearray(test_pdf.read_bytes()), image.getvalue()], output) == 6
+
+
+@pytest.mark.parametrize("format", ["JPEG", "PNG", "TIFF", "WEBP", "GIF", "BMP"])
+def test_file_type_of_images(format: str) -> None:
+    stream = io.BytesIO()
+    Image.new("RGB", (4, 4), "red").save(stream, format=format)
+    assert _file_type(stream.getvalue()) == format.lower()
+    stream.seek(3)
+    assert _file_type(stream) == format.lower()
+    assert stream.tell() == 3
+
+
+def test_file_type_of_pdfs(test_pdf: Path) -> None:
+    assert _file_type(test_pdf) == "pdf"
+    assert _file_type(str(test_pdf)) == "pdf"
+    # Readers accept bytes before the header, up to a kilobyte of them
+    assert _file_type(b"\n" * 100 + test_pdf.read_bytes()) == "pdf"
+
+
+def test_bundle_goes_by_contents_not_extensions(test_pdf: Path, tmp_path: Path) -> None:
+    image = tmp_path / "scan"
+    Image.new("RGB", (40, 30), "red").save(image, format="PNG")
+    pdf = tmp_path / "report.png"
+    pdf.write_bytes(test_pdf.read_bytes())
+    assert bundle([image, pdf], tmp_path / "out.pdf") == 6
+
+
+def test_unsupported_inputs_fail_before_any_parse(test_pdf: Path) -> None:
+    output = io.BytesIO()
+    with pytest.raises(ValueError, match="neither a PDF nor a supported image"):
+        bundle([test_pdf, b"PK\x03\x04 a zip file"], output)
+    assert output.getvalue() == b""
+    with pytest.raises(ValueError, match="is a PDF, not an image"):
+        image_to_pdf([test_pdf], output)
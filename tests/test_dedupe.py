@@ -0,0 +1,72 @@
+import io
+import re
+from pathlib import Path
+
+from PIL import Image
+from pypdfium2 import PdfDocument
+
+from pdf_helper import bundle, merge_pdfs, optimize_pdf
+from pdf_helper.dedupe import _rewrite, dedupe_streams
+from benchmarks.corpus import generate_pdf
+
+
+def assert_valid_xref(data: bytes) -> None:
+    """Check that every entry of the cross-reference table points at its object."""
+    xref = int(re.search(rb"startxref\s+(\d+)", data[-100:])[1])
+    entries = re.findall(rb"(\d{10}) (\d{5}) n", data[xref:])
+    for number, (offset, _) in enumerate(entries, 1):
+        assert data.startswith(b"%d 0 obj" % number, int(offset))
+
+
+def renders(data: bytes) -> list[bytes]:
+    pdf = PdfDocument(data)
+    images = [pdf[i].render(scale=0.5).to_pil().tobytes() for i in range(len(pdf))]
+    pdf.close()
+    return images
+
+
+def test_merge_stores_identical_images_once(tmp_path: Path) -> None:
+    source = tmp_path / "scanned.pdf"
+    generate_pdf(source, 2, 100, image_size=(300, 200))
+    plain, deduped = io.BytesIO(), io.BytesIO()
+    assert merge_pdfs([source] * 3, plain) == 6
+    assert merge_pdfs([source] * 3, deduped, dedupe=True) == 6
+    assert len(deduped.getvalue()) < len(plain.getvalue()) / 2
+    assert_valid_xref(deduped.getvalue())
+    assert renders(deduped.getvalue()) == renders(plain.getvalue())
+
+
+def test_streams_referring_to_identical_streams_are_merged() -> None:
+    image = io.BytesIO()
+    Image.new("RGBA", (30, 20), (255, 0, 0, 128)).save(image, format="PNG")
+    output = io.BytesIO()
+    bundle([image.getvalue()] * 3, output, dedupe=True)
+    # One image and its soft mask
+    assert output.getvalue().count(b"/Subtype/Image") == 2
+    assert_valid_xref(output.getvalue())
+
+
+def test_nothing_to_dedupe(test_pdf: Path) -> None:
+    data = test_pdf.read_bytes()
+    assert dedupe_streams(data) is data
+
+
+def test_references_in_strings_are_kept() -> None:
+    syntax = b"<</A 1 0 R/B[2 0 R 9 0 R]/T(1 0 R \\) (2 0 R))/F1 2 0 R>>"
+    renumbered = _rewrite(syntax, lambda n, _: None if n == 9 else n + 10)
+    assert renumbered == b"<</A 11 0 R/B[12 0 R null]/T(1 0 R \\) (2 0 R))/F1 12 0 R>>"
+
+
+def test_optimize(tmp_path: Path, test_pdf: Path) -> None:
+    source = tmp_path / "scanned.pdf"
+    generate_pdf(source, 2, 100, image_size=(300, 200))
+    merged = tmp_path / "merged.pdf"
+    merge_pdfs([source] * 3, merged)
+    output = io.BytesIO()
+    saved = optimize_pdf(merged, output)
+    assert saved == merged.stat().st_size - len(output.getvalue()) > 0
+    assert renders(output.getvalue()) == renders(merged.read_bytes())
+    # The output is never larger than the input
+    output = io.BytesIO()
+    assert optimize_pdf(test_pdf.read_bytes(), output) >= 0
+    assert renders(output.getvalue()) == renders(test_pdf.read_bytes())
@@ -0,0 +1,59 @@
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import pdf_helper
+
+# Modules that must only be imported by the commands that need them
+HEAVY_MODULES = (
+    "PIL",
+    "yaml",
+    "pypdfium2",
+    "pdf_helper.batch",
+    "pdf_helper.recipe",
+    "pdf_helper.server",
+    "pdf_helper.aio",
+    "concurrent.futures.process",
+)
+
+
+def imported_modules(code: str) -> dict[str, int]:
+    """Run code in a new interpreter and return the modules it imported with their
+    cumulative import time in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env={
+            **os.environ,
+            "PYTHONPATH": str(Path(pdf_helper.__file__).parent.parent),
+        },
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+@pytest.mark.parametrize("module", ["pdf_helper", "pdf_helper.__main__"])
+def test_heavy_modules_are_lazy(module: str):
+    modules = imported_modules(f"import {module}")
+    assert module in modules
+    assert not [name for name in HEAVY_MODULES if name in modules]
+
+
+def test_functions_import_what_they_need(tmp_root: Path, test_pdf: Path):
+    modules = imported_modules(
+        "from pdf_helper import remove_pages; "
+        f"remove_pages({str(test_pdf)!r}, [1], {str(tmp_root / 'out.pdf')!r})"
+    )
+    assert "pypdfium2" in modules
+    assert "PIL" not in modules
@@ -0,0 +1,101 @@
+import io
+import os
+import sys
+import tarfile
+import zipfile
+import subprocess
+from pathlib import Path
+
+from PIL import Image
+from pypdfium2 import PdfDocument
+
+import pdf_helper
+from benchmarks.corpus import generate_pdf
+
+
+def run(*argv: str, stdin: bytes = b"") -> subprocess.CompletedProcess:
+    """Run the CLI with stdin and return the result, with stdout as bytes."""
+    return subprocess.run(
+        [sys.executable, "-m", "pdf_helper", *argv],
+        input=stdin,
+        env={
+            **{k: v for k, v in os.environ.items() if k != "PDF_HELPER_SERVER"},
+            "PYTHONPATH": str(Path(pdf_helper.__file__).parent.parent),
+        },
+        capture_output=True,
+        check=False,
+    )
+
+
+def test_pipe_chain(tmp_path: Path) -> None:
+    source = tmp_path / "in.pdf"
+    generate_pdf(source, 4, 100)
+    removed = run("remove-pages", "-", "-", "1-3", stdin=source.read_bytes())
+    assert removed.returncode == 0
+    assert len(PdfDocument(removed.stdout)) == 1
+    text = run("extract-text", "-", stdin=removed.stdout)
+    assert text.returncode == 0
+    pdf = PdfDocument(source)
+    page = pdf[3]
+    textpage = page.get_textpage()
+    assert text.stdout.decode().strip() == textpage.get_text_range().strip()
+    textpage.close()
+    page.close()
+    pdf.close()
+
+
+def test_split_to_tar_stream(test_pdf: Path) -> None:
+    argv = ["split", "-", "-", "--split-points", "2", "-j", "2", "--name", "doc"]
+    result = run(*argv, stdin=test_pdf.read_bytes())
+    assert result.returncode == 0
+    with tarfile.open(fileobj=io.BytesIO(result.stdout)) as archive:
+        assert archive.getnames() == ["doc_part_1.pdf", "doc_part_2.pdf"]
+        sizes = [len(PdfDocument(archive.extractfile(m).read())) for m in archive]
+    assert sizes == [2, 3]
+
+
+def test_to_image_to_zip_stream(test_pdf: Path) -> None:
+    argv = ["to-image", str(test_pdf), "-", "-s", "0.2", "-p", "2-", "-j", "2"]
+    result = run(*argv, "--archive-format", "zip")
+    assert result.returncode == 0
+    with zipfile.ZipFile(io.BytesIO(result.stdout)) as archive:
+        assert archive.namelist() == [f"input-{i}.png" for i in range(2, 6)]
+
+
+def test_empty_stdin_is_an_error() -> None:
+    result = run("extract-text", "-")
+    assert result.returncode == 1
+    assert b"stdin" in result.stderr
+
+
+def test_bundle_rejects_unsupported_files(test_pdf: Path, tmp_path: Path) -> None:
+    notes = tmp_path / "notes.txt"
+    notes.write_text("not a PDF")
+    output = tmp_path / "out.pdf"
+    result = run("bundle", str(test_pdf), str(notes), str(output))
+    assert result.returncode == 1
+    assert b"neither a PDF nor a supported image" in result.stderr
+    assert not output.exists()
+
+
+def test_optimize(tmp_path: Path) -> None:
+    source = tmp_path / "scanned.pdf"
+    generate_pdf(source, 2, 100, image_size=(300, 200))
+    merged = run("bundle", str(source), str(source), "-")
+    assert merged.returncode == 0
+    optimized = run("optimize", "-", "-", stdin=merged.stdout)
+    assert optimized.returncode == 0
+    assert len(optimized.stdout) < len(merged.stdout) / 1.5
+    assert len(PdfDocument(optimized.stdout)) == 4
+
+
+def test_batch_fractional_scale(test_pdf: Path, tmp_path: Path) -> None:
+    template = str(tmp_path / "{stem}")
+    argv = ["batch", "to-image", str(test_pdf), "--output-template", template]
+    result = run(*argv, "--pages", "1", "--scale", "1.5", "-j", "1")
+    assert result.returncode == 0, result.stderr
+    pdf = PdfDocument(test_pdf)
+    width, height = pdf[0].get_size()
+    pdf.close()
+    with Image.open(tmp_path / "input" / "input-1.png") as image:
+        assert image.size == (round(width * 1.5), round(height * 1.5))
@@ -0,0 +1,75 @@
+import os
+import json
+from pathlib import Path
+
+from tests.conftest import make_recipe
+from pdf_helper import profiling, extract_text, pdf_to_image
+from pdf_helper.recipe import run_recipe
+
+
+def test_span_is_a_no_op_when_inactive() -> None:
+    assert not profiling.is_active()
+    with profiling.span("open"):
+        profiling.count(pages=1)
+    assert profiling.finish() is None
+
+
+def test_profile_records_phases(test_pdf: Path, tmp_path: Path) -> None:
+    trace = tmp_path / "trace.json"
+    with profiling.profile(trace) as profiler:
+        extract_text(test_pdf)
+    assert not profiling.is_active()
+
+    rows = {row["name"]: row for row in profiler.summary()}
+    assert rows["open"]["count"] == 1
+    assert rows["extract"]["count"] == 5
+    assert rows["extract"]["pages"] == 5
+
+    events = json.loads(trace.read_text())["traceEvents"]
+    spans = [event for event in events if event["ph"] == "X"]
+    assert {event["name"] for event in spans} == {"open", "extract"}
+    assert all(event["dur"] >= 0 and "cpu_time" in event["args"] for event in spans)
+
+
+def test_profile_collects_worker_spans(test_pdf: Path, tmp_path: Path) -> None:
+    with profiling.profile(tmp_path / "trace.json") as profiler:
+        pdf_to_image(test_pdf, tmp_path / "images", scale=1, workers=2)
+
+    encode = [event for event in profiler.events if event["name"] == "encode"]
+    assert len(encode) == 5
+    assert os.getpid() not in {event["pid"] for event in encode}
+    assert sum(event["args"]["pages"] for event in encode) == 5
+
+
+def test_start_and_finish_wrap_a_command_span(test_pdf: Path, tmp_path: Path, capsys):
+    trace = tmp_path / "trace.json"
+    profiling.start(trace, "extract-text")
+    extract_text(test_pdf)
+    profiler = profiling.finish()
+
+    (command,) = [event for event in profiler.events if event["cat"] == "command"]
+    assert command["name"] == "extract-text"
+    assert trace.exists()
+    assert "command:extract-text" in capsys.readouterr().err
+
+
+def test_profile_records_parallel_recipe_steps(test_pdf: Path, tmp_path: Path) -> None:
+    recipe = {
+        "settings": {"max_parallel": 2},
+        "steps": [
+            {
+                "id": step_id,
+                "operation": "remove_pages",
+                "input": str(test_pdf),
+                "pages_to_remove": [1],
+                "output": str(tmp_path / f"{step_id}.pdf"),
+            }
+            for step_id in ("a", "b")
+        ],
+    }
+    with profiling.profile(tmp_path / "trace.json") as profiler:
+        run_recipe(make_recipe(recipe, tmp_path))
+
+    rows = profiler.summary()
+    assert {row["name"] for row in rows if row["category"] == "step"} == {"a", "b"}
+    assert {row["name"] for row in rows} >= {"open", "import", "save"}
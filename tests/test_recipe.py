@@ -1,18 +1,24 @@
 # yapf: disable
 
 import os
+import datetime
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import yaml
 import pytest
+from PIL import Image
 from pypdfium2 import PdfDocument
 
 from tests.conftest import make_recipe
+from pdf_helper.utils import PageSet
 from pdf_helper.recipe import (OPERATIONS, Context, RecipeError, _load, run_recipe,
                                _handle_split, _handle_bundle, _handle_encrypt,
                                _handle_metadata, _handle_to_image, _handle_watermark,
-                               _handle_extract_text, _handle_remove_pages)
+                               _handle_thumbnails,
+                               _dependents, _build_dependencies,
+                               _release_artifacts, _handle_extract_text,
+                               _handle_remove_pages)
 
 # yapf: enable
 
@@ -156,6 +162,58 @@ def test_cleanup_noop_without_setting(tmp_path: Path) -> None:
     assert td.exists()
 
 
+# Context: in-memory intermediates
+
+
+def test_output_target_in_memory(tmp_path: Path) -> None:
+    td = tmp_path / "tmp"
+    ctx = Context({"steps": [], "settings": {"temp_dir": str(td), "memory_budget": 1}})
+    target = ctx.output_target(str(td / "mid.pdf"))
+    target.write(b"%PDF-data")
+    ctx.store(str(td / "mid.pdf"), target)
+    assert not (td / "mid.pdf").exists()
+    assert ctx.open_input(str(td / "mid.pdf")).read() == b"%PDF-data"
+    assert ctx.output_target(str(tmp_path / "final.pdf")) == str(tmp_path / "final.pdf")
+
+
+def test_store_spills_over_budget(tmp_path: Path) -> None:
+    td = tmp_path / "tmp"
+    ctx = Context({"steps": [], "settings": {"temp_dir": str(td), "memory_budget": 1}})
+    target = ctx.output_target(str(td / "big.pdf"))
+    target.write(b"x" * (2 * 1024 * 1024))
+    ctx.store(str(td / "big.pdf"), target)
+    assert not ctx.artifacts
+    assert (td / "big.pdf").stat().st_size == 2 * 1024 * 1024
+
+
+def test_open_input_need_path_writes_to_disk(tmp_path: Path) -> None:
+    td = tmp_path / "tmp"
+    ctx = Context({"steps": [], "settings": {"temp_dir": str(td), "memory_budget": 1}})
+    ctx.artifacts[os.path.normpath(str(td / "mid.pdf"))] = b"%PDF-data"
+    assert ctx.open_input(str(td / "mid.pdf"), need_path=True) == str(td / "mid.pdf")
+    assert (td / "mid.pdf").read_bytes() == b"%PDF-data"
+
+
+def test_for_worker_only_copies_read_artifacts(tmp_path: Path) -> None:
+    ctx = Context({"steps": [], "settings": {"memory_budget": 1}})
+    ctx.artifacts = {"a.pdf": b"a", "b.pdf": b"b"}
+    worker_ctx = ctx.for_worker(["b.pdf", "missing.pdf"])
+    assert worker_ctx.artifacts == {"b.pdf": b"b"}
+    assert ctx.artifacts == {"a.pdf": b"a", "b.pdf": b"b"}
+
+
+def test_release_artifacts_after_last_consumer() -> None:
+    ctx = Context({"steps": []})
+    ctx.artifacts = {"a.pdf": b"a", "b.pdf": b"b"}
+    owned = {0: ["a.pdf"], 1: ["b.pdf"]}
+    # Step 2 reads both, step 3 only reads b
+    dependents = _dependents([set(), set(), {0, 1}, {1}])
+    _release_artifacts(ctx, owned, dependents, {0, 1, 2})
+    assert ctx.artifacts == {"b.pdf": b"b"}
+    _release_artifacts(ctx, owned, dependents, {0, 1, 2, 3})
+    assert not ctx.artifacts and not owned
+
+
 # Handler: bundle (mocked core)
 
 
@@ -180,6 +238,24 @@ def test_handle_bundle_with_pages(test_pdf: Path, tmp_path: Path) -> None:
     reader.close()
 
 
+def test_handle_bundle_dedupe(tmp_path: Path) -> None:
+    image = tmp_path / "logo.png"
+    Image.new("RGB", (40, 30), "red").save(image)
+    ctx = Context({"steps": [], "settings": {}})
+    for name, dedupe in (("plain.pdf", False), ("deduped.pdf", True)):
+        step = {
+            "inputs": [{"path": str(image), "pages": [1]}, str(image), str(image)],
+            "output": str(tmp_path / name),
+            "dedupe": dedupe,
+        }
+        _handle_bundle(ctx, step)
+    plain = (tmp_path / "plain.pdf").read_bytes()
+    deduped = (tmp_path / "deduped.pdf").read_bytes()
+    assert plain.count(b"/Subtype/Image") == 3
+    assert deduped.count(b"/Subtype/Image") == 1
+    assert len(PdfDocument(deduped)) == 3
+
+
 def test_handle_bundle_mixed(test_pdf: Path, tmp_path: Path) -> None:
     ctx = Context({"steps": [], "settings": {}})
     out = tmp_path / "out.pdf"
@@ -205,6 +281,16 @@ def test_handle_bundle_invalid_input(test_pdf: Path) -> None:
         _handle_bundle(ctx, step)
 
 
+def test_handle_bundle_unsupported_input(test_pdf: Path, tmp_path: Path) -> None:
+    text = tmp_path / "notes.pdf"
+    text.write_text("not a PDF")
+    ctx = Context({"steps": [], "settings": {}})
+    for inputs in ([str(test_pdf), str(text)], [{"path": str(text), "pages": [1]}]):
+        step = {"inputs": inputs, "output": str(tmp_path / "out.pdf")}
+        with pytest.raises(RecipeError, match="neither a PDF nor a supported image"):
+            _handle_bundle(ctx, step)
+
+
 # Handler: remove_pages (mocked core)
 
 
@@ -213,7 +299,7 @@ def test_handle_remove_pages_delegates() -> None:
     step = {"input": "in.pdf", "pages_to_remove": [2, 4], "output": "out.pdf"}
     with patch("pdf_helper.recipe._remove_pages") as mock:
         result = _handle_remove_pages(ctx, step)
-    mock.assert_called_once_with("in.pdf", [2, 4], "out.pdf")
+    mock.assert_called_once_with("in.pdf", PageSet([2, 4]), "out.pdf")
     assert result == "out.pdf"
 
 
@@ -247,10 +333,33 @@ def test_handle_to_image(tmp_path: Path) -> None:
     with patch("pdf_helper.recipe._pdf_to_image") as mock:
         _handle_to_image(ctx, step)
     mock.assert_called_once_with(
-        str(tmp_path / "in.pdf"), str(tmp_path / "imgs"), [1, 2, 3], 3
+        str(tmp_path / "in.pdf"),
+        str(tmp_path / "imgs"),
+        PageSet.parse("1-3"),
+        3,
+        name="in",
     )
 
 
+# Handler: thumbnails
+
+
+def test_handle_thumbnails_contact_sheet(test_pdf: Path, tmp_path: Path) -> None:
+    ctx = Context({"steps": []})
+    step = {
+        "input": str(test_pdf),
+        "pages": "2-",
+        "width": 50,
+        "contact_sheet": True,
+        "columns": 2,
+        "output": str(tmp_path / "sheet.jpg"),
+    }
+    assert _handle_thumbnails(ctx, step) == str(tmp_path / "sheet.jpg")
+    with Image.open(tmp_path / "sheet.jpg") as sheet:
+        # 4 pages of 50 by 65 pixels in 2 rows, 8 pixels apart
+        assert (sheet.format, sheet.size) == ("JPEG", (2 * 58 + 8, 2 * 73 + 8))
+
+
 # Handler: extract_text (mocked core)
 
 
@@ -266,7 +375,9 @@ def test_handle_extract_text(tmp_path: Path) -> None:
     }
     with patch("pdf_helper.recipe._extract_text", return_value="hello") as mock:
         _handle_extract_text(ctx, step)
-    mock.assert_called_once_with(str(tmp_path / "in.pdf"), [1, 2], 100, True)
+    mock.assert_called_once_with(
+        str(tmp_path / "in.pdf"), PageSet.parse("1-2"), 100, True, None
+    )
     assert (tmp_path / "out.txt").read_text() == "hello"
 
 
@@ -324,6 +435,7 @@ def test_all_operations_registered() -> None:
         "remove_pages",
         "split_pdf",
         "pdf_to_image",
+        "thumbnails",
         "extract_text",
         "watermark",
         "encrypt",
@@ -385,6 +497,157 @@ def test_run_recipe_multiple_steps(test_pdf: Path, tmp_path: Path) -> None:
     reader.close()
 
 
+def test_run_recipe_in_memory_chain(test_pdf: Path, tmp_path: Path) -> None:
+    td = tmp_path / "tmp"
+    recipe = {
+        "settings": {"temp_dir": str(td), "memory_budget": 16},
+        "steps": [
+            {
+                "id": "bundle",
+                "operation": "bundle",
+                "inputs": [str(test_pdf), str(test_pdf)],
+                "output": "{temp_dir}/bundled.pdf",
+            },
+            {
+                "id": "clean",
+                "operation": "remove_pages",
+                "input": {"step": "bundle"},
+                "pages_to_remove": [1, 2, 3],
+                "output": "{temp_dir}/cleaned.pdf",
+            },
+            {
+                "id": "split",
+                "operation": "split_pdf",
+                "input": {"step": "clean"},
+                "split_points": [3],
+                "output_dir": str(tmp_path / "parts"),
+            },
+        ],
+    }
+    p = make_recipe(recipe, tmp_path)
+    run_recipe(str(p))
+    assert not (td / "bundled.pdf").exists()
+    assert sorted(f.name for f in (tmp_path / "parts").iterdir()) == [
+        "cleaned_part_1.pdf",
+        "cleaned_part_2.pdf",
+    ]
+
+
+# run_recipe: build cache
+
+
+def _cached_recipe(test_pdf: Path, tmp_path: Path) -> Path:
+    recipe = {
+        "settings": {"build_cache": str(tmp_path / "cache.json")},
+        "steps": [
+            {
+                "id": "a",
+                "operation": "remove_pages",
+                "input": str(test_pdf),
+                "pages_to_remove": [1],
+                "output": str(tmp_path / "a.pdf"),
+            },
+            {
+                "id": "b",
+                "operation": "remove_pages",
+                "input": {"step": "a"},
+                "pages_to_remove": [1],
+                "output": str(tmp_path / "b.pdf"),
+            },
+        ],
+    }
+    return make_recipe(recipe, tmp_path)
+
+
+def test_run_recipe_build_cache_skips_up_to_date(
+    test_pdf: Path, tmp_path: Path
+) -> None:
+    p = _cached_recipe(test_pdf, tmp_path)
+    run_recipe(str(p))
+    with patch("pdf_helper.recipe._remove_pages") as mock:
+        run_recipe(str(p))
+    mock.assert_not_called()
+
+
+def test_run_recipe_build_cache_with_date_inputs(
+    test_pdf: Path, tmp_path: Path
+) -> None:
+    recipe = yaml.safe_load(_cached_recipe(test_pdf, tmp_path).read_text())
+    recipe["inputs"] = {"released": datetime.date(2024, 5, 1)}
+    p = make_recipe(recipe, tmp_path)
+    run_recipe(str(p))
+    with patch("pdf_helper.recipe._remove_pages") as mock:
+        run_recipe(str(p))
+    mock.assert_not_called()
+
+
+def test_run_recipe_build_cache_invalidates_downstream(
+    test_pdf: Path, tmp_path: Path
+) -> None:
+    p = _cached_recipe(test_pdf, tmp_path)
+    run_recipe(str(p))
+    writer = PdfDocument.new()
+    for _ in range(3):
+        writer.new_page(100, 100)
+    writer.save(str(test_pdf))
+    writer.close()
+    run_recipe(str(p))
+    reader = PdfDocument(str(tmp_path / "b.pdf"))
+    assert len(reader) == 1  # 3 - 1 - 1
+    reader.close()
+
+
+def test_run_recipe_rebuild_ignores_cache(test_pdf: Path, tmp_path: Path) -> None:
+    p = _cached_recipe(test_pdf, tmp_path)
+    run_recipe(str(p))
+    with patch("pdf_helper.recipe._remove_pages") as mock:
+        run_recipe(str(p), rebuild=True)
+    assert mock.call_count == 2
+
+
+def _in_memory_cached_recipe(
+    test_pdf: Path, tmp_path: Path, pages_to_remove: list[int]
+) -> Path:
+    recipe = {
+        "settings": {
+            "temp_dir": str(tmp_path / "tmp"),
+            "memory_budget": 16,
+            "build_cache": str(tmp_path / "cache.json"),
+        },
+        "steps": [
+            {
+                "id": "bundle",
+                "operation": "bundle",
+                "inputs": [str(test_pdf), str(test_pdf)],
+                "output": "{temp_dir}/bundled.pdf",
+            },
+            {
+                "id": "clean",
+                "operation": "remove_pages",
+                "input": {"step": "bundle"},
+                "pages_to_remove": pages_to_remove,
+                "output": str(tmp_path / "clean.pdf"),
+            },
+        ],
+    }
+    return make_recipe(recipe, tmp_path)
+
+
+def test_run_recipe_build_cache_in_memory(test_pdf: Path, tmp_path: Path) -> None:
+    p = _in_memory_cached_recipe(test_pdf, tmp_path, [1])
+    run_recipe(str(p))
+    with patch("pdf_helper.recipe._bundle") as mock:
+        run_recipe(str(p))
+    mock.assert_not_called()
+
+    # The bundled PDF is gone, so it is built again for the step that reads it
+    p = _in_memory_cached_recipe(test_pdf, tmp_path, [1, 2])
+    run_recipe(str(p))
+    reader = PdfDocument(str(tmp_path / "clean.pdf"))
+    assert len(reader) == 8  # 5 + 5 - 2
+    reader.close()
+
+
 # run_recipe: error handling
 
 
@@ -473,6 +736,117 @@ def test_run_recipe_cleanup_on_failure(tmp_path: Path) -> None:
     assert not td.exists()
 
 
+# run_recipe: parallel scheduling
+
+
+def test_build_dependencies() -> None:
+    ctx = Context({"steps": []})
+    steps = [
+        {"id": "a", "input": "in.pdf", "output": "a.pdf"},
+        {"id": "b", "input": "in.pdf", "output": "b.pdf"},
+        {"id": "c", "inputs": [{"step": "a"}, "b.pdf"], "output": "c.pdf"},
+        {"id": "d", "input": "in.pdf", "depends_on": "a", "output": "d.pdf"},
+    ]
+    assert _build_dependencies(ctx, steps) == [set(), set(), {0, 1}, {0}]
+
+
+def test_build_dependencies_output_dir() -> None:
+    ctx = Context({"steps": []})
+    steps = [
+        {"id": "split", "input": "in.pdf", "output_dir": "parts"},
+        {"id": "a", "input": "parts/in_part_1.pdf", "output": "a.pdf"},
+        {"id": "b", "input": "partsfile.pdf", "output": "b.pdf"},
+    ]
+    assert _build_dependencies(ctx, steps) == [set(), {0}, set()]
+
+
+def test_build_dependencies_unknown_step() -> None:
+    ctx = Context({"steps": []})
+    with pytest.raises(RecipeError, match="unknown step"):
+        _build_dependencies(ctx, [{"id": "a", "depends_on": ["missing"]}])
+
+
+def test_run_recipe_parallel(test_pdf: Path, tmp_path: Path) -> None:
+    recipe = {
+        "settings": {"max_parallel": 2},
+        "steps": [
+            {
+                "id": "a",
+                "operation": "remove_pages",
+                "input": str(test_pdf),
+                "pages_to_remove": [1, 2],
+                "output": str(tmp_path / "a.pdf"),
+            },
+            {
+                "id": "b",
+                "operation": "remove_pages",
+                "input": str(test_pdf),
+                "pages_to_remove": [1],
+                "output": str(tmp_path / "b.pdf"),
+            },
+            {
+                "id": "c",
+                "operation": "bundle",
+                "inputs": [{"step": "a"}, {"step": "b"}],
+                "output": str(tmp_path / "c.pdf"),
+            },
+        ],
+    }
+    p = make_recipe(recipe, tmp_path)
+    run_recipe(str(p))
+    reader = PdfDocument(str(tmp_path / "c.pdf"))
+    assert len(reader) == 7  # (5 - 2) + (5 - 1)
+    reader.close()
+
+
+def test_run_recipe_parallel_in_memory(test_pdf: Path, tmp_path: Path) -> None:
+    td = tmp_path / "tmp"
+    recipe = {
+        "settings": {"temp_dir": str(td), "memory_budget": 16, "max_parallel": 2},
+        "steps": [
+            {
+                "id": "a",
+                "operation": "remove_pages",
+                "input": str(test_pdf),
+                "pages_to_remove": [1, 2],
+                "output": "{temp_dir}/a.pdf",
+            },
+            {
+                "id": "b",
+                "operation": "remove_pages",
+                "input": {"step": "a"},
+                "pages_to_remove": [1],
+                "output": "{temp_dir}/b.pdf",
+            },
+            {
+                "id": "c",
+                "operation": "bundle",
+                "inputs": [{"step": "b"}, str(test_pdf)],
+                "output": str(tmp_path / "c.pdf"),
+            },
+        ],
+    }
+    p = make_recipe(recipe, tmp_path)
+    run_recipe(str(p))
+    assert not td.exists()
+    reader = PdfDocument(str(tmp_path / "c.pdf"))
+    assert len(reader) == 7  # (5 - 2 - 1) + 5
+    reader.close()
+
+
+def test_run_recipe_parallel_cycle(tmp_path: Path) -> None:
+    recipe = {
+        "settings": {"max_parallel": 2},
+        "steps": [
+            {"id": "a", "operation": "remove_pages", "depends_on": "b"},
+            {"id": "b", "operation": "remove_pages", "depends_on": "a"},
+        ],
+    }
+    p = make_recipe(recipe, tmp_path)
+    with pytest.raises(SystemExit):
+        run_recipe(str(p))
+
+
 # Integration: run example recipe files
 
 
@@ -0,0 +1,61 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from pdf_helper import iter_text
+from pdf_helper.search import index, search
+from benchmarks.corpus import generate_pdf
+
+
+@pytest.fixture
+def corpus(tmp_path: Path) -> list[Path]:
+    paths = []
+    for seed in range(2):
+        path = tmp_path / f"document-{seed}.pdf"
+        generate_pdf(path, 3, 300, seed=seed)
+        paths.append(path)
+    return paths
+
+
+def test_search_finds_pages(corpus: list[Path], tmp_path: Path) -> None:
+    database = tmp_path / "index.sqlite3"
+    assert index(corpus, database, workers=1)["indexed"] == 2
+
+    pages = dict(iter_text(corpus[1]))
+    word = pages[2].split()[0]
+    hits = search(word, database)
+    assert (corpus[1], 2) in [(path, page) for path, page, _ in hits]
+    for path, page, snippet in hits:
+        assert f"[{word.lower()}]" in snippet.lower()
+        assert word.lower() in dict(iter_text(path))[page].lower()
+
+    assert search("nonexistentword", database) == []
+    assert len(search(word, database, limit=1)) == 1
+
+
+def test_index_is_incremental(corpus: list[Path], tmp_path: Path) -> None:
+    database = tmp_path / "index.sqlite3"
+    index(corpus, database, workers=1)
+    assert index(corpus, database, workers=1)["unchanged"] == 2
+
+    # A new modification time with the same content is not indexed again
+    os.utime(corpus[0], ns=(0, 0))
+    assert index(corpus, database, workers=1)["unchanged"] == 2
+
+    word = dict(iter_text(corpus[1]))[1].split()[0]
+    shutil.copyfile(corpus[1], corpus[0])
+    assert index(corpus, database, workers=1)["indexed"] == 1
+    assert {path for path, _, _ in search(word, database)} == set(corpus)
+
+    corpus[1].unlink()
+    assert index(corpus[:1], database, workers=1)["removed"] == 1
+    assert {path for path, _, _ in search(word, database)} == {corpus[0]}
+
+
+def test_invalid_query(corpus: list[Path], tmp_path: Path) -> None:
+    database = tmp_path / "index.sqlite3"
+    index(corpus, database, workers=1)
+    with pytest.raises(ValueError):
+        search('"unterminated', database)
@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import socket
+import threading
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import pdf_helper
+from pdf_helper.server import SERVER_ENV, ServerError, call, forward
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX") or not hasattr(os, "fork"),
+    reason="The server needs Unix sockets and fork",
+)
+
+
+@pytest.fixture
+def server(tmp_root: Path) -> str:
+    address = str(tmp_root / "server.sock")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "pdf_helper", "serve", "--socket-path", address],
+        env={
+            **{k: v for k, v in os.environ.items() if k != SERVER_ENV},
+            "PYTHONPATH": str(Path(pdf_helper.__file__).parent.parent),
+        },
+    )
+    try:
+        for _ in range(100):
+            if os.path.exists(address):
+                break
+            time.sleep(0.05)
+        else:
+            pytest.fail("The server did not start")
+        yield address
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    assert not os.path.exists(address)
+
+
+def test_call(server: str, test_pdf: Path, tmp_root: Path):
+    output = tmp_root / "out.pdf"
+    removed = call("remove_pages", str(test_pdf), [1, 2], str(output), address=server)
+    assert removed == 2
+    assert output.exists()
+
+    with pytest.raises(ServerError):
+        call("remove_pages", str(tmp_root / "missing.pdf"), [1], address=server)
+    with pytest.raises(ServerError):
+        call("eval", "1", address=server)
+
+
+def test_forward(server: str, test_pdf: Path, tmp_root: Path):
+    assert forward(["remove-pages", test_pdf.name, "out.pdf", "1"], server) == 0
+    assert (tmp_root / "out.pdf").exists()
+    assert forward(["remove-pages", "missing.pdf", "out2.pdf", "1"], server) == 1
+
+
+def test_forward_uses_client_environment(
+    server: str, test_pdf: Path, tmp_root: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setenv("PDF_HELPER_CACHE_DIR", str(tmp_root / "client-cache"))
+    argv = ["extract-text", test_pdf.name, "-o", "out.txt", "--cache"]
+    assert forward(argv, server) == 0
+    assert (tmp_root / "client-cache" / "text-cache.sqlite3").exists()
+
+
+def test_main_runs_locally_when_server_hangs_up(
+    test_pdf: Path, tmp_root: Path, monkeypatch: pytest.MonkeyPatch
+):
+    from pdf_helper.__main__ import main
+
+    address = str(tmp_root / "broken.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(address)
+    listener.listen()
+
+    def hang_up() -> None:
+        connection, _ = listener.accept()
+        connection.close()
+
+    thread = threading.Thread(target=hang_up)
+    thread.start()
+    monkeypatch.setenv(SERVER_ENV, address)
+    argv = ["pdf-helper", "remove-pages", test_pdf.name, "o.pdf", "1"]
+    monkeypatch.setattr(sys, "argv", argv)
+    try:
+        main()
+    finally:
+        thread.join(timeout=10)
+        listener.close()
+    assert (tmp_root / "o.pdf").exists()
+
+
+def test_cli_reads_the_same_environment_variable():
+    from pdf_helper import __main__
+
+    assert __main__.SERVER_ENV == SERVER_ENV
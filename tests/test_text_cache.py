@@ -0,0 +1,128 @@
+import io
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import make_recipe
+from pdf_helper import iter_text, extract_text
+from pdf_helper.recipe import run_recipe
+from benchmarks.corpus import generate_pdf
+from pdf_helper.text_cache import TextCache
+
+
+@pytest.fixture
+def text_pdf(tmp_path: Path) -> Path:
+    path = tmp_path / "text.pdf"
+    generate_pdf(path, 4, 300)
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> TextCache:
+    cache = TextCache(tmp_path / "cache")
+    yield cache
+    cache.close()
+
+
+def _refuse_to_open(*args, **kwargs):
+    raise AssertionError("The PDF should not be opened")
+
+
+def test_cached_pages_skip_pdfium(
+    text_pdf: Path, cache: TextCache, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    expected = extract_text(text_pdf)
+    assert extract_text(text_pdf, cache=cache) == expected
+
+    monkeypatch.setattr("pypdfium2.PdfDocument", _refuse_to_open)
+    assert extract_text(text_pdf, cache=cache) == expected
+    assert extract_text(text_pdf, [3, 2], cache=cache) == extract_text(
+        text_pdf, [2, 3], cache=cache
+    )
+
+
+def test_partially_cached_document(text_pdf: Path, cache: TextCache) -> None:
+    first = dict(iter_text(text_pdf, [2], cache=cache))
+    everything = dict(iter_text(text_pdf, cache=cache))
+    assert everything[2] == first[2]
+    assert everything == dict(iter_text(text_pdf))
+
+
+def test_character_budget_and_reverse_lines(text_pdf: Path, cache: TextCache) -> None:
+    extract_text(text_pdf, cache=cache)
+    assert extract_text(text_pdf, max_number_of_characters=500, cache=cache) == (
+        extract_text(text_pdf, max_number_of_characters=500)
+    )
+    assert extract_text(text_pdf, reverse_lines=True, cache=cache) == extract_text(
+        text_pdf, reverse_lines=True
+    )
+
+
+def test_key_follows_content(text_pdf: Path, cache: TextCache, tmp_path: Path) -> None:
+    digest = cache.document_key(text_pdf)
+    copy = tmp_path / "copy.pdf"
+    copy.write_bytes(text_pdf.read_bytes())
+    assert cache.document_key(copy) == digest
+    assert cache.document_key(io.BytesIO(text_pdf.read_bytes())) == digest
+
+    generate_pdf(text_pdf, 4, 300, seed=1)
+    assert cache.document_key(text_pdf) != digest
+
+
+def test_least_recently_used_pages_are_evicted(tmp_path: Path) -> None:
+    cache = TextCache(tmp_path / "cache", max_size=250 / 1024 / 1024)
+    cache.put("a", {1: "x" * 100, 2: "x" * 100})
+    cache.get("a", [1])
+    cache.put("b", {1: "x" * 100})
+    assert cache.get("a", [1, 2]) == {1: "x" * 100}
+    assert cache.get("b", [1]) == {1: "x" * 100}
+    assert cache.size() <= 250
+    cache.close()
+
+
+def test_pages_are_stored_while_extracting(tmp_path: Path, cache: TextCache) -> None:
+    path = tmp_path / "long.pdf"
+    generate_pdf(path, 70, 20)
+    pages = iter_text(path, cache=cache)
+    for _ in range(65):
+        next(pages)
+    # The first 64 pages are stored before the generator is done
+    other = TextCache(cache.directory)
+    assert len(other.get(cache.document_key(path), range(1, 71))) == 64
+    other.close()
+    pages.close()
+
+
+def test_evicted_documents_are_forgotten(tmp_path: Path, text_pdf: Path) -> None:
+    cache = TextCache(tmp_path / "cache", max_size=250 / 1024 / 1024)
+    digest = cache.document_key(text_pdf)
+    cache.set_page_count(digest, 4)
+    cache.put(digest, {1: "x" * 200})
+    cache.put("b", {1: "x" * 200})
+    assert cache.page_count(digest) is None
+    rows = cache.connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+    assert rows == 0
+    cache.close()
+
+
+def test_recipe_extract_text_uses_the_cache(
+    text_pdf: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    recipe = {
+        "settings": {"text_cache": str(tmp_path / "cache"), "overwrite": True},
+        "steps": [
+            {
+                "id": "text",
+                "operation": "extract_text",
+                "input": str(text_pdf),
+                "output": str(tmp_path / "out.txt"),
+            }
+        ],
+    }
+    path = make_recipe(recipe, tmp_path)
+    run_recipe(path)
+    expected = (tmp_path / "out.txt").read_text(encoding="utf-8")
+
+    monkeypatch.setattr("pypdfium2.PdfDocument", _refuse_to_open)
+    run_recipe(path)
+    assert (tmp_path / "out.txt").read_text(encoding="utf-8") == expected
@@ -0,0 +1,56 @@
+import pickle
+
+import pytest
+
+from pdf_helper.utils import PageSet, parse_pages
+
+
+def test_parse_merges_ranges() -> None:
+    pages = PageSet.parse("9-11, 1-5,4,7,6")
+    assert pages.intervals == [(1, 7), (9, 11)]
+    assert list(pages) == [1, 2, 3, 4, 5, 6, 7, 9, 10, 11]
+    assert str(pages) == "1-7,9-11"
+    assert parse_pages("1-3") == PageSet([3, 2, 1, 2])
+
+
+@pytest.mark.parametrize("pages", ["", "a", "0", "5-3", "1--2", "-3", "1,,2"])
+def test_parse_rejects_invalid_ranges(pages: str) -> None:
+    with pytest.raises(ValueError):
+        PageSet.parse(pages)
+
+
+def test_sequence_operations() -> None:
+    pages = PageSet.parse("1-100000,200000")
+    assert len(pages) == 100001
+    assert 99999 in pages and 100001 not in pages and 200000 in pages
+    assert pages[0] == 1 and pages[-1] == 200000 and pages[99999] == 100000
+    assert pages[5:10] == PageSet(range(6, 11))
+    assert pages[99998:] == PageSet([99999, 100000, 200000])
+    assert pages[::50000] == PageSet([1, 50001, 200000])
+    assert list(reversed(PageSet.parse("1-2,5"))) == [5, 2, 1]
+    with pytest.raises(IndexError):
+        pages[100001]
+    assert pickle.loads(pickle.dumps(pages)) == pages
+
+
+def test_open_ranges_need_resolving() -> None:
+    pages = PageSet.parse("2,8-,-3:")
+    assert pages and not pages.is_resolved
+    assert str(pages) == "2,8-,-3:"
+    with pytest.raises(ValueError):
+        len(pages)
+    with pytest.raises(ValueError):
+        list(pages)
+    assert list(pages.resolve(12)) == [2, 8, 9, 10, 11, 12]
+    assert list(pages.resolve(5)) == [2, 3, 4, 5]
+    assert list(PageSet.parse("-10:").resolve(3)) == [1, 2, 3]
+
+
+def test_validate() -> None:
+    PageSet.parse("1-3,5-,-2:").validate(5)
+    for pages, number_of_pages in [("1-6", 5), ("6-", 5), ("-6:", 5)]:
+        with pytest.raises(ValueError):
+            PageSet.parse(pages).validate(number_of_pages)
+    with pytest.raises(ValueError):
+        PageSet([0, 1]).validate(5)
+    assert list(PageSet([-1, 0, 3, 9]).resolve(5)) == [3]